@@ -0,0 +1,211 @@
+"""
+Pipeline Artifacts Module
+
+This module handles reading and writing the intermediate artifacts produced by
+the pipeline (extracted pages, chunks, embeddings). It supports JSON Lines files
+written one record at a time, and reads the older JSON array files in output/
+through the same loader. Append-only JSON Lines logs back the resumable
+checkpoints.
+"""
+
+import os
+import json
+from typing import Dict, Iterable, Iterator, List
+
+JSONL_EXTENSION = ".jsonl"
+JSON_EXTENSION = ".json"
+
+
+def is_jsonl(path: str) -> bool:
+    """Return True if the path names a JSON Lines artifact."""
+    return path.lower().endswith(JSONL_EXTENSION)
+
+
+def resolve_artifact_path(path: str) -> str:
+    """
+    Find an artifact on disk, falling back to the other format's extension.
+
+    A pipeline run in streaming mode writes `*_extracted.jsonl` where older runs
+    wrote `*_extracted.json`, so either is accepted for the same artifact.
+
+    Args:
+        path: Preferred artifact path
+
+    Returns:
+        Path of the artifact that exists
+    """
+    if os.path.exists(path):
+        return path
+
+    base, ext = os.path.splitext(path)
+    alternate = base + (JSON_EXTENSION if ext.lower() == JSONL_EXTENSION else JSONL_EXTENSION)
+    if os.path.exists(alternate):
+        return alternate
+
+    raise FileNotFoundError(f"Artifact not found: {path}")
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """
+    Iterate over the records of a JSON or JSON Lines artifact.
+
+    JSON Lines files are read one line at a time; JSON array files are loaded
+    whole and then yielded.
+
+    Args:
+        path: Path to the artifact
+
+    Yields:
+        One record dictionary at a time
+    """
+    path = resolve_artifact_path(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        if is_jsonl(path):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(f)
+
+
+def load_records(path: str) -> List[Dict]:
+    """
+    Load all records of a JSON or JSON Lines artifact into a list.
+
+    Args:
+        path: Path to the artifact
+
+    Returns:
+        List of record dictionaries
+    """
+    return list(iter_records(path))
+
+
+def count_records(path: str) -> int:
+    """
+    Count the records in an artifact without keeping them in memory.
+
+    Args:
+        path: Path to the artifact
+
+    Returns:
+        Number of records
+    """
+    path = resolve_artifact_path(path)
+    if is_jsonl(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return sum(1 for line in f if line.strip())
+    return sum(1 for _ in iter_records(path))
+
+
+def save_records(records: Iterable[Dict], path: str, indent: int = 2) -> int:
+    """
+    Save records to an artifact, choosing the format from the file extension.
+
+    Args:
+        records: Records to save
+        path: Output path; `.jsonl` writes JSON Lines, anything else a JSON array
+        indent: Indentation for JSON array output
+
+    Returns:
+        Number of records written
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    if is_jsonl(path):
+        count = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                count += 1
+        return count
+
+    records = list(records)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False, indent=indent)
+    return len(records)
+
+
+def tee_to_jsonl(records: Iterable[Dict], path: str) -> Iterator[Dict]:
+    """
+    Pass records through while appending each one to a JSON Lines artifact.
+
+    The file is truncated when iteration starts and flushed after every record,
+    so an interrupted run leaves a readable prefix behind.
+
+    Args:
+        records: Records to pass through
+        path: JSON Lines output path
+
+    Yields:
+        The input records, unchanged
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            yield record
+
+
+def append_records(records: Iterable[Dict], path: str, sync: bool = True) -> int:
+    """
+    Append records to a JSON Lines log.
+
+    If a crash left a torn last line, it is terminated first so the new
+    records start on a line of their own.
+
+    Args:
+        records: Records to append
+        path: JSON Lines log path
+        sync: fsync the file before returning, so the records survive a crash
+
+    Returns:
+        Number of records appended
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    torn = False
+    if os.path.exists(path) and os.path.getsize(path):
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            torn = f.read(1) != b'\n'
+
+    count = 0
+    with open(path, 'a', encoding='utf-8') as f:
+        if torn:
+            f.write('\n')
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            count += 1
+        f.flush()
+        if sync:
+            os.fsync(f.fileno())
+    return count
+
+
+def iter_log_records(path: str) -> Iterator[Dict]:
+    """
+    Iterate over the records of an append-only JSON Lines log.
+
+    Unlike iter_records, lines torn by a crash in the middle of an append are
+    skipped (with a warning) instead of raising.
+
+    Args:
+        path: JSON Lines log path
+
+    Yields:
+        One record dictionary at a time
+    """
+    torn = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                torn += 1
+                continue
+            yield record
+    if torn:
+        print(f"Skipped {torn} incomplete records in {path}")
@@ -0,0 +1,167 @@
+"""
+Boilerplate Removal Module
+
+This module detects running headers, footers, page numbers and stamps that
+repeat across the pages of a document, and strips them from the extracted
+pages before chunking so they are not embedded and retrieved over and over.
+"""
+
+import re
+from bisect import bisect_right
+from collections import Counter
+from typing import Dict, Iterable, Iterator, Set
+
+from text_chunker import num_tokens_from_string
+
+EDGE_LINES = 4  # Lines at the top and bottom of a page checked for boilerplate
+EDGE_FRACTION = 0.2  # ...but at most this share of a page's non-blank lines at each edge
+MIN_PAGE_FRACTION = 0.3  # Share of pages a line must repeat on to count as boilerplate
+MIN_PAGES = 3  # Never treat a line as boilerplate on fewer pages than this
+
+DIGITS = re.compile(r'\d+')
+
+
+def normalize_line(line: str) -> str:
+    """
+    Normalize a line so running headers and footers compare equal across pages.
+
+    Digits are replaced with '#' so "Page 12 of 300" and "Page 13 of 300"
+    both become "page # of #".
+
+    Args:
+        line: Line of page text
+
+    Returns:
+        Normalized line, or '' for blank lines
+    """
+    return DIGITS.sub('#', " ".join(line.split()).lower())
+
+
+def _edge_window(line_count: int) -> int:
+    """
+    Number of lines at each edge of a page checked for boilerplate.
+
+    Short pages get a smaller window, so their body text is not all counted
+    as edge lines.
+    """
+    return max(1, min(EDGE_LINES, int(line_count * EDGE_FRACTION)))
+
+
+def _edge_lines(text: str) -> Set[str]:
+    """Return the normalized non-blank lines at the top and bottom of a page."""
+    lines = [normalized for normalized in map(normalize_line, text.split('\n')) if normalized]
+    window = _edge_window(len(lines))
+    return set(lines[:window] + lines[-window:])
+
+
+def find_boilerplate_lines(pages_data: Iterable[Dict]) -> Set[str]:
+    """
+    Find normalized lines that repeat at the edges of many pages.
+
+    Args:
+        pages_data: Extracted pages; only read once, so a stream is fine
+
+    Returns:
+        Set of normalized boilerplate lines
+    """
+    page_counts = Counter()
+    page_total = 0
+
+    for page_data in pages_data:
+        page_total += 1
+        page_counts.update(_edge_lines(page_data["text"]))
+
+    threshold = max(MIN_PAGES, MIN_PAGE_FRACTION * page_total)
+    return {line for line, count in page_counts.items() if count >= threshold}
+
+
+def _strip_page(page_data: Dict, boilerplate: Set[str], report: Dict, token_cache: Dict[str, int]) -> Dict:
+    """
+    Remove boilerplate lines from the edges of one page.
+
+    Args:
+        page_data: Extracted page
+        boilerplate: Normalized boilerplate lines
+        report: Running totals, updated in place
+        token_cache: Token counts of removed lines already seen
+
+    Returns:
+        Copy of the page with the boilerplate removed
+    """
+    lines = page_data["text"].split('\n')
+    non_blank = [i for i, line in enumerate(lines) if line.strip()]
+    window = _edge_window(len(non_blank))
+    edge = set(non_blank[:window] + non_blank[-window:])
+
+    kept = []
+    removed = set()
+    starts = []  # Offset of each line in the old text
+    shifts = []  # Characters removed before each line
+    offset = shift = 0
+    for i, line in enumerate(lines):
+        starts.append(offset)
+        shifts.append(shift)
+        offset += len(line) + 1
+        if i in edge and normalize_line(line) in boilerplate:
+            stripped = line.strip()
+            if stripped not in token_cache:
+                token_cache[stripped] = num_tokens_from_string(stripped)
+            report["lines_removed"] += 1
+            report["tokens_removed"] += token_cache[stripped]
+            removed.add(i)
+            shift += len(line) + 1
+            continue
+        kept.append(line)
+
+    if not removed:
+        return page_data
+
+    text = '\n'.join(kept)
+    cleaned = dict(page_data, text=text)
+
+    # The first line was often the running header, so pick the title again
+    first_lines = [line for line in kept if line.strip()]
+    cleaned["potential_title"] = first_lines[0] if first_lines and len(first_lines[0]) < 100 else ""
+
+    # Heading offsets point into the old text; shift them past the removed lines
+    if page_data.get("headings"):
+        headings = []
+        for heading in page_data["headings"]:
+            old_offset = heading.get("offset", 0)
+            line = max(bisect_right(starts, old_offset) - 1, 0)
+            within = 0 if line in removed else old_offset - starts[line]
+            headings.append(dict(heading, offset=min(starts[line] - shifts[line] + within, len(text))))
+        cleaned["headings"] = headings
+
+    return cleaned
+
+
+def strip_boilerplate(pages_data: Iterable[Dict], boilerplate: Set[str], report: Dict) -> Iterator[Dict]:
+    """
+    Yield pages with boilerplate lines removed from their top and bottom.
+
+    Args:
+        pages_data: Extracted pages
+        boilerplate: Normalized boilerplate lines from find_boilerplate_lines
+        report: Dictionary that receives `lines_removed` and `tokens_removed`
+            totals as pages are processed
+
+    Yields:
+        Cleaned pages
+    """
+    report.setdefault("boilerplate_lines", len(boilerplate))
+    report.setdefault("lines_removed", 0)
+    report.setdefault("tokens_removed", 0)
+    token_cache = {}
+
+    for page_data in pages_data:
+        if boilerplate:
+            page_data = _strip_page(page_data, boilerplate, report, token_cache)
+        yield page_data
+
+
+def print_boilerplate_report(report: Dict) -> None:
+    """Print a summary of the boilerplate removed from a document."""
+    print(f"Boilerplate: {report['boilerplate_lines']} repeated lines detected, "
+          f"{report['lines_removed']} occurrences removed, "
+          f"~{report['tokens_removed']} tokens stripped before chunking")
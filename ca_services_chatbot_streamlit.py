@@ -174,6 +174,8 @@ try:
         MODEL = "gpt-4o"
         MAX_HISTORY_MESSAGES = 10
         TOP_K_RESULTS = 5
+        # Source documents of the CA services corpus; searches skip every other document
+        CA_SOURCES = ["list_documents_ca_services", "comprehensive_regulatory_services"]
 
         # Check if the index exists
         index_list = [index.name for index in pc.list_indexes()]
@@ -226,11 +228,12 @@ try:
         # Get query embedding
         query_embedding = get_query_embedding(query)
 
-        # Search Pinecone
+        # Search Pinecone, within the CA services documents only
         search_response = index.query(
             vector=query_embedding,
             top_k=top_k,
-            include_metadata=include_metadata
+            include_metadata=include_metadata,
+            filter={"source": {"$in": CA_SOURCES}}
         )
 
         return search_response["matches"]
@@ -0,0 +1,145 @@
+"""
+Chunk Store Module
+
+This module keeps the full text and fields of every uploaded chunk in a local
+SQLite database keyed by chunk ID. An index uploaded with slim metadata then
+only holds each vector's ID and the small fields queries filter on, so upsert
+payloads and query responses stay small; search results are hydrated from
+this store with one batched lookup.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List
+
+CHUNK_STORE_PATH = os.getenv("CHUNK_STORE_PATH", "output/chunk_store.sqlite")
+LOOKUP_BATCH = 500  # IDs per SELECT, below SQLite's bound-parameter limit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id TEXT PRIMARY KEY,
+    fields TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class ChunkStore:
+    """
+    SQLite-backed store of chunk fields (text included, embedding excluded).
+
+    The connection may be shared between threads (e.g. Streamlit sessions);
+    access is serialized with a lock.
+    """
+
+    def __init__(self, path: str = CHUNK_STORE_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def put_many(self, chunks: Iterable[Dict]) -> None:
+        """
+        Store chunks, replacing any stored under the same IDs.
+
+        Args:
+            chunks: Chunk dictionaries with a `chunk_id`; embeddings are not stored
+        """
+        rows = [
+            (chunk["chunk_id"], json.dumps({k: v for k, v in chunk.items() if k != "embedding"}, ensure_ascii=False))
+            for chunk in chunks
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def get_many(self, chunk_ids: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Look up several chunks by ID.
+
+        Args:
+            chunk_ids: Chunk IDs to look up
+
+        Returns:
+            Mapping of chunk ID to chunk fields for the IDs found
+        """
+        ids = list(dict.fromkeys(chunk_ids))
+        found = {}
+        with self._lock:
+            for i in range(0, len(ids), LOOKUP_BATCH):
+                batch = ids[i:i + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT chunk_id, fields FROM chunks WHERE chunk_id IN ({placeholders})", batch
+                )
+                for chunk_id, fields in rows:
+                    found[chunk_id] = json.loads(fields)
+        return found
+
+    def delete_many(self, chunk_ids: Iterable[str]) -> None:
+        """Delete chunks by ID."""
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+@lru_cache(maxsize=None)
+def get_chunk_store(path: str = CHUNK_STORE_PATH) -> ChunkStore:
+    """Return a chunk store for a path, opening it only once per process."""
+    return ChunkStore(path)
+
+
+def hydrate_matches(matches: List[Any], path: str = CHUNK_STORE_PATH) -> List[Any]:
+    """
+    Fill in the stored fields (e.g. text) of Pinecone matches with one batched lookup.
+
+    Only matches without text in their metadata (uploaded with slim metadata)
+    are looked up, and fields already in a match's metadata are kept. Matches
+    missing from the store are reported, since they would reach the caller
+    without text.
+
+    Args:
+        matches: Matches from an index query
+        path: Chunk store database
+
+    Returns:
+        The same matches, with their metadata completed
+
+    Raises:
+        FileNotFoundError: If matches need hydrating and the store does not exist
+    """
+    slim = [match for match in matches if "text" not in (match.get("metadata") or {})]
+    if not slim:
+        return matches
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"{len(slim)} matches have no text in their metadata and the chunk store {path} does not exist. "
+            f"Set CHUNK_STORE_PATH to the store the index was uploaded with, or re-upload without slim metadata."
+        )
+
+    stored = get_chunk_store(path).get_many(match["id"] for match in slim)
+    missing = []
+    for match in slim:
+        fields = stored.get(match["id"])
+        if fields:
+            match["metadata"] = {**fields, **(match.get("metadata") or {})}
+        else:
+            missing.append(match["id"])
+    if missing:
+        print(f"Warning: {len(missing)} matches are not in the chunk store {path} and have no text: "
+              f"{', '.join(missing[:5])}")
+    return matches
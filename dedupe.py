@@ -0,0 +1,168 @@
+"""
+Near-Duplicate Removal Module
+
+This module removes near-duplicate chunks before embedding using MinHash
+signatures and locality-sensitive hashing (LSH). Regulatory text repeats whole
+paragraphs, so only one canonical copy is embedded and the pages of the other
+copies are recorded in its metadata for citations.
+"""
+
+import re
+import zlib
+import random
+from math import ceil
+from typing import Dict, List, Set, Tuple
+
+NUM_PERM = 64  # MinHash permutations per signature
+BANDS = 8  # LSH bands; NUM_PERM must equal BANDS * ROWS
+ROWS = 8
+SHINGLE_SIZE = 5  # Words per shingle
+SIMILARITY_THRESHOLD = 0.9  # Estimated Jaccard similarity that counts as a duplicate
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+NUMBER = re.compile(r'\d+(?:\.\d+)*')
+
+# Fixed seed so signatures are identical across runs
+_rng = random.Random(42)
+PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+
+def _shingles(text: str) -> Set[int]:
+    """Hash the overlapping SHINGLE_SIZE-word shingles of a text."""
+    words = text.lower().split()
+    if len(words) <= SHINGLE_SIZE:
+        return {zlib.crc32(" ".join(words).encode('utf-8'))}
+    return {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode('utf-8'))
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash_signature(text: str) -> Tuple[int, ...]:
+    """
+    Compute the MinHash signature of a text.
+
+    Args:
+        text: Chunk text
+
+    Returns:
+        Tuple of NUM_PERM minimum hash values
+    """
+    shingles = _shingles(text)
+    return tuple(
+        min(((a * shingle + b) % MERSENNE_PRIME) & MAX_HASH for shingle in shingles)
+        for a, b in PERMUTATIONS
+    )
+
+
+def estimate_similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    """Estimate Jaccard similarity as the share of matching signature values."""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERM
+
+
+def _alias_label(chunk: Dict) -> str:
+    """Label a duplicate by where it occurs, e.g. 'MRTP-act_1966-Modified_2015:12'."""
+    return f"{chunk['source']}:{chunk['page_num']}"
+
+
+def deduplicate_chunks(
+    chunks_data: List[Dict],
+    threshold: float = SIMILARITY_THRESHOLD
+) -> Tuple[List[Dict], Dict]:
+    """
+    Drop near-duplicate chunks, keeping the first occurrence as canonical.
+
+    Candidates come from LSH buckets and are confirmed by estimated Jaccard
+    similarity. Two chunks whose numbers differ (clause numbers, limits,
+    areas) are never merged, so amended values are not lost. Table chunks
+    are always kept. Each canonical chunk that absorbed duplicates gets
+    `alias_sources` and `alias_pages` metadata.
+
+    Args:
+        chunks_data: Chunks in document order, from one or several
+            documents (duplicates across documents record their sources)
+        threshold: Minimum estimated similarity to treat two chunks as duplicates
+
+    Returns:
+        Tuple of (deduplicated chunks, report dictionary)
+    """
+    buckets = [{} for _ in range(BANDS)]
+    canonicals = []  # (position in kept, signature, numbers) per canonical chunk
+    kept = []
+    duplicates = 0
+    tokens_in = 0
+    tokens_avoided = 0
+
+    for chunk in chunks_data:
+        tokens_in += chunk.get("token_count", 0)
+        if chunk.get("is_table"):
+            kept.append(chunk)
+            continue
+
+        signature = minhash_signature(chunk["text"])
+        chunk_numbers = set(NUMBER.findall(chunk["text"]))
+        bands = [signature[band * ROWS:(band + 1) * ROWS] for band in range(BANDS)]
+
+        # Collect canonical chunks sharing at least one band
+        candidates = set()
+        for band, key in enumerate(bands):
+            candidates.update(buckets[band].get(key, ()))
+
+        canonical = None
+        for candidate in sorted(candidates):
+            position, candidate_signature, candidate_numbers = canonicals[candidate]
+            if candidate_numbers == chunk_numbers and \
+                    estimate_similarity(candidate_signature, signature) >= threshold:
+                canonical = position
+                break
+
+        if canonical is not None:
+            target = kept[canonical]
+            label = _alias_label(chunk)
+            if label not in target.setdefault("alias_pages", []):
+                target["alias_pages"].append(label)
+            if chunk["source"] not in target.setdefault("alias_sources", []):
+                target["alias_sources"].append(chunk["source"])
+            duplicates += 1
+            tokens_avoided += chunk.get("token_count", 0)
+            continue
+
+        # New canonical chunk
+        for band, key in enumerate(bands):
+            buckets[band].setdefault(key, []).append(len(canonicals))
+        canonicals.append((len(kept), signature, chunk_numbers))
+        kept.append(dict(chunk))
+
+    report = {
+        "chunks_in": len(chunks_data),
+        "chunks_out": len(kept),
+        "duplicates": duplicates,
+        "tokens_in": tokens_in,
+        "tokens_avoided": tokens_avoided
+    }
+    return kept, report
+
+
+def _estimate_requests(chunks: int, tokens: int, batch_size: int, batch_tokens: int) -> int:
+    """Estimate embedding requests for a number of chunks and tokens."""
+    return max(ceil(chunks / batch_size), ceil(tokens / batch_tokens))
+
+
+def print_dedupe_report(report: Dict, batch_size: int, batch_tokens: int) -> None:
+    """
+    Print how many chunks, tokens and embedding requests deduplication saved.
+
+    Args:
+        report: Report returned by deduplicate_chunks
+        batch_size: Maximum chunks per embedding request
+        batch_tokens: Maximum tokens per embedding request
+    """
+    calls_avoided = (
+        _estimate_requests(report["chunks_in"], report["tokens_in"], batch_size, batch_tokens)
+        - _estimate_requests(report["chunks_out"], report["tokens_in"] - report["tokens_avoided"],
+                             batch_size, batch_tokens)
+    )
+    print(f"Near-duplicates: {report['duplicates']} of {report['chunks_in']} chunks removed "
+          f"({report['chunks_out']} vectors to embed), ~{report['tokens_avoided']} tokens and "
+          f"{calls_avoided} embedding requests avoided")
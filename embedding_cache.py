@@ -0,0 +1,164 @@
+"""
+Embedding Cache Module
+
+This module keeps an on-disk SQLite cache of embeddings keyed by
+(model, dimensions, SHA-256 of the text), so text that was embedded once is
+never sent to the API again: re-runs, re-chunking experiments and repeated
+queries are served from disk. Vectors are stored as float32 blobs, and the
+least recently used entries are evicted once the cache exceeds its size limit.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "output/embedding_cache.sqlite")
+MAX_ENTRIES = 200000  # ~1.2 GB of float32 vectors at 1536 dimensions (EMBEDDING_DIMENSIONS)
+LOOKUP_BATCH = 500  # Hashes per SELECT, below SQLite's bound-parameter limit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    dimensions INTEGER NOT NULL,
+    text_hash TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, dimensions, text_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+
+def text_hash(text: str) -> str:
+    """Return the SHA-256 hex digest used as the cache key for a text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed embedding cache with least-recently-used eviction.
+
+    The connection may be shared between threads (e.g. Streamlit sessions);
+    access is serialized with a lock.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def get_many(self, model: str, dimensions: int, texts: Iterable[str]) -> Dict[str, List[float]]:
+        """
+        Look up cached embeddings for several texts.
+
+        Args:
+            model: Embedding model name
+            dimensions: Embedding dimensions
+            texts: Texts to look up
+
+        Returns:
+            Mapping of text hash to embedding for the texts found in the cache
+        """
+        hashes = list(dict.fromkeys(text_hash(text) for text in texts))
+        found = {}
+
+        with self._lock:
+            for i in range(0, len(hashes), LOOKUP_BATCH):
+                batch = hashes[i:i + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, embedding FROM embeddings "
+                    f"WHERE model = ? AND dimensions = ? AND text_hash IN ({placeholders})",
+                    (model, dimensions, *batch)
+                )
+                for key, blob in rows:
+                    found[key] = array('f', blob).tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND dimensions = ? AND text_hash = ?",
+                    [(now, model, dimensions, key) for key in found]
+                )
+                self._conn.commit()
+
+        self.stats["hits"] += len(found)
+        self.stats["misses"] += len(hashes) - len(found)
+        return found
+
+    def get(self, model: str, dimensions: int, text: str) -> Optional[List[float]]:
+        """Look up the cached embedding of one text, or None."""
+        return self.get_many(model, dimensions, [text]).get(text_hash(text))
+
+    def put_many(self, model: str, dimensions: int, texts: List[str], embeddings: List[List[float]]) -> None:
+        """
+        Store embeddings for several texts, then evict if the cache is over its limit.
+
+        Args:
+            model: Embedding model name
+            dimensions: Embedding dimensions
+            texts: Embedded texts
+            embeddings: Their embeddings, in the same order
+        """
+        now = time.time()
+        rows = [
+            (model, dimensions, text_hash(text), array('f', embedding).tobytes(), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+            self.stats["stored"] += len(rows)
+            self._evict()
+
+    def put(self, model: str, dimensions: int, text: str, embedding: List[float]) -> None:
+        """Store the embedding of one text."""
+        self.put_many(model, dimensions, [text], [embedding])
+
+    def _evict(self) -> None:
+        """Delete the least recently used entries beyond max_entries (lock held)."""
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE (model, dimensions, text_hash) IN ("
+            "SELECT model, dimensions, text_hash FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self._conn.commit()
+        self.stats["evicted"] += excess
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def print_stats(self) -> None:
+        """Print hit/miss statistics for this session."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        hit_rate = self.stats["hits"] / lookups * 100 if lookups else 0
+        print(f"Embedding cache: {self.stats['hits']} hits, {self.stats['misses']} misses "
+              f"({hit_rate:.1f}% hit rate), {self.stats['stored']} stored, "
+              f"{self.stats['evicted']} evicted, {len(self)} entries in {self.path}")
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+@lru_cache(maxsize=None)
+def get_embedding_cache(path: str = EMBEDDING_CACHE_PATH) -> EmbeddingCache:
+    """Return a cache for a path, opening it only once per process."""
+    return EmbeddingCache(path)
@@ -0,0 +1,265 @@
+"""
+Embedding Providers Module
+
+This module defines the EmbeddingProvider interface used by ingestion and
+querying, so both sides embed text with the same model and dimensions:
+
+- OpenAIEmbeddingProvider: the OpenAI embeddings API (default)
+- LocalEmbeddingProvider: a model from a local directory, run on the CPU with
+  sentence-transformers or ONNX Runtime, with no network round-trip or quota
+- HashingEmbeddingProvider: a deterministic feature-hashing fake for tests and
+  offline benchmarks
+
+The provider is chosen with the EMBEDDING_PROVIDER environment variable
+("openai", "local" or "hashing"); LOCAL_EMBEDDING_MODEL_DIR points the local
+provider at its model.
+"""
+
+import os
+import re
+import math
+import zlib
+import asyncio
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+import openai
+from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type, retry_if_not_exception_type
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Shared embedding settings; the Pinecone index is created with EMBEDDING_DIMENSIONS
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536
+PROVIDERS = ("openai", "local", "hashing")
+# The provider's dimensions must equal the Pinecone index's (EMBEDDING_DIMENSIONS when the
+# uploader creates it): a 384- or 768-dimension local model needs an index of its own width
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+LOCAL_EMBEDDING_MODEL_DIR = os.getenv("LOCAL_EMBEDDING_MODEL_DIR", "models/embedding")
+LOCAL_BATCH_SIZE = 32  # Texts per forward pass of a local model
+LOCAL_MAX_LENGTH = 512  # Tokens per text for ONNX models
+
+WORD = re.compile(r'\w+')
+
+
+def normalize(vector: List[float]) -> List[float]:
+    """Scale a vector to unit length."""
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class EmbeddingProvider(ABC):
+    """
+    Turns texts into embedding vectors.
+
+    Attributes:
+        name: Identifies the provider and model, e.g. in cache keys and manifests
+        dimensions: Length of the vectors returned
+        remote: True if calls go over the network and are rate limited
+    """
+
+    name: str
+    dimensions: int
+    remote: bool = False
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a batch of texts.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One vector per text, in the same order
+        """
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a single query string."""
+        return self.embed([query])[0]
+
+    async def embed_async(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts without blocking the event loop."""
+        return await asyncio.to_thread(self.embed, texts)
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """
+    Embeddings from the OpenAI API, with retries on rate limits and API errors.
+
+    A 400 (e.g. an input over the model's token limit) fails the same way
+    every time, so it is raised at once instead of retried.
+    """
+
+    remote = True
+
+    def __init__(
+        self,
+        model: str = EMBEDDING_MODEL,
+        dimensions: int = EMBEDDING_DIMENSIONS,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None
+    ):
+        self.model = model
+        self.dimensions = dimensions
+        self.name = model
+        self.api_key = api_key or openai.api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = base_url
+        if not self.api_key:
+            raise ValueError("OpenAI API key is not set. Set the OPENAI_API_KEY environment variable.")
+        self.client = openai.OpenAI(api_key=self.api_key, base_url=base_url)
+
+    @retry(
+        wait=wait_exponential(multiplier=1, min=4, max=60),
+        stop=stop_after_attempt(5),
+        retry=(retry_if_exception_type((openai.RateLimitError, openai.APIError, openai.APIConnectionError))
+               & retry_if_not_exception_type(openai.BadRequestError))
+    )
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        response = self.client.embeddings.create(
+            input=texts,
+            model=self.model,
+            dimensions=self.dimensions
+        )
+        return [item.embedding for item in response.data]
+
+    def async_client(self, max_retries: int = 0) -> "openai.AsyncOpenAI":
+        """Create an async client for the same account and endpoint."""
+        return openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=max_retries)
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    Embeddings from a model in a local directory, computed on the CPU.
+
+    A directory with `model.onnx` and `tokenizer.json` runs on ONNX Runtime
+    (mean pooling over the last hidden state); any other directory is loaded
+    with sentence-transformers. Vectors are L2-normalized, and truncated to
+    `dimensions` first if given.
+    """
+
+    def __init__(self, model_dir: str = LOCAL_EMBEDDING_MODEL_DIR, dimensions: Optional[int] = None):
+        if not os.path.isdir(model_dir):
+            raise FileNotFoundError(f"Local embedding model directory not found: {model_dir}")
+        self.model_dir = model_dir
+        self.name = f"local:{os.path.basename(os.path.normpath(model_dir))}"
+        self.onnx = os.path.exists(os.path.join(model_dir, "model.onnx"))
+
+        if self.onnx:
+            try:
+                import onnxruntime
+                from tokenizers import Tokenizer
+            except ImportError:
+                raise ImportError("ONNX models need onnxruntime and tokenizers: pip install onnxruntime tokenizers")
+            self.session = onnxruntime.InferenceSession(
+                os.path.join(model_dir, "model.onnx"), providers=["CPUExecutionProvider"]
+            )
+            self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+            self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+            self.tokenizer.enable_truncation(LOCAL_MAX_LENGTH)
+            self.tokenizer.enable_padding()
+            native_dimensions = len(self._embed_onnx(["dimension probe"])[0])
+        else:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                raise ImportError("Local models need sentence-transformers: pip install sentence-transformers")
+            self.model = SentenceTransformer(model_dir, device="cpu")
+            native_dimensions = self.model.get_sentence_embedding_dimension()
+
+        self.dimensions = dimensions or native_dimensions
+
+    def _embed_onnx(self, texts: List[str]) -> List[List[float]]:
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        }
+        hidden = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+
+        # Mean of the token vectors, ignoring padding
+        mask = inputs["attention_mask"][:, :, None].astype(hidden.dtype)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled.tolist()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for i in range(0, len(texts), LOCAL_BATCH_SIZE):
+            batch = texts[i:i + LOCAL_BATCH_SIZE]
+            if self.onnx:
+                vectors.extend(self._embed_onnx(batch))
+            else:
+                vectors.extend(self.model.encode(batch, convert_to_numpy=True).tolist())
+        return [normalize(vector[:self.dimensions]) for vector in vectors]
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic fake embeddings built by hashing words and word pairs.
+
+    Texts that share words get similar vectors, so retrieval behaves sensibly
+    in tests and offline benchmarks, at no cost and with no model download.
+    """
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+        self.name = "hashing"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for text in texts:
+            words = WORD.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            vector = [0.0] * self.dimensions
+            for feature in features:
+                digest = zlib.crc32(feature.encode('utf-8'))
+                vector[digest % self.dimensions] += 1.0 if digest & 0x80000000 else -1.0
+            vectors.append(normalize(vector))
+        return vectors
+
+
+def check_index_dimension(dimensions: int, index_dimension: int) -> None:
+    """
+    Check that embeddings fit the Pinecone index before any are uploaded or queried.
+
+    Args:
+        dimensions: Dimensions of the embeddings (or of the provider)
+        index_dimension: Dimension of the index
+
+    Raises:
+        ValueError: If they differ
+    """
+    if dimensions != index_dimension:
+        raise ValueError(
+            f"Embeddings have {dimensions} dimensions but the Pinecone index has {index_dimension}. "
+            f"Use an embedding provider with {index_dimension}-dimension output (EMBEDDING_PROVIDER), "
+            f"or a separate index created at {dimensions} dimensions."
+        )
+
+
+@lru_cache(maxsize=None)
+def get_embedding_provider(name: Optional[str] = None, model_dir: Optional[str] = None) -> EmbeddingProvider:
+    """
+    Create the configured embedding provider, once per process.
+
+    Args:
+        name: "openai", "local" or "hashing"; defaults to EMBEDDING_PROVIDER
+        model_dir: Model directory for the local provider; defaults to
+            LOCAL_EMBEDDING_MODEL_DIR
+
+    Returns:
+        EmbeddingProvider
+    """
+    name = name or EMBEDDING_PROVIDER
+    if name == "openai":
+        return OpenAIEmbeddingProvider()
+    if name == "local":
+        return LocalEmbeddingProvider(model_dir or LOCAL_EMBEDDING_MODEL_DIR)
+    if name == "hashing":
+        return HashingEmbeddingProvider()
+    raise ValueError(f"Unknown embedding provider: {name}. Choose from {', '.join(PROVIDERS)}")
@@ -0,0 +1,204 @@
+"""
+Embedding Store Module
+
+This module stores embeddings in a binary format instead of JSON float lists:
+a float32 (or float16) matrix in NumPy's .npy format, opened memory-mapped so
+loading a corpus is near-instant and zero-copy, plus a row-aligned JSON Lines
+metadata table (`<name>.meta.jsonl`) holding each chunk's text and metadata.
+The JSON format remains available as an export.
+"""
+
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from artifacts import load_records, save_records
+
+STORE_EXTENSION = ".npy"
+METADATA_SUFFIX = ".meta.jsonl"
+DTYPES = ("float32", "float16")
+
+
+def is_embedding_store(path: str) -> bool:
+    """Return True if the path names a binary embedding store."""
+    return path.lower().endswith(STORE_EXTENSION)
+
+
+def metadata_path(path: str) -> str:
+    """Return the path of the metadata table that goes with a store."""
+    return os.path.splitext(path)[0] + METADATA_SUFFIX
+
+
+def resolve_embeddings_path(path: str) -> str:
+    """
+    Find an embeddings artifact, falling back to the JSON file of older runs.
+
+    Args:
+        path: Preferred path, e.g. output/doc_embeddings.npy
+
+    Returns:
+        Path of the artifact that exists
+    """
+    if os.path.exists(path):
+        return path
+    legacy = os.path.splitext(path)[0] + ".json"
+    if os.path.exists(legacy):
+        return legacy
+    raise FileNotFoundError(f"Embeddings file not found: {path}")
+
+
+class EmbeddingStore:
+    """
+    Read-only view of a binary embedding store.
+
+    `vectors` is the (memory-mapped) matrix and `metadata` the row-aligned
+    chunk records. Indexing or iterating yields chunk dictionaries with an
+    `embedding` list, so a store can be passed wherever a list of chunks with
+    embeddings is expected.
+    """
+
+    def __init__(self, vectors: np.ndarray, metadata: List[Dict]):
+        if len(vectors) != len(metadata):
+            raise ValueError(f"Embedding store has {len(vectors)} vectors but {len(metadata)} metadata rows")
+        self.vectors = vectors
+        self.metadata = metadata
+
+    def __len__(self) -> int:
+        return len(self.metadata)
+
+    def __getitem__(self, row: int) -> Dict:
+        return {**self.metadata[row], "embedding": self.vectors[row].astype(np.float32).tolist()}
+
+    def __iter__(self) -> Iterator[Dict]:
+        for row in range(len(self)):
+            yield self[row]
+
+    @property
+    def ids(self) -> List[str]:
+        """Chunk IDs in row order."""
+        return [record["chunk_id"] for record in self.metadata]
+
+
+def save_embedding_store(chunks_with_embeddings: Iterable[Dict], path: str, dtype: str = "float32") -> int:
+    """
+    Write chunks with embeddings as a binary matrix plus a metadata table.
+
+    Both files are written next to the store under a temporary name and
+    then moved into place, so an existing store is never opened for writing
+    (which fails on Windows while it is memory-mapped) and readers never see
+    a half-written one.
+
+    Args:
+        chunks_with_embeddings: Chunks with an `embedding` list each
+        path: Store path ending in .npy
+        dtype: "float32", or "float16" for half the size
+
+    Returns:
+        Number of rows written
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported dtype: {dtype}. Choose from {', '.join(DTYPES)}")
+
+    chunks = list(chunks_with_embeddings)
+    dimensions = len(chunks[0]["embedding"]) if chunks else 0
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = os.path.splitext(path)[0] + ".tmp" + STORE_EXTENSION
+    matrix = np.lib.format.open_memmap(temp_path, mode='w+', dtype=dtype, shape=(len(chunks), dimensions))
+    for row, chunk in enumerate(chunks):
+        matrix[row] = chunk["embedding"]
+    matrix.flush()
+    del matrix
+
+    save_records(
+        ({key: value for key, value in chunk.items() if key != "embedding"} for chunk in chunks),
+        metadata_path(temp_path)
+    )
+    os.replace(temp_path, path)
+    os.replace(metadata_path(temp_path), metadata_path(path))
+    return len(chunks)
+
+
+def open_embedding_store(path: str, mmap: bool = True) -> EmbeddingStore:
+    """
+    Open a binary embedding store.
+
+    Args:
+        path: Store path ending in .npy
+        mmap: Memory-map the matrix instead of reading it into memory
+
+    Returns:
+        EmbeddingStore
+    """
+    vectors = np.load(path, mmap_mode='r' if mmap else None)
+    return EmbeddingStore(vectors, load_records(metadata_path(path)))
+
+
+def load_embeddings(path: str, mmap: bool = True) -> Union[EmbeddingStore, List[Dict]]:
+    """
+    Load chunks with embeddings from a binary store or a JSON artifact.
+
+    Args:
+        path: Embeddings path; a missing .npy store falls back to the
+            .json file written by older runs
+        mmap: Memory-map a binary store; pass False to read it into memory,
+            e.g. before overwriting the same file
+
+    Returns:
+        EmbeddingStore or list of chunk dictionaries; both index and iterate
+        as chunks with an `embedding` list
+    """
+    path = resolve_embeddings_path(path)
+    if is_embedding_store(path):
+        return open_embedding_store(path, mmap)
+    return load_records(path)
+
+
+def save_embeddings(chunks_with_embeddings: Sequence[Dict], path: str, dtype: str = "float32") -> int:
+    """
+    Save chunks with embeddings, choosing the format from the file extension.
+
+    Args:
+        chunks_with_embeddings: Chunks with an `embedding` list each
+        path: .npy for a binary store; .json or .jsonl for a JSON export
+        dtype: Matrix dtype for binary stores
+
+    Returns:
+        Number of chunks written
+    """
+    if is_embedding_store(path):
+        return save_embedding_store(chunks_with_embeddings, path, dtype)
+    return save_records(chunks_with_embeddings, path, indent=None)
+
+
+def convert_embeddings(input_path: str, output_path: str, dtype: Optional[str] = None) -> int:
+    """
+    Convert between the JSON and binary embedding formats.
+
+    Args:
+        input_path: Source artifact (.json, .jsonl or .npy)
+        output_path: Destination artifact (.json, .jsonl or .npy)
+        dtype: Matrix dtype when writing a store (default float32)
+
+    Returns:
+        Number of chunks converted
+    """
+    return save_embeddings(load_embeddings(input_path), output_path, dtype or "float32")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Convert embeddings between JSON and the binary .npy store (e.g. to export a store as JSON)"
+    )
+    parser.add_argument("input", help="Input embeddings (.json, .jsonl or .npy)")
+    parser.add_argument("--output", "-o", required=True, help="Output embeddings (.json, .jsonl or .npy)")
+    parser.add_argument("--dtype", choices=DTYPES, default="float32",
+                        help="Matrix dtype when writing a .npy store (default: float32)")
+
+    args = parser.parse_args()
+
+    count = convert_embeddings(args.input, args.output, args.dtype)
+    print(f"Wrote {count} chunks with embeddings to {args.output}")
@@ -1,19 +1,31 @@
 """
 Embeddings Generator Module
 
-This module handles the generation of embeddings using OpenAI's API.
-It includes rate limit handling, batch processing, and retry logic.
+This module handles the generation of embeddings with the configured
+EmbeddingProvider (OpenAI's API by default, or a local CPU model).
+It includes rate limit handling, batch processing, and retry logic, plus an
+asyncio mode that keeps several OpenAI requests in flight under a
+requests-per-minute and tokens-per-minute limiter, and a batch-job mode that
+submits every request as one job to the Batch API for bulk rebuilds.
 """
 
 import os
 import json
 import time
-from typing import Dict, List, Optional, Any
+import asyncio
+from typing import Dict, List, Optional, Any, Tuple
 from tqdm import tqdm
 import openai
-from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
 import tiktoken
 from dotenv import load_dotenv
+from rate_limiter import RateLimiter
+from artifacts import append_records, is_jsonl, iter_log_records, iter_records, resolve_artifact_path
+from embedding_store import DTYPES, save_embeddings
+from embedding_cache import EMBEDDING_CACHE_PATH, EmbeddingCache, get_embedding_cache, text_hash
+from embedding_providers import (
+    EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, PROVIDERS, EmbeddingProvider, OpenAIEmbeddingProvider,
+    get_embedding_provider
+)
 
 # Load environment variables
 load_dotenv()
@@ -22,37 +34,23 @@ load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
 # Constants
-EMBEDDING_MODEL = "text-embedding-3-small"
-EMBEDDING_DIMENSIONS = 1024
-BATCH_SIZE = 50  # Number of chunks to process in one batch
-RATE_LIMIT_DELAY = 1.5  # Seconds to wait between batches
+BATCH_SIZE = 2048  # Maximum number of chunks in one request (API input limit)
+MAX_BATCH_TOKENS = 50000  # Tokens packed into one request (API limit: 300,000)
+MAX_INPUT_TOKENS = 8191  # Longest input the embedding model accepts
+RATE_LIMIT_DELAY = 1.5  # Seconds to wait between batches of a remote provider
 
+# Async mode settings; set the limits to your account's tier
+REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "3000"))
+TOKENS_PER_MINUTE = int(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "1000000"))
+MAX_IN_FLIGHT = 8  # Concurrent embedding requests
+MAX_RETRIES = 6  # Attempts per batch before giving up
 
-@retry(
-    wait=wait_exponential(multiplier=1, min=4, max=60),
-    stop=stop_after_attempt(5),
-    retry=retry_if_exception_type((openai.RateLimitError, openai.APIError, openai.APIConnectionError))
-)
-def get_embeddings_with_retry(texts: List[str], model: str = EMBEDDING_MODEL) -> List[List[float]]:
-    """
-    Get embeddings for a list of texts with retry logic.
-    
-    Args:
-        texts: List of text strings to embed
-        model: OpenAI embedding model to use
-        
-    Returns:
-        List of embedding vectors
-    """
-    response = openai.embeddings.create(
-        input=texts,
-        model=model,
-        dimensions=EMBEDDING_DIMENSIONS
-    )
-    
-    # Extract embeddings from response
-    embeddings = [item.embedding for item in response.data]
-    return embeddings
+# Batch-job mode settings
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_POLL_INTERVAL = 30  # Seconds between job status checks
+BATCH_MAX_INPUTS = 50000  # Embedding inputs the Batch API accepts in one job, across all its requests
+BATCH_ERRORS_SHOWN = 5  # Failed requests printed from a job's error file
+BATCH_TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
 
 
 def calculate_batch_token_count(texts: List[str], model: str = EMBEDDING_MODEL) -> int:
@@ -71,99 +69,717 @@ def calculate_batch_token_count(texts: List[str], model: str = EMBEDDING_MODEL)
     return total_tokens
 
 
+def fit_input_limit(chunks_data: List[Dict], model: str = EMBEDDING_MODEL) -> List[Dict]:
+    """
+    Truncate chunks longer than MAX_INPUT_TOKENS for embedding.
+
+    The API rejects a whole request if any input is over the limit, so an
+    oversized chunk is replaced by a copy of its first MAX_INPUT_TOKENS
+    tokens, with a warning; the chunk itself keeps its full text. Token
+    counts computed here are kept on the copies for plan_batches.
+
+    Args:
+        chunks_data: Chunks to embed
+        model: Model name for tokenization
+
+    Returns:
+        The chunks, with oversized ones replaced by truncated copies
+    """
+    encoding = None
+    fitted = []
+    for chunk in chunks_data:
+        tokens = chunk.get("token_count")
+        if tokens is None or tokens > MAX_INPUT_TOKENS:
+            encoding = encoding or tiktoken.encoding_for_model(model)
+            encoded = encoding.encode(chunk["text"])
+            chunk = {**chunk, "token_count": len(encoded)}
+            if len(encoded) > MAX_INPUT_TOKENS:
+                print(f"Warning: chunk {chunk.get('chunk_id', '?')} has {len(encoded)} tokens "
+                      f"(model limit {MAX_INPUT_TOKENS}); embedding its first {MAX_INPUT_TOKENS} tokens")
+                chunk = {**chunk, "text": encoding.decode(encoded[:MAX_INPUT_TOKENS]), "token_count": MAX_INPUT_TOKENS}
+        fitted.append(chunk)
+    return fitted
+
+
+def plan_batches(
+    chunks_data: List[Dict],
+    batch_size: int = BATCH_SIZE,
+    max_batch_tokens: int = MAX_BATCH_TOKENS,
+    model: str = EMBEDDING_MODEL
+) -> List[Tuple[List[Dict], int]]:
+    """
+    Pack consecutive chunks into requests by token total.
+
+    Chunks keep their order, so results can be checkpointed as a prefix of
+    chunks_data. Token counts stored on the chunks by the chunker are reused;
+    only chunks without `token_count` are encoded. Chunks are expected to
+    fit MAX_INPUT_TOKENS already (see fit_input_limit).
+
+    Args:
+        chunks_data: Chunks to embed
+        batch_size: Maximum number of chunks per request
+        max_batch_tokens: Maximum total tokens per request
+        model: Model name for tokenization of chunks without a token count
+
+    Returns:
+        List of (batch of chunks, total tokens) tuples
+    """
+    encoding = None
+    batches = []
+    batch = []
+    batch_tokens = 0
+
+    for chunk in chunks_data:
+        tokens = chunk.get("token_count")
+        if tokens is None:
+            encoding = encoding or tiktoken.encoding_for_model(model)
+            tokens = len(encoding.encode(chunk["text"]))
+
+        if batch and (len(batch) >= batch_size or batch_tokens + tokens > max_batch_tokens):
+            batches.append((batch, batch_tokens))
+            batch, batch_tokens = [], 0
+        batch.append(chunk)
+        batch_tokens += tokens
+
+    if batch:
+        batches.append((batch, batch_tokens))
+
+    return batches
+
+
+def _plan_uncached_batches(
+    chunks_data: List[Dict],
+    done: Dict[int, List[float]],
+    batch_size: int,
+    cache: Optional[EmbeddingCache],
+    provider: EmbeddingProvider
+) -> Tuple[Dict[int, List[float]], List[Tuple[List[int], List[Dict], int]]]:
+    """
+    Look up chunks in the embedding cache and pack the rest into requests.
+
+    For a remote provider, chunks over the model's input limit are truncated
+    first (fit_input_limit); the batches then hold the truncated copies, and
+    the cache is keyed by the text actually embedded.
+
+    Args:
+        chunks_data: All chunks
+        done: Embeddings already recovered from the checkpoint, by chunk position
+        batch_size: Maximum number of chunks per request
+        cache: Embedding cache, or None to embed everything
+        provider: Provider whose name and dimensions key the cache
+
+    Returns:
+        Tuple of (known embeddings by chunk position, list of
+        (chunk positions, chunks, total tokens) batches to embed)
+    """
+    known = dict(done)
+    positions = [position for position in range(len(chunks_data)) if position not in done]
+    inputs = [chunks_data[position] for position in positions]
+    if provider.remote:
+        inputs = fit_input_limit(inputs, provider.model)
+    inputs = dict(zip(positions, inputs))
+    if cache is not None:
+        hashes = {position: text_hash(inputs[position]["text"]) for position in positions}
+        found = cache.get_many(provider.name, provider.dimensions, (inputs[p]["text"] for p in positions))
+        known.update((position, found[key]) for position, key in hashes.items() if key in found)
+
+    to_embed = [position for position in positions if position not in known]
+    batches = []
+    cursor = 0
+    for batch, token_count in plan_batches([inputs[position] for position in to_embed], batch_size):
+        batches.append((to_embed[cursor:cursor + len(batch)], batch, token_count))
+        cursor += len(batch)
+    return known, batches
+
+
+def _load_checkpoint(chunks_data: List[Dict], checkpoint_path: Optional[str], resume: bool) -> Dict[int, List[float]]:
+    """
+    Recover the embeddings logged by a previous run, matched to chunks by chunk ID.
+
+    Without resume, any old log is removed so the new run starts a fresh one.
+    Checkpoints written as a JSON array of chunks by older versions are
+    read too.
+
+    Args:
+        chunks_data: All chunks
+        checkpoint_path: Checkpoint log path
+        resume: Whether to resume from the checkpoint
+
+    Returns:
+        Mapping of chunk position to recovered embedding
+    """
+    if not checkpoint_path:
+        return {}
+    if not resume:
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        return {}
+
+    try:
+        path = resolve_artifact_path(checkpoint_path)
+    except FileNotFoundError:
+        return {}
+    records = iter_log_records(path) if is_jsonl(path) else iter_records(path)
+    logged = {record["chunk_id"]: record["embedding"] for record in records if "embedding" in record}
+
+    done = {
+        position: logged[chunk["chunk_id"]]
+        for position, chunk in enumerate(chunks_data)
+        if chunk.get("chunk_id") in logged
+    }
+    print(f"Resuming from checkpoint with {len(done)} already embedded chunks")
+    return done
+
+
+def _log_checkpoint(checkpoint_path: str, batch: List[Dict], embeddings: List[List[float]]) -> None:
+    """Append one record per embedded chunk to the checkpoint log and fsync it."""
+    append_records(
+        ({"chunk_id": chunk.get("chunk_id"), "embedding": embedding} for chunk, embedding in zip(batch, embeddings)),
+        checkpoint_path
+    )
+
+
+def _finish(
+    chunks_data: List[Dict],
+    embeddings: Dict[int, List[float]],
+    output_path: Optional[str],
+    checkpoint_path: Optional[str],
+    dtype: str = "float32"
+) -> List[Dict]:
+    """
+    Compact the run into chunks with embeddings, in chunk order.
+
+    The result is saved to output_path if given, and the checkpoint log is
+    removed: once every chunk is embedded it holds nothing the output does not.
+    """
+    processed_chunks = [{**chunk, "embedding": embeddings[position]} for position, chunk in enumerate(chunks_data)]
+
+    if output_path:
+        save_embeddings(processed_chunks, output_path, dtype)
+        print(f"Saved chunks with embeddings to {output_path}")
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    return processed_chunks
+
+
 def generate_embeddings(
     chunks_data: List[Dict],
     batch_size: int = BATCH_SIZE,
     output_path: Optional[str] = None,
     checkpoint_path: Optional[str] = None,
-    resume: bool = False
+    resume: bool = False,
+    use_async: bool = False,
+    cache_path: Optional[str] = EMBEDDING_CACHE_PATH,
+    provider: Optional[EmbeddingProvider] = None,
+    use_batch_api: bool = False,
+    dtype: str = "float32"
 ) -> List[Dict]:
     """
     Generate embeddings for text chunks with rate limit handling.
     
     Args:
         chunks_data: List of dictionaries containing chunked text with metadata
-        batch_size: Number of chunks to process in one batch
-        output_path: Optional path to save the embeddings as JSON
-        checkpoint_path: Optional path to save checkpoints during processing
-        resume: Whether to resume from a checkpoint
+        batch_size: Maximum number of chunks per request
+        output_path: Optional path to save the embeddings: a binary store
+            if it ends in .npy, JSON otherwise
+        checkpoint_path: Optional path of the append-only checkpoint log
+            (JSON Lines, one record per embedded chunk)
+        resume: Whether to resume from the checkpoint, by chunk ID
+        use_async: Run generate_embeddings_async with the default
+            concurrency and rate limits instead of fixed pauses
+        cache_path: Embedding cache to consult before calling the API and
+            to fill with new embeddings; None disables the cache
+        provider: Embedding provider; defaults to get_embedding_provider()
+        use_batch_api: Run generate_embeddings_batch, submitting every
+            request as one Batch API job
+        dtype: Matrix dtype of a binary store: "float32", or "float16" for
+            half the size
         
     Returns:
         List of dictionaries containing text chunks with embeddings
     """
-    # Check if OpenAI API key is set
-    if not openai.api_key:
-        raise ValueError("OpenAI API key is not set. Set the OPENAI_API_KEY environment variable.")
+    if use_batch_api:
+        return generate_embeddings_batch(
+            chunks_data, batch_size, output_path, checkpoint_path, resume,
+            cache_path=cache_path, provider=provider, dtype=dtype
+        )
+    if use_async:
+        return asyncio.run(generate_embeddings_async(
+            chunks_data, batch_size, output_path, checkpoint_path, resume,
+            cache_path=cache_path, provider=provider, dtype=dtype
+        ))
+    
+    provider = provider or get_embedding_provider()
     
     # Resume from checkpoint if requested
-    start_idx = 0
-    if resume and checkpoint_path and os.path.exists(checkpoint_path):
-        with open(checkpoint_path, 'r', encoding='utf-8') as f:
-            processed_chunks = json.load(f)
-        
-        start_idx = len(processed_chunks)
-        print(f"Resuming from checkpoint with {start_idx} already processed chunks")
-        
-        # If we've processed all chunks, just return them
-        if start_idx >= len(chunks_data):
-            print("All chunks already processed")
-            return processed_chunks
-    else:
-        processed_chunks = []
+    done = _load_checkpoint(chunks_data, checkpoint_path, resume)
     
-    # Process chunks in batches
-    print(f"Generating embeddings for {len(chunks_data) - start_idx} chunks in batches of {batch_size}...")
+    # Serve what we can from the cache and pack the rest into requests by token count
+    cache = get_embedding_cache(cache_path) if cache_path else None
+    embeddings, batches = _plan_uncached_batches(chunks_data, done, batch_size, cache, provider)
+    print(f"Generating {provider.name} embeddings for {len(chunks_data) - len(embeddings)} chunks in "
+          f"{len(batches)} batches of up to {MAX_BATCH_TOKENS} tokens ({len(embeddings) - len(done)} cached)...")
     
-    for i in tqdm(range(start_idx, len(chunks_data), batch_size), desc="Processing batches"):
-        # Get the current batch
-        batch = chunks_data[i:i + batch_size]
+    for batch_num, (positions, batch, batch_token_count) in enumerate(tqdm(batches, desc="Processing batches")):
         batch_texts = [chunk["text"] for chunk in batch]
         
-        # Calculate token count for the batch
-        batch_token_count = calculate_batch_token_count(batch_texts)
-        
         try:
             # Get embeddings for the batch
-            embeddings = get_embeddings_with_retry(batch_texts)
+            batch_embeddings = provider.embed(batch_texts)
+            if cache is not None:
+                cache.put_many(provider.name, provider.dimensions, batch_texts, batch_embeddings)
+            embeddings.update(zip(positions, batch_embeddings))
             
-            # Add embeddings to chunks
-            for j, embedding in enumerate(embeddings):
-                chunk_with_embedding = batch[j].copy()
-                chunk_with_embedding["embedding"] = embedding
-                processed_chunks.append(chunk_with_embedding)
-            
-            # Save checkpoint
+            # Append the batch to the checkpoint log
             if checkpoint_path:
-                os.makedirs(os.path.dirname(checkpoint_path) or '.', exist_ok=True)
-                with open(checkpoint_path, 'w', encoding='utf-8') as f:
-                    json.dump(processed_chunks, f, ensure_ascii=False)
+                _log_checkpoint(checkpoint_path, batch, batch_embeddings)
             
             # Print batch stats
-            print(f"Batch {i//batch_size + 1}: {len(batch)} chunks, {batch_token_count} tokens")
+            print(f"Batch {batch_num + 1}: {len(batch)} chunks, {batch_token_count} tokens")
             
-            # Rate limit delay
-            time.sleep(RATE_LIMIT_DELAY)
+            # Rate limit delay; local providers have no quota to respect
+            if provider.remote:
+                time.sleep(RATE_LIMIT_DELAY)
             
         except Exception as e:
-            print(f"Error processing batch starting at index {i}: {str(e)}")
-            # Save progress before raising the exception
-            if checkpoint_path and processed_chunks:
-                os.makedirs(os.path.dirname(checkpoint_path) or '.', exist_ok=True)
-                with open(checkpoint_path, 'w', encoding='utf-8') as f:
-                    json.dump(processed_chunks, f, ensure_ascii=False)
+            print(f"Error processing batch starting at index {positions[0]}: {str(e)}")
+            if checkpoint_path and os.path.exists(checkpoint_path):
                 print(f"Progress saved to {checkpoint_path}")
             raise
     
-    print(f"Generated embeddings for {len(processed_chunks)} chunks")
+    print(f"Generated embeddings for {len(chunks_data)} chunks")
+    if cache is not None:
+        cache.print_stats()
     
-    # Save to JSON if output path is provided
-    if output_path:
-        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(processed_chunks, f, ensure_ascii=False)
-        print(f"Saved chunks with embeddings to {output_path}")
+    # Save to JSON if output path is provided and drop the checkpoint log
+    return _finish(chunks_data, embeddings, output_path, checkpoint_path, dtype)
+
+
+async def get_embeddings_async(
+    client: "openai.AsyncOpenAI",
+    limiter: RateLimiter,
+    texts: List[str],
+    token_count: int,
+    model: str = EMBEDDING_MODEL,
+    dimensions: int = EMBEDDING_DIMENSIONS,
+    max_retries: int = MAX_RETRIES
+) -> List[List[float]]:
+    """
+    Get embeddings for a list of texts once the rate limiter admits the request.
+
+    429 responses pause the limiter for as long as the provider asks and
+    lower its rate; connection and server errors are retried with
+    exponential backoff.
+
+    Args:
+        client: Async OpenAI client (created with max_retries=0)
+        limiter: Shared requests/tokens per minute limiter
+        texts: List of text strings to embed
+        token_count: Total input tokens of the texts
+        model: OpenAI embedding model to use
+        dimensions: Embedding dimensions to request
+        max_retries: Attempts before the error is raised
+
+    Returns:
+        List of embedding vectors
+    """
+    for attempt in range(max_retries):
+        await limiter.acquire(token_count)
+        try:
+            raw_response = await client.embeddings.with_raw_response.create(
+                input=texts,
+                model=model,
+                dimensions=dimensions
+            )
+        except openai.RateLimitError as e:
+            if attempt == max_retries - 1:
+                raise
+            wait = limiter.backoff(e.response.headers, attempt)
+            print(f"Rate limited, pausing requests for {wait:.1f}s")
+        except (openai.APIConnectionError, openai.InternalServerError):
+            if attempt == max_retries - 1:
+                raise
+            await asyncio.sleep(min(60, 2 ** attempt))
+        else:
+            limiter.update_from_headers(raw_response.headers)
+            return [item.embedding for item in raw_response.parse().data]
+
+
+async def generate_embeddings_async(
+    chunks_data: List[Dict],
+    batch_size: int = BATCH_SIZE,
+    output_path: Optional[str] = None,
+    checkpoint_path: Optional[str] = None,
+    resume: bool = False,
+    max_in_flight: int = MAX_IN_FLIGHT,
+    requests_per_minute: int = REQUESTS_PER_MINUTE,
+    tokens_per_minute: int = TOKENS_PER_MINUTE,
+    base_url: Optional[str] = None,
+    cache_path: Optional[str] = EMBEDDING_CACHE_PATH,
+    provider: Optional[OpenAIEmbeddingProvider] = None,
+    dtype: str = "float32"
+) -> List[Dict]:
+    """
+    Generate embeddings with several requests in flight, paced by a token-bucket limiter.
+
+    Batches finish out of order; each is appended to the checkpoint log as
+    it completes, and the results are put back in chunk order at the end.
+
+    Args:
+        chunks_data: List of dictionaries containing chunked text with metadata
+        batch_size: Maximum number of chunks per request
+        output_path: Optional path to save the embeddings: a binary store
+            if it ends in .npy, JSON otherwise
+        checkpoint_path: Optional path of the append-only checkpoint log
+        resume: Whether to resume from the checkpoint, by chunk ID
+        max_in_flight: Maximum number of concurrent requests
+        requests_per_minute: Request rate limit of the API key
+        tokens_per_minute: Token rate limit of the API key
+        base_url: Optional API base URL, e.g. a local fake embedding server;
+            ignored if a provider is given
+        cache_path: Embedding cache to consult before calling the API and
+            to fill with new embeddings; None disables the cache
+        provider: OpenAI embedding provider; defaults to the configured
+            provider, which must be the OpenAI one
+        dtype: Matrix dtype of a binary store ("float32" or "float16")
+
+    Returns:
+        List of dictionaries containing text chunks with embeddings
+    """
+    if provider is None:
+        provider = OpenAIEmbeddingProvider(base_url=base_url) if base_url else get_embedding_provider()
+    if not isinstance(provider, OpenAIEmbeddingProvider):
+        raise ValueError(f"Async mode paces OpenAI API requests; embed with {provider.name} without it")
     
-    return processed_chunks
+    done = _load_checkpoint(chunks_data, checkpoint_path, resume)
+    
+    cache = get_embedding_cache(cache_path) if cache_path else None
+    embeddings, batches = _plan_uncached_batches(chunks_data, done, batch_size, cache, provider)
+    print(f"Generating {provider.name} embeddings for {len(chunks_data) - len(embeddings)} chunks in "
+          f"{len(batches)} batches ({len(embeddings) - len(done)} cached; {max_in_flight} in flight, "
+          f"{requests_per_minute} RPM, {tokens_per_minute} TPM)...")
+    
+    client = provider.async_client(max_retries=0)
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    semaphore = asyncio.Semaphore(max_in_flight)
+    
+    async def embed_batch(
+        positions: List[int], batch: List[Dict], token_count: int
+    ) -> Tuple[List[int], List[Dict], List[List[float]]]:
+        async with semaphore:
+            texts = [chunk["text"] for chunk in batch]
+            batch_embeddings = await get_embeddings_async(
+                client, limiter, texts, token_count, provider.model, provider.dimensions
+            )
+            if cache is not None:
+                cache.put_many(provider.name, provider.dimensions, texts, batch_embeddings)
+            return positions, batch, batch_embeddings
+    
+    tasks = [
+        asyncio.create_task(embed_batch(positions, batch, token_count))
+        for positions, batch, token_count in batches
+    ]
+    started = time.perf_counter()
+    
+    try:
+        for task in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="Processing batches"):
+            positions, batch, batch_embeddings = await task
+            embeddings.update(zip(positions, batch_embeddings))
+            if checkpoint_path:
+                _log_checkpoint(checkpoint_path, batch, batch_embeddings)
+    except Exception as e:
+        print(f"Error generating embeddings: {str(e)}")
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            print(f"Progress saved to {checkpoint_path}")
+        raise
+    finally:
+        await client.close()
+    
+    elapsed = time.perf_counter() - started
+    stats = limiter.stats()
+    print(f"Generated embeddings for {len(chunks_data)} chunks in {elapsed:.1f}s "
+          f"({len(batches) / elapsed * 60 if elapsed else 0:.0f} requests/min, "
+          f"{stats['rate_limited']} rate-limited responses, {stats['seconds_waited']:.1f}s waiting on the limiter)")
+    if cache is not None:
+        cache.print_stats()
+    
+    return _finish(chunks_data, embeddings, output_path, checkpoint_path, dtype)
+
+
+def batch_job_paths(checkpoint_path: str) -> Tuple[str, str, str]:
+    """
+    Return the paths of the request file, job state and error file kept next to a checkpoint log.
+
+    Args:
+        checkpoint_path: Checkpoint log path
+
+    Returns:
+        Tuple of (JSONL request file, JSON job state, JSONL error file)
+    """
+    base = os.path.splitext(checkpoint_path)[0]
+    return f"{base}_batch_requests.jsonl", f"{base}_batch_job.json", f"{base}_batch_errors.jsonl"
+
+
+def write_batch_job(
+    batches: List[Tuple[List[int], List[Dict], int]],
+    job_path: str,
+    provider: OpenAIEmbeddingProvider
+) -> Dict[str, List[str]]:
+    """
+    Write one embeddings request per packed batch to a Batch API input file.
+
+    The Batch API limits the embedding inputs of a job, not just its
+    request lines, so the chunks are counted.
+
+    Args:
+        batches: (chunk positions, chunks, total tokens) batches to embed
+        job_path: JSONL request file to write
+        provider: Provider whose model and dimensions are requested
+
+    Returns:
+        Mapping of each request's custom_id to the chunk IDs it embeds
+
+    Raises:
+        ValueError: If the batches hold more than BATCH_MAX_INPUTS chunks
+    """
+    inputs = sum(len(batch) for _, batch, _ in batches)
+    if inputs > BATCH_MAX_INPUTS:
+        raise ValueError(f"{inputs} embedding inputs exceed the Batch API limit of {BATCH_MAX_INPUTS} per job")
+
+    requests = {}
+    with open(job_path, 'w', encoding='utf-8') as f:
+        for request_num, (_, batch, _) in enumerate(batches):
+            custom_id = f"request-{request_num}"
+            requests[custom_id] = [chunk["chunk_id"] for chunk in batch]
+            f.write(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/embeddings",
+                "body": {
+                    "model": provider.model,
+                    "input": [chunk["text"] for chunk in batch],
+                    "dimensions": provider.dimensions,
+                    "encoding_format": "float"
+                }
+            }, ensure_ascii=False) + '\n')
+    return requests
+
+
+def _save_batch_state(state_path: str, state: Dict) -> None:
+    """Write the job state atomically, so an interrupted write never loses the batch ID."""
+    temp_path = f"{state_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, state_path)
+
+
+def _wait_for_batch(client: "openai.OpenAI", batch_id: str, poll_interval: float) -> Any:
+    """Poll a batch job until it reaches a terminal status and return it."""
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        progress = f"{counts.completed}/{counts.total} requests done, {counts.failed} failed" if counts else "queued"
+        print(f"Batch job {batch_id}: {batch.status} ({progress})")
+        if batch.status in BATCH_TERMINAL_STATUSES:
+            return batch
+        time.sleep(poll_interval)
+
+
+def _merge_batch_output(
+    output: str,
+    requests: Dict[str, List[str]],
+    chunks_by_id: Dict[str, Dict],
+    checkpoint_path: str,
+    cache: Optional[EmbeddingCache],
+    provider: EmbeddingProvider
+) -> Dict[str, List[float]]:
+    """
+    Read a Batch API output file, logging each answered request to the checkpoint.
+
+    Args:
+        output: Output file content (JSON Lines)
+        requests: custom_id to chunk IDs, as written by write_batch_job
+        chunks_by_id: Current chunks by chunk ID; results for chunks that
+            no longer exist are dropped
+        checkpoint_path: Checkpoint log to append results to
+        cache: Embedding cache to fill, or None
+        provider: Provider whose name and dimensions key the cache
+
+    Returns:
+        Mapping of chunk ID to embedding
+    """
+    merged = {}
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        if response.get("status_code") != 200 or record.get("custom_id") not in requests:
+            continue
+
+        data = sorted(response["body"]["data"], key=lambda item: item["index"])
+        pairs = [
+            (chunks_by_id[chunk_id], item["embedding"])
+            for chunk_id, item in zip(requests[record["custom_id"]], data)
+            if chunk_id in chunks_by_id
+        ]
+        if not pairs:
+            continue
+        batch = [chunk for chunk, _ in pairs]
+        batch_embeddings = [embedding for _, embedding in pairs]
+
+        _log_checkpoint(checkpoint_path, batch, batch_embeddings)
+        if cache is not None:
+            cache.put_many(provider.name, provider.dimensions, [chunk["text"] for chunk in batch], batch_embeddings)
+        merged.update((chunk["chunk_id"], embedding) for chunk, embedding in pairs)
+    return merged
+
+
+def _read_batch_errors(errors: str) -> List[str]:
+    """Describe each failed request in a Batch API error file (JSON Lines)."""
+    described = []
+    for line in errors.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        error = record.get("error") or (response.get("body") or {}).get("error") or {}
+        code = error.get("code") or response.get("status_code") or "error"
+        described.append(f"{record.get('custom_id')}: {code}: {error.get('message', 'no message')}")
+    return described
+
+
+def generate_embeddings_batch(
+    chunks_data: List[Dict],
+    batch_size: int = BATCH_SIZE,
+    output_path: Optional[str] = None,
+    checkpoint_path: Optional[str] = None,
+    resume: bool = False,
+    cache_path: Optional[str] = EMBEDDING_CACHE_PATH,
+    provider: Optional[OpenAIEmbeddingProvider] = None,
+    poll_interval: float = BATCH_POLL_INTERVAL,
+    dtype: str = "float32"
+) -> List[Dict]:
+    """
+    Generate embeddings through one asynchronous Batch API job.
+
+    Every uncached chunk is written to a JSONL request file, uploaded and
+    submitted as a single job, which is polled until it finishes; results
+    are merged back by chunk ID. The job ID is saved next to the checkpoint
+    log as soon as the job is created, so an interrupted run resumed with
+    `resume` polls the same job instead of paying for a second one. Chunks
+    whose requests failed stay missing: the job's error file is saved next
+    to the checkpoint and summarized, the run raises, and resuming submits a
+    new job for just those chunks.
+
+    Args:
+        chunks_data: List of dictionaries containing chunked text with metadata
+        batch_size: Maximum number of chunks per request in the job
+        output_path: Optional path to save the embeddings: a binary store
+            if it ends in .npy, JSON otherwise
+        checkpoint_path: Checkpoint log path; the job files are kept next to it
+        resume: Whether to resume the submitted job and the checkpoint
+        cache_path: Embedding cache to consult before submitting and to fill
+            with the results; None disables the cache
+        provider: OpenAI embedding provider; defaults to the configured
+            provider, which must be the OpenAI one
+        poll_interval: Seconds between job status checks
+        dtype: Matrix dtype of a binary store ("float32" or "float16")
+
+    Returns:
+        List of dictionaries containing text chunks with embeddings
+    """
+    provider = provider or get_embedding_provider()
+    if not isinstance(provider, OpenAIEmbeddingProvider):
+        raise ValueError(f"Batch-job mode uses the OpenAI Batch API; embed with {provider.name} without it")
+    if not checkpoint_path:
+        raise ValueError("Batch-job mode needs a checkpoint path to keep the job state next to")
+
+    job_path, state_path, errors_path = batch_job_paths(checkpoint_path)
+    state = None
+    if os.path.exists(state_path):
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if not resume:
+            print(f"Starting over; cancel the previous batch job {state['batch_id']} if it is still running")
+            os.remove(state_path)
+            state = None
+
+    done = _load_checkpoint(chunks_data, checkpoint_path, resume)
+    cache = get_embedding_cache(cache_path) if cache_path else None
+    embeddings, batches = _plan_uncached_batches(chunks_data, done, batch_size, cache, provider)
+    client = provider.client
+
+    if state is None:
+        if not batches:
+            return _finish(chunks_data, embeddings, output_path, checkpoint_path, dtype)
+
+        requests = write_batch_job(batches, job_path, provider)
+        with open(job_path, 'rb') as f:
+            input_file = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/embeddings",
+            completion_window=BATCH_COMPLETION_WINDOW
+        )
+        state = {"batch_id": batch.id, "input_file_id": input_file.id, "requests": requests}
+        _save_batch_state(state_path, state)
+        print(f"Submitted batch job {batch.id}: {len(requests)} requests for "
+              f"{len(chunks_data) - len(embeddings)} chunks ({len(embeddings) - len(done)} cached)")
+    else:
+        print(f"Resuming batch job {state['batch_id']}")
+
+    batch = _wait_for_batch(client, state["batch_id"], poll_interval)
+    if batch.status == "failed" and batch.errors:
+        for error in batch.errors.data or []:
+            print(f"Batch job error: {error.message}")
+
+    chunks_by_id = {chunk["chunk_id"]: chunk for chunk in chunks_data}
+    # Truncated copies, so the cache is filled under the text that was embedded
+    chunks_by_id.update((chunk["chunk_id"], chunk) for _, planned, _ in batches for chunk in planned)
+    merged = {}
+    if batch.output_file_id:
+        output = client.files.content(batch.output_file_id).text
+        merged = _merge_batch_output(output, state["requests"], chunks_by_id, checkpoint_path, cache, provider)
+    errors = []
+    if batch.error_file_id:
+        error_output = client.files.content(batch.error_file_id).text
+        with open(errors_path, 'w', encoding='utf-8') as f:
+            f.write(error_output)
+        errors = _read_batch_errors(error_output)
+        print(f"Batch job {batch.id}: {len(errors)} requests failed (saved to {errors_path})")
+        for error in errors[:BATCH_ERRORS_SHOWN]:
+            print(f"  {error}")
+    embeddings.update(
+        (position, merged[chunk["chunk_id"]])
+        for position, chunk in enumerate(chunks_data)
+        if chunk["chunk_id"] in merged
+    )
+
+    # The job is over; what it produced is in the checkpoint log
+    os.remove(state_path)
+    if os.path.exists(job_path):
+        os.remove(job_path)
+    if not errors and os.path.exists(errors_path):
+        os.remove(errors_path)  # Left by an earlier job whose failures this one retried
+
+    missing = len(chunks_data) - len(embeddings)
+    if missing:
+        first_error = f" (first error: {errors[0]})" if errors else ""
+        raise RuntimeError(f"Batch job {batch.id} ended {batch.status} with {len(errors)} failed requests and "
+                           f"{missing} chunks not embedded{first_error}; progress saved to {checkpoint_path}, "
+                           f"resume to submit a job for the rest")
+
+    print(f"Generated embeddings for {len(chunks_data)} chunks ({len(merged)} from batch job {batch.id})")
+    if cache is not None:
+        cache.print_stats()
+    return _finish(chunks_data, embeddings, output_path, checkpoint_path, dtype)
 
 
 if __name__ == "__main__":
@@ -171,12 +787,34 @@ if __name__ == "__main__":
     
     parser = argparse.ArgumentParser(description="Generate embeddings for text chunks")
     parser.add_argument("input_json", help="Path to the JSON file with chunked text")
-    parser.add_argument("--output", "-o", help="Output JSON file path for embeddings")
+    parser.add_argument("--output", "-o", help="Output path for embeddings (.npy binary store or .json)")
     parser.add_argument("--batch-size", "-b", type=int, default=BATCH_SIZE,
-                        help=f"Batch size for API calls (default: {BATCH_SIZE})")
-    parser.add_argument("--checkpoint", "-c", help="Checkpoint file path")
+                        help=f"Maximum chunks per API call (default: {BATCH_SIZE}); "
+                             f"batches are packed up to {MAX_BATCH_TOKENS} tokens")
+    parser.add_argument("--checkpoint", "-c", help="Checkpoint log path (.jsonl)")
     parser.add_argument("--resume", "-r", action="store_true",
                         help="Resume from checkpoint")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Send concurrent requests paced by a requests/tokens per minute limiter")
+    parser.add_argument("--batch-api", action="store_true",
+                        help="Submit all requests as one Batch API job and wait for it (needs --checkpoint)")
+    parser.add_argument("--poll-interval", type=float, default=BATCH_POLL_INTERVAL,
+                        help=f"Seconds between batch job status checks (default: {BATCH_POLL_INTERVAL})")
+    parser.add_argument("--concurrency", type=int, default=MAX_IN_FLIGHT,
+                        help=f"Maximum requests in flight in async mode (default: {MAX_IN_FLIGHT})")
+    parser.add_argument("--rpm", type=int, default=REQUESTS_PER_MINUTE,
+                        help=f"Requests per minute limit in async mode (default: {REQUESTS_PER_MINUTE})")
+    parser.add_argument("--tpm", type=int, default=TOKENS_PER_MINUTE,
+                        help=f"Tokens per minute limit in async mode (default: {TOKENS_PER_MINUTE})")
+    parser.add_argument("--cache", default=EMBEDDING_CACHE_PATH,
+                        help=f"Embedding cache database (default: {EMBEDDING_CACHE_PATH})")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the embedding cache")
+    parser.add_argument("--base-url", help="API base URL, e.g. http://127.0.0.1:8765/v1 for fake_embedding_server.py")
+    parser.add_argument("--provider", choices=PROVIDERS,
+                        help="Embedding provider (default: EMBEDDING_PROVIDER environment variable, else openai)")
+    parser.add_argument("--model-dir", help="Model directory for the local provider")
+    parser.add_argument("--dtype", choices=DTYPES, default="float32",
+                        help="Matrix dtype of a .npy output; float16 halves its size (default: float32)")
     
     args = parser.parse_args()
     
@@ -184,10 +822,46 @@ if __name__ == "__main__":
     with open(args.input_json, 'r', encoding='utf-8') as f:
         chunks_data = json.load(f)
     
-    generate_embeddings(
-        chunks_data,
-        args.batch_size,
-        args.output,
-        args.checkpoint,
-        args.resume
-    )
+    if args.base_url:
+        provider = OpenAIEmbeddingProvider(base_url=args.base_url)
+    else:
+        provider = get_embedding_provider(args.provider, args.model_dir)
+    
+    if args.batch_api:
+        generate_embeddings_batch(
+            chunks_data,
+            args.batch_size,
+            args.output,
+            args.checkpoint,
+            args.resume,
+            None if args.no_cache else args.cache,
+            provider,
+            args.poll_interval,
+            args.dtype
+        )
+    elif args.use_async:
+        asyncio.run(generate_embeddings_async(
+            chunks_data,
+            args.batch_size,
+            args.output,
+            args.checkpoint,
+            args.resume,
+            args.concurrency,
+            args.rpm,
+            args.tpm,
+            args.base_url,
+            None if args.no_cache else args.cache,
+            provider,
+            args.dtype
+        ))
+    else:
+        generate_embeddings(
+            chunks_data,
+            args.batch_size,
+            args.output,
+            args.checkpoint,
+            args.resume,
+            cache_path=None if args.no_cache else args.cache,
+            provider=provider,
+            dtype=args.dtype
+        )
@@ -0,0 +1,405 @@
+"""
+Fake Embedding Server
+
+This module runs a local stand-in for the OpenAI embeddings endpoint, so the
+async embedding mode and its rate limiter can be exercised without spending
+API credits. It enforces requests-per-minute and tokens-per-minute limits over
+a sliding one-minute window, answers with the same x-ratelimit-* headers and
+429 responses as the real API, and returns deterministic pseudo-embeddings.
+
+It also stands in for the Files and Batch APIs (POST /files, POST /batches,
+GET /batches/{id}, GET /files/{id}/content) so the batch-job embedding mode
+can run offline; a submitted job completes after a configurable delay.
+
+Example:
+    python fake_embedding_server.py --rpm 600 --tpm 200000
+    OPENAI_API_KEY=fake python embeddings_generator.py output/doc_chunked.json \\
+        --async --rpm 600 --tpm 200000 --base-url http://127.0.0.1:8765/v1
+    OPENAI_API_KEY=fake python embeddings_generator.py output/doc_chunked.json \
+        --batch-api --checkpoint output/doc_checkpoint.jsonl --base-url http://127.0.0.1:8765/v1
+"""
+
+import json
+import time
+import uuid
+import base64
+import struct
+import random
+import hashlib
+import threading
+from collections import deque
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import tiktoken
+
+DEFAULT_PORT = 8765
+WINDOW = 60.0  # Seconds covered by the rate limits
+
+
+def fake_embedding(text: str, dimensions: int) -> List[float]:
+    """Return a deterministic unit-length pseudo-embedding for a text."""
+    rng = random.Random(hashlib.sha256(text.encode('utf-8')).digest())
+    vector = [rng.gauss(0, 1) for _ in range(dimensions)]
+    norm = sum(value * value for value in vector) ** 0.5 or 1.0
+    return [value / norm for value in vector]
+
+
+class SlidingWindowLimits:
+    """Requests and tokens admitted over the last WINDOW seconds."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.admitted = deque()  # (timestamp, tokens)
+        self.tokens = 0
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "rejected": 0, "tokens": 0, "started": time.monotonic()}
+
+    def _expire(self, now: float) -> None:
+        while self.admitted and self.admitted[0][0] <= now - WINDOW:
+            self.tokens -= self.admitted.popleft()[1]
+
+    def _reset_after(self, now: float, excess_requests: int, excess_tokens: int) -> Tuple[float, float]:
+        """Seconds until enough old requests/tokens leave the window."""
+        reset_requests = reset_tokens = 0.0
+        freed_tokens = 0
+        for i, (timestamp, tokens) in enumerate(self.admitted):
+            freed_tokens += tokens
+            if i + 1 >= excess_requests and not reset_requests:
+                reset_requests = timestamp + WINDOW - now
+            if freed_tokens >= excess_tokens and not reset_tokens:
+                reset_tokens = timestamp + WINDOW - now
+            if reset_requests and reset_tokens:
+                break
+        return max(reset_requests, 0.0), max(reset_tokens, 0.0)
+
+    def admit(self, tokens: int) -> Tuple[bool, Dict[str, str]]:
+        """
+        Admit or reject a request of `tokens` tokens.
+
+        Returns:
+            Tuple of (admitted, rate-limit headers)
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._expire(now)
+            excess_requests = len(self.admitted) + 1 - self.requests_per_minute
+            excess_tokens = self.tokens + tokens - self.tokens_per_minute
+            admitted = excess_requests <= 0 and excess_tokens <= 0
+
+            if admitted:
+                self.admitted.append((now, tokens))
+                self.tokens += tokens
+                self.stats["requests"] += 1
+                self.stats["tokens"] += tokens
+            else:
+                self.stats["rejected"] += 1
+
+            reset_requests, reset_tokens = self._reset_after(now, max(excess_requests, 1), max(excess_tokens, 1))
+            headers = {
+                "x-ratelimit-limit-requests": str(self.requests_per_minute),
+                "x-ratelimit-limit-tokens": str(self.tokens_per_minute),
+                "x-ratelimit-remaining-requests": str(max(0, self.requests_per_minute - len(self.admitted))),
+                "x-ratelimit-remaining-tokens": str(max(0, self.tokens_per_minute - self.tokens)),
+                "x-ratelimit-reset-requests": f"{reset_requests:.3f}s",
+                "x-ratelimit-reset-tokens": f"{reset_tokens:.3f}s"
+            }
+            if not admitted:
+                headers["retry-after-ms"] = str(int(max(reset_requests, reset_tokens) * 1000) + 1)
+            return admitted, headers
+
+
+def embedding_response(request: Dict, tokens: int) -> Dict:
+    """Build an embeddings API response body for a request body."""
+    texts = request["input"] if isinstance(request["input"], list) else [request["input"]]
+    dimensions = request.get("dimensions") or 1536
+    data = []
+    for i, text in enumerate(texts):
+        embedding = fake_embedding(text, dimensions)
+        if request.get("encoding_format") == "base64":
+            embedding = base64.b64encode(struct.pack(f"<{dimensions}f", *embedding)).decode('ascii')
+        data.append({"object": "embedding", "index": i, "embedding": embedding})
+    return {
+        "object": "list",
+        "data": data,
+        "model": request.get("model", ""),
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+    }
+
+
+class FakeBatchService:
+    """In-memory stand-in for the Files and Batch APIs, for /v1/embeddings jobs."""
+
+    def __init__(self, delay: float, count_tokens):
+        self.delay = delay
+        self.count_tokens = count_tokens
+        self.files = {}  # file ID -> (file object, content bytes)
+        self.batches = {}
+        self.lock = threading.Lock()
+
+    def add_file(self, content: bytes, filename: str, purpose: str) -> Dict:
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        file_object = {
+            "id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+            "filename": filename, "purpose": purpose, "status": "processed"
+        }
+        with self.lock:
+            self.files[file_id] = (file_object, content)
+        return file_object
+
+    def get_file(self, file_id: str) -> Optional[Tuple[Dict, bytes]]:
+        with self.lock:
+            return self.files.get(file_id)
+
+    def create_batch(self, request: Dict) -> Dict:
+        batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+        batch = {
+            "id": batch_id, "object": "batch", "endpoint": request.get("endpoint"),
+            "input_file_id": request.get("input_file_id"),
+            "completion_window": request.get("completion_window", "24h"),
+            "status": "validating", "created_at": int(time.time()),
+            "output_file_id": None, "error_file_id": None, "errors": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "metadata": request.get("metadata")
+        }
+        with self.lock:
+            self.batches[batch_id] = batch
+        threading.Thread(target=self._run, args=(batch_id,), daemon=True).start()
+        return dict(batch)
+
+    def get_batch(self, batch_id: str) -> Optional[Dict]:
+        with self.lock:
+            batch = self.batches.get(batch_id)
+            return dict(batch) if batch else None
+
+    def cancel_batch(self, batch_id: str) -> Optional[Dict]:
+        with self.lock:
+            batch = self.batches.get(batch_id)
+            if batch and batch["status"] in ("validating", "in_progress"):
+                batch["status"] = "cancelling"
+            return dict(batch) if batch else None
+
+    def _run(self, batch_id: str) -> None:
+        """Answer every request of a job after the configured delay."""
+        with self.lock:
+            batch = self.batches[batch_id]
+            stored = self.files.get(batch["input_file_id"])
+        if stored is None:
+            with self.lock:
+                batch["status"] = "failed"
+                batch["errors"] = {"object": "list", "data": [{"code": "invalid_file",
+                                                              "message": "Input file not found"}]}
+            return
+
+        lines = [json.loads(line) for line in stored[1].decode('utf-8').splitlines() if line.strip()]
+        with self.lock:
+            batch["status"] = "in_progress"
+            batch["request_counts"]["total"] = len(lines)
+        time.sleep(self.delay)
+
+        outputs, errors = [], []
+        for line in lines:
+            record = {"id": f"batch_req_{uuid.uuid4().hex[:24]}", "custom_id": line.get("custom_id")}
+            if line.get("url") != "/v1/embeddings":
+                errors.append({**record, "response": None,
+                               "error": {"code": "invalid_url", "message": f"Unsupported URL {line.get('url')}"}})
+                continue
+            body = line["body"]
+            texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            tokens = sum(self.count_tokens(text) for text in texts)
+            outputs.append({**record, "error": None, "response": {
+                "status_code": 200, "request_id": uuid.uuid4().hex, "body": embedding_response(body, tokens)
+            }})
+
+        with self.lock:
+            if batch["status"] == "cancelling":
+                batch["status"] = "cancelled"
+                return
+
+        # add_file takes the lock itself
+        output_file = self.add_file(
+            "".join(json.dumps(record) + "\n" for record in outputs).encode('utf-8'),
+            "batch_output.jsonl", "batch_output"
+        ) if outputs else None
+        error_file = self.add_file(
+            "".join(json.dumps(record) + "\n" for record in errors).encode('utf-8'),
+            "batch_errors.jsonl", "batch_output"
+        ) if errors else None
+        with self.lock:
+            batch["output_file_id"] = output_file["id"] if output_file else None
+            batch["error_file_id"] = error_file["id"] if error_file else None
+            batch["request_counts"]["completed"] = len(outputs)
+            batch["request_counts"]["failed"] = len(errors)
+            batch["status"] = "completed"
+            batch["completed_at"] = int(time.time())
+
+
+def make_handler(limits: SlidingWindowLimits, latency: float, batch_delay: float = 2.0):
+    """Build a request handler class bound to a set of limits."""
+    encoding = tiktoken.get_encoding("cl100k_base")
+    batch_service = FakeBatchService(batch_delay, lambda text: len(encoding.encode(text)))
+
+    class EmbeddingHandler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, body: Dict, headers: Dict[str, str]) -> None:
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _route(self) -> List[str]:
+            """Path segments after the /v1 prefix, e.g. ["batches", "<id>"]."""
+            parts = [part for part in self.path.split('?')[0].split('/') if part]
+            return parts[1:] if parts[:1] == ["v1"] else parts
+
+        def _read_body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def _not_found(self) -> None:
+            self._reply(404, {"error": {"message": f"Unknown path {self.path}"}}, {})
+
+        def do_POST(self):
+            route = self._route()
+            if route == ["embeddings"]:
+                self._embeddings(json.loads(self._read_body()))
+            elif route == ["files"]:
+                self._upload_file()
+            elif route == ["batches"]:
+                self._reply(200, batch_service.create_batch(json.loads(self._read_body())), {})
+            elif len(route) == 3 and route[0] == "batches" and route[2] == "cancel":
+                batch = batch_service.cancel_batch(route[1])
+                if batch is None:
+                    self._not_found()
+                else:
+                    self._reply(200, batch, {})
+            else:
+                self._not_found()
+
+        def do_GET(self):
+            route = self._route()
+            if len(route) == 2 and route[0] == "batches":
+                batch = batch_service.get_batch(route[1])
+                if batch is None:
+                    self._not_found()
+                else:
+                    self._reply(200, batch, {})
+            elif len(route) == 3 and route[0] == "files" and route[2] == "content":
+                stored = batch_service.get_file(route[1])
+                if stored is None:
+                    self._not_found()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(stored[1])))
+                self.end_headers()
+                self.wfile.write(stored[1])
+            elif len(route) == 2 and route[0] == "files":
+                stored = batch_service.get_file(route[1])
+                if stored is None:
+                    self._not_found()
+                else:
+                    self._reply(200, stored[0], {})
+            else:
+                self._not_found()
+
+        def _upload_file(self) -> None:
+            """Store a multipart/form-data upload with `file` and `purpose` fields."""
+            message = BytesParser(policy=default_policy).parsebytes(
+                f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode('utf-8') + self._read_body()
+            )
+            fields = {}
+            for part in message.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                fields[name] = (part.get_filename(), part.get_payload(decode=True))
+            if "file" not in fields:
+                self._reply(400, {"error": {"message": "Missing file field"}}, {})
+                return
+            filename, content = fields["file"]
+            purpose = fields.get("purpose", (None, b"batch"))[1].decode('utf-8')
+            self._reply(200, batch_service.add_file(content, filename or "upload.jsonl", purpose), {})
+
+        def _embeddings(self, request: Dict) -> None:
+            texts = request["input"] if isinstance(request["input"], list) else [request["input"]]
+            tokens = sum(len(encoding.encode(text)) for text in texts)
+
+            admitted, headers = limits.admit(tokens)
+            if not admitted:
+                self._reply(429, {"error": {"message": "Rate limit reached", "type": "requests",
+                                            "code": "rate_limit_exceeded"}}, headers)
+                return
+
+            time.sleep(latency)
+            self._reply(200, embedding_response(request, tokens), headers)
+
+        def log_message(self, format, *args):
+            pass
+
+    return EmbeddingHandler
+
+
+def start_server(
+    port: int = DEFAULT_PORT,
+    requests_per_minute: int = 3000,
+    tokens_per_minute: int = 1000000,
+    latency: float = 0.2,
+    batch_delay: float = 2.0
+) -> Tuple[ThreadingHTTPServer, SlidingWindowLimits]:
+    """
+    Start the fake embedding server in a background thread.
+
+    Args:
+        port: Port to listen on (0 picks a free port)
+        requests_per_minute: Request limit to enforce
+        tokens_per_minute: Token limit to enforce
+        latency: Seconds each successful request takes
+        batch_delay: Seconds a batch job takes to complete
+
+    Returns:
+        Tuple of (server, limits); call server.shutdown() to stop it and read
+        limits.stats for the requests served and rejected
+    """
+    limits = SlidingWindowLimits(requests_per_minute, tokens_per_minute)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(limits, latency, batch_delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, limits
+
+
+def print_server_stats(limits: SlidingWindowLimits) -> None:
+    """Print the throughput the server observed."""
+    stats = limits.stats
+    minutes = (time.monotonic() - stats["started"]) / 60
+    print(f"Served {stats['requests']} requests ({stats['tokens']} tokens), "
+          f"rejected {stats['rejected']} with 429; "
+          f"{stats['requests'] / minutes:.0f} requests/min, {stats['tokens'] / minutes:.0f} tokens/min")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local fake OpenAI embeddings endpoint")
+    parser.add_argument("--port", "-p", type=int, default=DEFAULT_PORT,
+                        help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--rpm", type=int, default=3000, help="Requests per minute to allow (default: 3000)")
+    parser.add_argument("--tpm", type=int, default=1000000, help="Tokens per minute to allow (default: 1000000)")
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Seconds each successful request takes (default: 0.2)")
+    parser.add_argument("--batch-delay", type=float, default=2.0,
+                        help="Seconds a batch job takes to complete (default: 2.0)")
+
+    args = parser.parse_args()
+
+    server, limits = start_server(args.port, args.rpm, args.tpm, args.latency, args.batch_delay)
+    print(f"Fake embedding server on http://127.0.0.1:{server.server_port}/v1 "
+          f"({args.rpm} RPM, {args.tpm} TPM); Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print_server_stats(limits)
@@ -0,0 +1,317 @@
+"""
+Index Sync Module
+
+This module brings the Pinecone index in line with a document's local
+embeddings. It diffs a local manifest (chunk ID to content hash) against the
+IDs actually in the index, upserts only new or changed vectors and deletes
+orphans: vectors of the same document whose chunks no longer exist after
+re-chunking. The plan is printed before anything is applied.
+
+Chunk IDs are content-addressed, so changed text always means a new ID. A
+vector can still change under the same ID when its metadata (e.g. page) or
+embedding changes; to catch those, the fingerprints of the last applied sync
+are kept in `<name>_index_manifest.json` next to the embeddings. Vectors in
+the index that this file does not vouch for are re-upserted.
+
+Orphans are found by listing the document's ID prefix, its collision-free
+source namespace. Before anything is deleted, the orphans' metadata is
+fetched, and vectors whose `source` is not the synced document's are kept.
+Vectors uploaded under the old positional IDs (e.g. "12_0") cannot be listed
+by prefix; `--legacy` lists every ID in the index once and deletes the
+positional ones whose `source` is the synced document.
+
+Example:
+    python index_sync.py output/doc_embeddings.npy --dry-run
+    python index_sync.py output/doc_embeddings.npy --yes
+    python index_sync.py output/doc_embeddings.npy --legacy --yes
+"""
+
+import os
+import re
+import json
+import hashlib
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+from embedding_store import load_embeddings
+from pinecone_uploader import (
+    INDEX_NAME, DELETE_BATCH_SIZE, SLIM_METADATA, delete_from_pinecone, initialize_pinecone, prepare_vectors,
+    upload_to_pinecone
+)
+
+SYNC_MANIFEST_VERSION = 1
+PLAN_EXAMPLES = 5  # IDs listed per category when printing a plan
+FETCH_BATCH_SIZE = 100  # IDs per fetch request, which carries them in the URL
+LEGACY_ID = re.compile(r'^\d+_\d+$')  # Positional "<page>_<chunk>" IDs from before content-addressed IDs
+
+
+def vector_fingerprint(chunk: Dict, slim_metadata: bool = False) -> str:
+    """
+    Hash everything uploaded for a chunk: its fields, its metadata and its embedding.
+
+    The fields go to the chunk store and the metadata to the index, so
+    switching between slim and full metadata changes every fingerprint.
+
+    Args:
+        chunk: Chunk with an `embedding` list
+        slim_metadata: Whether the metadata is uploaded slim
+
+    Returns:
+        SHA-256 hex digest
+    """
+    uploaded = {
+        "fields": {k: v for k, v in chunk.items() if k != "embedding"},
+        "metadata": prepare_vectors([chunk], slim_metadata)[0]["metadata"]
+    }
+    digest = hashlib.sha256(json.dumps(uploaded, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+    digest.update(array('f', chunk["embedding"]).tobytes())
+    return digest.hexdigest()
+
+
+def id_prefix(chunk_id: str) -> str:
+    """
+    Return the source namespace prefix shared by all chunk IDs of one document.
+
+    Raises:
+        ValueError: For a positional ID, which has no namespace to list by
+    """
+    if ":" not in chunk_id:
+        raise ValueError(f"Chunk {chunk_id} has a positional ID; re-chunk the document to get "
+                         f"content-addressed IDs before syncing")
+    return chunk_id.split(":", 1)[0] + ":"
+
+
+def sync_manifest_path(embeddings_path: str) -> str:
+    """Return the path of the applied-sync manifest kept next to an embeddings artifact."""
+    base = os.path.splitext(embeddings_path)[0]
+    if base.endswith("_embeddings"):
+        base = base[:-len("_embeddings")]
+    return f"{base}_index_manifest.json"
+
+
+def load_sync_manifest(path: str) -> Dict[str, str]:
+    """
+    Load the fingerprints of the last applied sync.
+
+    Returns:
+        Mapping of chunk ID to vector fingerprint; empty if there is none
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("version") != SYNC_MANIFEST_VERSION or manifest.get("index") != INDEX_NAME:
+        print(f"Ignoring sync manifest for another index or version: {path}")
+        return {}
+    return manifest["vectors"]
+
+
+def save_sync_manifest(path: str, fingerprints: Dict[str, str]) -> None:
+    """Save the fingerprints of the vectors the index now holds."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"version": SYNC_MANIFEST_VERSION, "index": INDEX_NAME, "vectors": fingerprints}, f, indent=2)
+
+
+def list_index_ids(index, prefixes: Iterable[str], namespace: str = "") -> Set[str]:
+    """
+    List the IDs in the index that start with any of the prefixes.
+
+    Args:
+        index: Pinecone index
+        prefixes: ID prefixes, one per document
+        namespace: Index namespace
+
+    Returns:
+        Set of vector IDs
+    """
+    if not hasattr(index, "list"):
+        raise RuntimeError("Listing vector IDs needs pinecone-client 3.1 or later and a serverless index")
+    ids = set()
+    for prefix in prefixes:
+        for page in index.list(prefix=prefix, namespace=namespace):
+            ids.update(page)
+    return ids
+
+
+def _field(obj: Any, name: str) -> Any:
+    """Read a field from a REST (dict-like) or gRPC response object."""
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def fetch_sources(index, ids: Sequence[str], namespace: str = "") -> Dict[str, Optional[str]]:
+    """
+    Fetch the `source` metadata of vectors in batches.
+
+    Args:
+        index: Pinecone index
+        ids: Vector IDs
+        namespace: Index namespace
+
+    Returns:
+        Mapping of vector ID to its source, None for vectors without one
+    """
+    sources = {}
+    for i in range(0, len(ids), FETCH_BATCH_SIZE):
+        response = index.fetch(ids=list(ids[i:i + FETCH_BATCH_SIZE]), namespace=namespace)
+        for vector_id, vector in (_field(response, "vectors") or {}).items():
+            sources[vector_id] = (_field(vector, "metadata") or {}).get("source")
+    return sources
+
+
+def plan_sync(local: Dict[str, str], index_ids: Set[str], synced: Dict[str, str]) -> Dict[str, List[str]]:
+    """
+    Work out which vectors to upsert and delete.
+
+    Args:
+        local: Local manifest of chunk ID to vector fingerprint
+        index_ids: IDs currently in the index (for the same documents)
+        synced: Fingerprints of the last applied sync
+
+    Returns:
+        Dictionary with lists of new, changed, unchanged and orphan IDs, and
+        empty lists of legacy and foreign IDs for the source check to fill
+    """
+    plan = {
+        "new": [], "changed": [], "unchanged": [], "orphans": sorted(index_ids - set(local)),
+        "legacy": [], "foreign": []
+    }
+    for chunk_id, fingerprint in local.items():
+        if chunk_id not in index_ids:
+            plan["new"].append(chunk_id)
+        elif synced.get(chunk_id) != fingerprint:
+            plan["changed"].append(chunk_id)
+        else:
+            plan["unchanged"].append(chunk_id)
+    return plan
+
+
+def check_sources(index, plan: Dict[str, List[str]], sources: Set[str], legacy: bool = False) -> None:
+    """
+    Keep deletions to vectors whose metadata names one of the synced sources.
+
+    Orphans from another source (or without source metadata) move to
+    `foreign` and are kept. With legacy, the positional IDs of the synced
+    sources are added to `legacy` for deletion.
+
+    Args:
+        index: Pinecone index
+        plan: Plan from plan_sync, updated in place
+        sources: Source names of the local chunks
+        legacy: Also look for vectors under positional IDs
+    """
+    orphan_sources = fetch_sources(index, plan["orphans"])
+    plan["foreign"] = [vector_id for vector_id in plan["orphans"] if orphan_sources.get(vector_id) not in sources]
+    plan["orphans"] = [vector_id for vector_id in plan["orphans"] if orphan_sources.get(vector_id) in sources]
+
+    if legacy:
+        positional = sorted(vector_id for vector_id in list_index_ids(index, [""]) if LEGACY_ID.match(vector_id))
+        legacy_sources = fetch_sources(index, positional)
+        plan["legacy"] = [vector_id for vector_id in positional if legacy_sources.get(vector_id) in sources]
+
+
+def print_sync_plan(plan: Dict[str, List[str]], prefixes: Sequence[str], index_count: int) -> None:
+    """Print the sync plan with a few example IDs per category."""
+    print("\n=== Index Sync Plan ===")
+    print(f"Index {INDEX_NAME}, prefixes {', '.join(prefixes)}: {index_count} vectors in the index, "
+          f"{len(plan['new']) + len(plan['changed']) + len(plan['unchanged'])} local chunks")
+    deletes = len(plan["orphans"]) + len(plan["legacy"])
+    print(f"Upsert: {len(plan['new'])} new, {len(plan['changed'])} changed; "
+          f"{len(plan['unchanged'])} unchanged; delete: {len(plan['orphans'])} orphans, "
+          f"{len(plan['legacy'])} legacy (in {(deletes + DELETE_BATCH_SIZE - 1) // DELETE_BATCH_SIZE} requests)")
+    if plan["foreign"]:
+        print(f"Keeping {len(plan['foreign'])} vectors under these prefixes whose source metadata "
+              f"is not this document's")
+    for category in ("new", "changed", "orphans", "legacy", "foreign"):
+        if plan[category]:
+            examples = ", ".join(plan[category][:PLAN_EXAMPLES])
+            more = f" and {len(plan[category]) - PLAN_EXAMPLES} more" if len(plan[category]) > PLAN_EXAMPLES else ""
+            print(f"  {category}: {examples}{more}")
+
+
+def sync_index(
+    embeddings_path: str,
+    manifest_path: Optional[str] = None,
+    dry_run: bool = False,
+    confirm: bool = True,
+    slim_metadata: Optional[bool] = None,
+    legacy: bool = False
+) -> Dict[str, List[str]]:
+    """
+    Sync one document's vectors in the index with its local embeddings.
+
+    Args:
+        embeddings_path: Embeddings artifact (.npy store or JSON)
+        manifest_path: Applied-sync manifest (default: next to the embeddings)
+        dry_run: Only print the plan
+        confirm: Ask before applying the plan
+        slim_metadata: Upload only filter fields as metadata; defaults to
+            PINECONE_SLIM_METADATA
+        legacy: Also delete this document's vectors under positional IDs,
+            which needs a listing of every ID in the index
+
+    Returns:
+        The sync plan
+    """
+    chunks = load_embeddings(embeddings_path)
+    manifest_path = manifest_path or sync_manifest_path(embeddings_path)
+    if slim_metadata is None:
+        slim_metadata = SLIM_METADATA
+
+    chunk_ids = []
+    local = {}
+    for chunk in chunks:
+        chunk_ids.append(chunk["chunk_id"])
+        local[chunk["chunk_id"]] = vector_fingerprint(chunk, slim_metadata)
+    prefixes = sorted({id_prefix(chunk_id) for chunk_id in local})
+
+    index = initialize_pinecone()
+    index_ids = list_index_ids(index, prefixes)
+    plan = plan_sync(local, index_ids, load_sync_manifest(manifest_path))
+    check_sources(index, plan, {chunk["source"] for chunk in chunks}, legacy)
+    print_sync_plan(plan, prefixes, len(index_ids))
+
+    to_upsert = set(plan["new"]) | set(plan["changed"])
+    to_delete = plan["orphans"] + plan["legacy"]
+    if not to_upsert and not to_delete:
+        print("Index is in sync")
+        save_sync_manifest(manifest_path, local)
+        return plan
+    if dry_run:
+        print("Dry run: nothing applied")
+        return plan
+    if confirm and input("Apply this plan? [y/N] ").strip().lower() not in ("y", "yes"):
+        print("Sync cancelled")
+        return plan
+
+    if to_upsert:
+        rows = [row for row, chunk_id in enumerate(chunk_ids) if chunk_id in to_upsert]
+        upload_to_pinecone([chunks[row] for row in rows], slim_metadata=slim_metadata)
+    delete_from_pinecone(to_delete)
+
+    save_sync_manifest(manifest_path, local)
+    print(f"Sync applied; saved {manifest_path}")
+    return plan
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Sync the Pinecone index with local embeddings: upsert new or changed vectors, delete orphans"
+    )
+    parser.add_argument("embeddings", help="Embeddings of one document (.npy binary store or JSON file)")
+    parser.add_argument("--manifest", "-m", help="Applied-sync manifest (default: <name>_index_manifest.json)")
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan without applying it")
+    parser.add_argument("--yes", "-y", action="store_true", help="Apply the plan without asking")
+    parser.add_argument("--legacy", action="store_true",
+                        help="Also delete this document's vectors under old positional IDs (lists every ID once)")
+    parser.add_argument("--slim-metadata", action="store_true", default=None,
+                        help="Upload only filter fields as metadata (default: PINECONE_SLIM_METADATA)")
+
+    args = parser.parse_args()
+
+    sync_index(args.embeddings, args.manifest, dry_run=args.dry_run, confirm=not args.yes,
+               slim_metadata=args.slim_metadata, legacy=args.legacy)
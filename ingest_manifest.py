@@ -0,0 +1,239 @@
+"""
+Ingestion Manifest Module
+
+This module tracks content fingerprints of ingested pages and chunks so that a
+re-run on an amended document only re-embeds and re-uploads what changed.
+A manifest records a SHA-256 hash per page and per chunk (plus the page each
+chunk sits on and a hash of its other fields), together with the
+extractor/chunker/embedding settings the hashes were produced under.
+"""
+
+import os
+import json
+import hashlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+MANIFEST_VERSION = 2
+
+
+def hash_text(text: str) -> str:
+    """Return the SHA-256 hex digest of a text string."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def settings_fingerprint(settings: Dict) -> str:
+    """
+    Hash a settings dictionary so any change to it invalidates stored hashes.
+
+    Args:
+        settings: Extractor, chunker and embedding settings
+
+    Returns:
+        SHA-256 hex digest of the settings
+    """
+    return hash_text(json.dumps(settings, sort_keys=True))
+
+
+def page_fingerprint(page_data: Dict) -> str:
+    """
+    Hash a page's content, including any structured tables extracted from it.
+
+    Args:
+        page_data: Extracted page
+
+    Returns:
+        SHA-256 hex digest of the page content
+    """
+    content = page_data["text"]
+    if page_data.get("tables"):
+        content += json.dumps(page_data["tables"], ensure_ascii=False, sort_keys=True)
+    return hash_text(content)
+
+
+def metadata_fingerprint(chunk: Dict) -> str:
+    """
+    Hash the fields of a chunk other than its text and embedding.
+
+    These are what the upload sends as metadata (and to the chunk store), so
+    a section title, alias page or character span that changes while the
+    text stays the same still changes the fingerprint.
+
+    Args:
+        chunk: Chunk dictionary
+
+    Returns:
+        SHA-256 hex digest of the fields
+    """
+    fields = {k: v for k, v in chunk.items() if k not in ("text", "embedding")}
+    return hash_text(json.dumps(fields, ensure_ascii=False, sort_keys=True))
+
+
+def build_manifest(pages_data: Iterable[Dict], chunks_data: List[Dict], settings: Dict) -> Dict:
+    """
+    Build a fingerprint manifest for one document.
+
+    Args:
+        pages_data: Extracted pages
+        chunks_data: Chunks produced from those pages
+        settings: Extractor, chunker and embedding settings used for this run
+
+    Returns:
+        Manifest dictionary
+    """
+    return {
+        "version": MANIFEST_VERSION,
+        "settings": settings,
+        "settings_hash": settings_fingerprint(settings),
+        "pages": {str(page["page_num"]): page_fingerprint(page) for page in pages_data},
+        "chunks": {
+            chunk["chunk_id"]: {
+                "hash": hash_text(chunk["text"]),
+                "page": chunk["page_num"],
+                "metadata": metadata_fingerprint(chunk)
+            }
+            for chunk in chunks_data
+        }
+    }
+
+
+def load_manifest(manifest_path: str) -> Optional[Dict]:
+    """
+    Load a manifest from disk.
+
+    Args:
+        manifest_path: Path to the manifest JSON file
+
+    Returns:
+        Manifest dictionary, or None if there is no usable manifest
+    """
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        print(f"Ignoring manifest with unsupported version: {manifest_path}")
+        return None
+
+    return manifest
+
+
+def save_manifest(manifest: Dict, manifest_path: str) -> None:
+    """
+    Save a manifest to disk.
+
+    Args:
+        manifest: Manifest dictionary
+        manifest_path: Path to the manifest JSON file
+    """
+    os.makedirs(os.path.dirname(manifest_path) or '.', exist_ok=True)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def diff_manifests(old_manifest: Optional[Dict], new_manifest: Dict) -> Dict:
+    """
+    Compare two manifests page by page and chunk by chunk.
+
+    If the settings changed (or there is no previous manifest), no chunk counts
+    as unchanged, since old hashes say nothing about the new output.
+
+    Args:
+        old_manifest: Manifest from the previous run, or None
+        new_manifest: Manifest for the current run
+
+    Returns:
+        Dictionary with lists of added/changed/removed pages and
+        new/changed/moved/unchanged/removed chunk IDs. Moved chunks have the
+        same text on a different page or with different metadata (or were
+        recorded before metadata was fingerprinted): their embedding is still
+        valid but their metadata needs re-uploading.
+    """
+    new_pages = new_manifest["pages"]
+    new_chunks = new_manifest["chunks"]
+
+    if old_manifest is None or old_manifest["settings_hash"] != new_manifest["settings_hash"]:
+        old_pages = {} if old_manifest is None else old_manifest["pages"]
+        old_chunks = {} if old_manifest is None else old_manifest["chunks"]
+        comparable = False
+    else:
+        old_pages = old_manifest["pages"]
+        old_chunks = old_manifest["chunks"]
+        comparable = True
+
+    diff = {
+        "settings_changed": old_manifest is not None and not comparable,
+        "added_pages": sorted((p for p in new_pages if p not in old_pages), key=int),
+        "changed_pages": sorted((p for p in new_pages if p in old_pages and old_pages[p] != new_pages[p]), key=int),
+        "removed_pages": sorted((p for p in old_pages if p not in new_pages), key=int),
+        "new_chunks": [],
+        "changed_chunks": [],
+        "moved_chunks": [],
+        "unchanged_chunks": [],
+        "removed_chunks": [chunk_id for chunk_id in old_chunks if chunk_id not in new_chunks]
+    }
+
+    for chunk_id, entry in new_chunks.items():
+        if chunk_id not in old_chunks:
+            diff["new_chunks"].append(chunk_id)
+        elif not comparable or old_chunks[chunk_id]["hash"] != entry["hash"]:
+            diff["changed_chunks"].append(chunk_id)
+        elif old_chunks[chunk_id]["page"] != entry["page"] or \
+                old_chunks[chunk_id].get("metadata") != entry["metadata"]:
+            diff["moved_chunks"].append(chunk_id)
+        else:
+            diff["unchanged_chunks"].append(chunk_id)
+
+    return diff
+
+
+def split_for_reembedding(
+    chunks_data: List[Dict],
+    diff: Dict,
+    previous_embeddings: List[Dict]
+) -> Tuple[List[Dict], Dict[str, List[float]]]:
+    """
+    Split chunks into those that need new embeddings and those whose previous
+    embedding can be reused.
+
+    Args:
+        chunks_data: Chunks for the current run
+        diff: Result of diff_manifests
+        previous_embeddings: Chunks with embeddings from the previous run
+
+    Returns:
+        Tuple of (chunks to embed, mapping of chunk ID to reused embedding)
+    """
+    unchanged = set(diff["unchanged_chunks"]) | set(diff["moved_chunks"])
+    reused = {
+        chunk["chunk_id"]: chunk["embedding"]
+        for chunk in previous_embeddings
+        if chunk["chunk_id"] in unchanged and "embedding" in chunk
+    }
+    to_embed = [chunk for chunk in chunks_data if chunk["chunk_id"] not in reused]
+    return to_embed, reused
+
+
+def print_diff_report(diff: Dict, chunks_data: List[Dict], reused_ids: Set[str]) -> None:
+    """
+    Print a summary of what changed between two ingestion runs.
+
+    Args:
+        diff: Result of diff_manifests
+        chunks_data: Chunks for the current run
+        reused_ids: IDs of chunks whose previous embedding was reused
+    """
+    saved_tokens = sum(chunk.get("token_count", 0) for chunk in chunks_data if chunk["chunk_id"] in reused_ids)
+
+    print("\n=== Incremental Ingestion Report ===")
+    if diff["settings_changed"]:
+        print("Settings changed since the last run: all chunks were re-embedded")
+    print(f"Pages added: {len(diff['added_pages'])}, changed: {len(diff['changed_pages'])}, "
+          f"removed: {len(diff['removed_pages'])}")
+    if diff["changed_pages"]:
+        print(f"Changed pages: {', '.join(diff['changed_pages'])}")
+    print(f"Chunks new: {len(diff['new_chunks'])}, changed: {len(diff['changed_chunks'])}, "
+          f"moved: {len(diff['moved_chunks'])}, unchanged: {len(diff['unchanged_chunks'])}, "
+          f"removed: {len(diff['removed_chunks'])}")
+    print(f"Embeddings reused: {len(reused_ids)} (~{saved_tokens} tokens not re-embedded)")
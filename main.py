@@ -11,14 +11,26 @@ This script orchestrates the entire RAG pipeline:
 
 import os
 import argparse
-import json
+from typing import Optional
 from dotenv import load_dotenv
 
 # Import pipeline components
-from pdf_extractor import extract_text_from_pdf
-from text_chunker import chunk_text
-from embeddings_generator import generate_embeddings
-from pinecone_uploader import upload_to_pinecone
+from pdf_extractor import (
+    extract_text_from_pdf, extract_text_with_sections, iter_pages_from_pdf, iter_pages_with_sections,
+    save_section_hierarchy
+)
+from artifacts import count_records, iter_records, load_records, tee_to_jsonl
+from embedding_store import load_embeddings, save_embeddings
+from boilerplate import find_boilerplate_lines, strip_boilerplate, print_boilerplate_report
+from dedupe import deduplicate_chunks, print_dedupe_report
+from text_chunker import chunk_text, CHUNK_SIZE, CHUNK_OVERLAP
+from embeddings_generator import generate_embeddings, BATCH_SIZE, MAX_BATCH_TOKENS
+from embedding_providers import get_embedding_provider
+from pinecone_uploader import check_provider_dimension, upload_to_pinecone, delete_from_pinecone
+from ingest_manifest import (
+    build_manifest, load_manifest, save_manifest, diff_manifests,
+    split_for_reembedding, print_diff_report
+)
 from query_interface import query_rag_system
 
 # Load environment variables
@@ -34,7 +46,18 @@ def run_pipeline(
     skip_chunking: bool = False,
     skip_embeddings: bool = False,
     skip_upload: bool = False,
-    resume: bool = False
+    resume: bool = False,
+    workers: int = 1,
+    stream: bool = False,
+    incremental: bool = False,
+    detect_tables: bool = False,
+    remove_boilerplate: bool = False,
+    dedupe: bool = False,
+    stitch_pages: bool = False,
+    async_embeddings: bool = False,
+    batch_api_embeddings: bool = False,
+    slim_metadata: Optional[bool] = None,
+    detect_sections: bool = False
 ):
     """
     Run the complete RAG pipeline.
@@ -46,64 +69,204 @@ def run_pipeline(
         skip_embeddings: Skip the embeddings generation step
         skip_upload: Skip the Pinecone upload step
         resume: Resume from checkpoints where possible
+        workers: Number of worker processes for PDF page extraction and chunking
+        stream: Stream pages from extraction straight into chunking and
+            write JSON Lines artifacts instead of JSON arrays
+        incremental: Compare against the previous run's manifest and only
+            re-embed and re-upload chunks whose content changed
+        detect_tables: Extract tables as structured rows with page.find_tables()
+        remove_boilerplate: Strip headers, footers and page numbers that
+            repeat across pages before chunking
+        dedupe: Drop near-duplicate chunks before embedding, recording the
+            duplicates' sources and pages on the chunk that is kept
+        stitch_pages: Let chunks cross page breaks, recording the pages
+            each chunk spans
+        async_embeddings: Generate embeddings with concurrent requests paced
+            by the requests/tokens per minute limiter
+        batch_api_embeddings: Generate embeddings with one Batch API job,
+            waiting for it to finish
+        slim_metadata: Upload only filter fields as metadata, leaving the
+            text to the local chunk store; defaults to PINECONE_SLIM_METADATA
+        detect_sections: Detect numbered section headings so chunks carry
+            `section_path` and `section_title` metadata
     """
+    # Embeddings the index cannot take would only fail at upload time
+    if not skip_embeddings and not skip_upload:
+        check_provider_dimension()
+    
     # Define output paths
     base_filename = os.path.splitext(os.path.basename(pdf_path))[0]
-    extracted_path = f"output/{base_filename}_extracted.json"
-    chunked_path = f"output/{base_filename}_chunked.json"
-    embeddings_path = f"output/{base_filename}_embeddings.json"
-    embeddings_checkpoint = f"output/{base_filename}_embeddings_checkpoint.json"
-    upload_checkpoint = f"output/{base_filename}_upload_checkpoint.json"
+    artifact_ext = ".jsonl" if stream else ".json"
+    extracted_path = f"output/{base_filename}_extracted{artifact_ext}"
+    chunked_path = f"output/{base_filename}_chunked{artifact_ext}"
+    embeddings_path = f"output/{base_filename}_embeddings.npy"
+    embeddings_checkpoint = f"output/{base_filename}_embeddings_checkpoint.jsonl"
+    upload_checkpoint = f"output/{base_filename}_upload_checkpoint.jsonl"
+    manifest_path = f"output/{base_filename}_manifest.json"
     
     # Step 1: Extract text from PDF
+    sections = None  # Filled by the page stream in stream mode with section detection
     if not skip_extraction:
         print("\n=== Step 1: Extracting text from PDF ===")
-        pages_data = extract_text_from_pdf(pdf_path, extracted_path)
-    elif os.path.exists(extracted_path):
-        print("\n=== Step 1: Loading extracted text from file ===")
-        with open(extracted_path, 'r', encoding='utf-8') as f:
-            pages_data = json.load(f)
+        if stream:
+            # Pages are appended to the JSONL artifact as chunking consumes them
+            pages = iter_pages_from_pdf(pdf_path, workers, detect_sections, detect_tables)
+            if detect_sections:
+                sections = []
+                pages = iter_pages_with_sections(pages, sections)
+            pages_data = tee_to_jsonl(pages, extracted_path)
+        elif detect_sections:
+            pages_data = extract_text_with_sections(
+                pdf_path, extracted_path, workers=workers, detect_tables=detect_tables
+            )
+        else:
+            pages_data = extract_text_from_pdf(
+                pdf_path, extracted_path, workers=workers, detect_tables=detect_tables
+            )
     else:
-        raise FileNotFoundError(f"Extracted text file not found: {extracted_path}")
+        print("\n=== Step 1: Loading extracted text from file ===")
+        pages_data = iter_records(extracted_path) if stream else load_records(extracted_path)
+    
+    # Strip running headers, footers and page numbers before chunking
+    boilerplate_report = {}
+    if remove_boilerplate and not skip_chunking:
+        print("\n=== Removing repeated headers and footers ===")
+        if stream:
+            # Detection needs every page, so finish writing the artifact first
+            for _ in pages_data:
+                pass
+            boilerplate = find_boilerplate_lines(iter_records(extracted_path))
+            pages_data = strip_boilerplate(iter_records(extracted_path), boilerplate, boilerplate_report)
+        else:
+            boilerplate = find_boilerplate_lines(pages_data)
+            pages_data = list(strip_boilerplate(pages_data, boilerplate, boilerplate_report))
     
     # Step 2: Chunk the text
     if not skip_chunking:
         print("\n=== Step 2: Chunking text ===")
-        chunks_data = chunk_text(pages_data, output_path=chunked_path)
-    elif os.path.exists(chunked_path):
-        print("\n=== Step 2: Loading chunked text from file ===")
-        with open(chunked_path, 'r', encoding='utf-8') as f:
-            chunks_data = json.load(f)
+        chunks_data = chunk_text(
+            pages_data, output_path=chunked_path, workers=workers, stitch_pages=stitch_pages
+        )
+        if boilerplate_report:
+            print_boilerplate_report(boilerplate_report)
     else:
-        raise FileNotFoundError(f"Chunked text file not found: {chunked_path}")
+        if stream and not skip_extraction:
+            # Nothing consumes the page stream, so run extraction to completion here
+            for _ in pages_data:
+                pass
+        print("\n=== Step 2: Loading chunked text from file ===")
+        chunks_data = load_records(chunked_path)
+    
+    # The page stream has been drained, so the section page spans are final
+    if sections is not None:
+        save_section_hierarchy(sections, extracted_path)
+    
+    # Drop near-duplicate chunks so only one copy is embedded and stored
+    if dedupe:
+        chunks_data, dedupe_report = deduplicate_chunks(chunks_data)
+        print_dedupe_report(dedupe_report, BATCH_SIZE, MAX_BATCH_TOKENS)
+    
+    # Compare content hashes with the previous run
+    if incremental:
+        settings = {
+            "extractor": "pdf_extractor.extract_text_from_pdf",
+            "detect_sections": detect_sections,
+            "detect_tables": detect_tables,
+            "remove_boilerplate": remove_boilerplate,
+            "dedupe": dedupe,
+            "stitch_pages": stitch_pages,
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+            "splitter": "tokens",
+            "embedding_model": get_embedding_provider().name,
+            "embedding_dimensions": get_embedding_provider().dimensions
+        }
+        new_manifest = build_manifest(
+            iter_records(extracted_path) if stream else pages_data,
+            chunks_data,
+            settings
+        )
+        diff = diff_manifests(load_manifest(manifest_path), new_manifest)
+        # Moved chunks keep their embedding but need their page metadata re-uploaded
+        changed_ids = set(diff["new_chunks"]) | set(diff["changed_chunks"]) | set(diff["moved_chunks"])
     
     # Step 3: Generate embeddings
+    reused = {}
     if not skip_embeddings:
         print("\n=== Step 3: Generating embeddings ===")
-        chunks_with_embeddings = generate_embeddings(
-            chunks_data,
-            output_path=embeddings_path,
-            checkpoint_path=embeddings_checkpoint,
-            resume=resume
-        )
-    elif os.path.exists(embeddings_path):
-        print("\n=== Step 3: Loading embeddings from file ===")
-        with open(embeddings_path, 'r', encoding='utf-8') as f:
-            chunks_with_embeddings = json.load(f)
+        if incremental:
+            try:
+                # Read into memory: the same file is overwritten below
+                previous_embeddings = load_embeddings(embeddings_path, mmap=False)
+            except FileNotFoundError:
+                previous_embeddings = []
+            chunks_to_embed, reused = split_for_reembedding(chunks_data, diff, previous_embeddings)
+            print(f"Re-embedding {len(chunks_to_embed)} chunks, reusing {len(reused)} embeddings")
+            
+            embedded = generate_embeddings(
+                chunks_to_embed,
+                checkpoint_path=embeddings_checkpoint,
+                resume=resume,
+                use_async=async_embeddings,
+                use_batch_api=batch_api_embeddings
+            ) if chunks_to_embed else []
+            
+            # Merge new and reused embeddings back in chunk order
+            embedded_by_id = {chunk["chunk_id"]: chunk for chunk in embedded}
+            chunks_with_embeddings = [
+                embedded_by_id.get(chunk["chunk_id"]) or {**chunk, "embedding": reused[chunk["chunk_id"]]}
+                for chunk in chunks_data
+            ]
+            save_embeddings(chunks_with_embeddings, embeddings_path)
+            print(f"Saved chunks with embeddings to {embeddings_path}")
+        else:
+            chunks_with_embeddings = generate_embeddings(
+                chunks_data,
+                output_path=embeddings_path,
+                checkpoint_path=embeddings_checkpoint,
+                resume=resume,
+                use_async=async_embeddings,
+                use_batch_api=batch_api_embeddings
+            )
     else:
-        raise FileNotFoundError(f"Embeddings file not found: {embeddings_path}")
+        print("\n=== Step 3: Loading embeddings from file ===")
+        chunks_with_embeddings = load_embeddings(embeddings_path)
     
     # Step 4: Upload to Pinecone
     if not skip_upload:
         print("\n=== Step 4: Uploading to Pinecone ===")
-        upload_to_pinecone(
-            chunks_with_embeddings,
-            checkpoint_path=upload_checkpoint,
-            resume=resume
-        )
+        if incremental:
+            chunks_to_upload = [chunk for chunk in chunks_with_embeddings if chunk["chunk_id"] in changed_ids]
+            if chunks_to_upload:
+                upload_to_pinecone(
+                    chunks_to_upload,
+                    checkpoint_path=upload_checkpoint,
+                    resume=resume,
+                    slim_metadata=slim_metadata
+                )
+            else:
+                print("No new or changed vectors to upload")
+            delete_from_pinecone(diff["removed_chunks"])
+        else:
+            upload_to_pinecone(
+                chunks_with_embeddings,
+                checkpoint_path=upload_checkpoint,
+                resume=resume,
+                slim_metadata=slim_metadata
+            )
+    
+    if incremental:
+        print_diff_report(diff, chunks_data, set(reused))
+        # Only record the new state once the index has caught up with it
+        if not skip_embeddings and not skip_upload:
+            save_manifest(new_manifest, manifest_path)
+            print(f"Saved ingestion manifest to {manifest_path}")
+        else:
+            print("Manifest not updated because embedding or upload was skipped")
     
     print("\n=== Pipeline completed successfully ===")
-    print(f"Processed {len(pages_data)} pages")
+    page_count = count_records(extracted_path) if stream else len(pages_data)
+    print(f"Processed {page_count} pages")
     print(f"Created {len(chunks_data)} chunks")
     print(f"Generated {len(chunks_with_embeddings)} embeddings")
     print("Data uploaded to Pinecone")
@@ -138,6 +301,29 @@ if __name__ == "__main__":
     parser.add_argument("--skip-embeddings", action="store_true", help="Skip embeddings generation")
     parser.add_argument("--skip-upload", action="store_true", help="Skip Pinecone upload")
     parser.add_argument("--resume", action="store_true", help="Resume from checkpoints")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes for extraction and chunking (default: 1)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream pages into chunking and write JSONL artifacts")
+    parser.add_argument("--strip-boilerplate", action="store_true",
+                        help="Remove repeated headers, footers and page numbers before chunking")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Drop near-duplicate chunks before generating embeddings")
+    parser.add_argument("--stitch-pages", action="store_true",
+                        help="Let chunks cross page breaks, recording the pages each chunk spans")
+    parser.add_argument("--async-embeddings", action="store_true",
+                        help="Send concurrent embedding requests paced by the RPM/TPM limiter")
+    parser.add_argument("--batch-api-embeddings", action="store_true",
+                        help="Embed through one Batch API job (cheaper, may take hours); resume with --resume")
+    parser.add_argument("--slim-metadata", action="store_true", default=None,
+                        help="Upload only filter fields as metadata (the standalone Streamlit apps need the full "
+                             "metadata; default: PINECONE_SLIM_METADATA environment variable)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only re-embed and re-upload chunks that changed since the last run")
+    parser.add_argument("--tables", action="store_true",
+                        help="Extract PDF tables as structured rows")
+    parser.add_argument("--sections", action="store_true",
+                        help="Detect numbered section headings and add section metadata to chunks")
     parser.add_argument("--query", action="store_true", help="Run interactive query interface")
     
     args = parser.parse_args()
@@ -151,7 +337,18 @@ if __name__ == "__main__":
             args.skip_chunking,
             args.skip_embeddings,
             args.skip_upload,
-            args.resume
+            args.resume,
+            args.workers,
+            args.stream,
+            args.incremental,
+            args.tables,
+            args.strip_boilerplate,
+            args.dedupe,
+            args.stitch_pages,
+            args.async_embeddings,
+            args.batch_api_embeddings,
+            args.slim_metadata,
+            args.sections
         )
     else:
         parser.print_help()
@@ -6,111 +6,508 @@ It provides functions to extract text with page tracking and metadata.
 """
 
 import os
+import re
 import json
+import time
+from collections import Counter
 import fitz  # PyMuPDF
-from typing import Dict, List, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
 from tqdm import tqdm
+from artifacts import save_records
+from table_extractor import extract_pdf_tables
 
+# Pages handed to a worker process at a time in parallel mode
+PAGES_PER_TASK = 50
 
-def extract_text_from_pdf(pdf_path: str, output_path: Optional[str] = None) -> List[Dict]:
+# Numbered regulation headings such as "9.2.1 Parking" or "12. General"
+HEADING_PATTERN = re.compile(r'^(\d{1,2}(?:\.\d{1,3}){0,5})\.?\s+([A-Za-z(].{0,150})$')
+HEADING_SIZE_RATIO = 1.1  # Font size relative to body text that marks a heading
+BOLD_FLAG = 16  # PyMuPDF span flag for bold text
+
+
+def _build_page_data(
+    page_num: int,
+    text: str,
+    source: str,
+    total_pages: int,
+    tables: Optional[List[Dict]] = None
+) -> Optional[Dict]:
     """
-    Extract text from a PDF file with page numbers and basic metadata.
+    Build the page record for one page of extracted text.
+
+    Args:
+        page_num: 0-based page index in the document
+        text: Text extracted from the page
+        source: Source document name (filename without extension)
+        total_pages: Total number of pages in the document
+        tables: Structured tables found on the page, if table detection ran
+
+    Returns:
+        Page dictionary, or None if the page has no text
+    """
+    # Skip empty pages
+    if not text.strip() and not tables:
+        return None
+
+    # Extract potential section/chapter titles (simple heuristic)
+    lines = text.split('\n')
+    potential_title = lines[0] if lines and len(lines[0]) < 100 else ""
+
+    # Create page data with metadata
+    page_data = {
+        "page_num": page_num + 1,  # 1-based page numbering
+        "text": text,
+        "source": source,
+        "potential_title": potential_title,
+        "total_pages": total_pages
+    }
+    
+    if tables is not None:
+        page_data["tables"] = tables
+        page_data["has_tables"] = bool(tables)
     
+    return page_data
+
+
+def _detect_headings(page_dict: Dict, text: str) -> List[Dict]:
+    """
+    Find numbered section headings on a page from its span-level font data.
+
+    A line is a heading if its text looks like "9.2.1 Parking" and it is set
+    either in bold or noticeably larger than the page's body text.
+
+    Args:
+        page_dict: Output of page.get_text("dict")
+        text: Plain text of the same page, used to record heading offsets
+
+    Returns:
+        List of headings with number, title, level and character offset
+    """
+    lines = []
+    size_chars = Counter()
+
+    for block in page_dict.get("blocks", []):
+        for line in block.get("lines", []):
+            spans = [span for span in line.get("spans", []) if span["text"].strip()]
+            if not spans:
+                continue
+            for span in spans:
+                size_chars[round(span["size"], 1)] += len(span["text"])
+            lines.append(spans)
+
+    if not size_chars:
+        return []
+
+    # Body text size is the size carrying the most characters on the page
+    body_size = size_chars.most_common(1)[0][0]
+
+    headings = []
+    cursor = 0
+    for spans in lines:
+        # Cheap pre-filter: headings start with a section number
+        if not spans[0]["text"].lstrip()[:1].isdigit():
+            continue
+
+        line_text = "".join(span["text"] for span in spans).strip()
+        match = HEADING_PATTERN.match(line_text)
+        if not match:
+            continue
+
+        is_bold = all(span["flags"] & BOLD_FLAG or "Bold" in span.get("font", "") for span in spans)
+        is_large = max(span["size"] for span in spans) >= body_size * HEADING_SIZE_RATIO
+        if not (is_bold or is_large):
+            continue
+
+        number = match.group(1)
+        offset = text.find(line_text, cursor)
+        if offset == -1:
+            offset = text.find(number, cursor)
+        if offset != -1:
+            cursor = offset
+
+        headings.append({
+            "number": number,
+            "title": match.group(2).strip(),
+            "level": number.count('.') + 1,
+            "offset": max(offset, 0)
+        })
+
+    return headings
+
+
+def _extract_page(
+    page,
+    page_num: int,
+    source: str,
+    total_pages: int,
+    detect_sections: bool = False,
+    detect_tables: bool = False
+) -> Optional[Dict]:
+    """
+    Extract one page, optionally with its section headings and tables.
+
+    Args:
+        page: PyMuPDF page object
+        page_num: 0-based page index in the document
+        source: Source document name
+        total_pages: Total number of pages in the document
+        detect_sections: Whether to scan span font data for headings
+        detect_tables: Whether to extract tables as structured records;
+            table areas are then left out of the page text
+
+    Returns:
+        Page dictionary, or None if the page has no text
+    """
+    if not detect_sections and not detect_tables:
+        return _build_page_data(page_num, page.get_text(), source, total_pages)
+
+    # Share one text page between the plain text, table text and span dictionary
+    textpage = page.get_textpage()
+    if detect_tables:
+        text, tables = extract_pdf_tables(page, textpage)
+    else:
+        text, tables = page.get_text(textpage=textpage), None
+    page_data = _build_page_data(page_num, text, source, total_pages, tables)
+    if page_data and detect_sections:
+        page_dict = page.get_text("dict", textpage=textpage)
+        page_data["headings"] = _detect_headings(page_dict, page_data["text"])
+    return page_data
+
+
+def _extract_page_range(
+    pdf_path: str,
+    start: int,
+    end: int,
+    source: str,
+    total_pages: int,
+    detect_sections: bool = False,
+    detect_tables: bool = False
+) -> List[Dict]:
+    """
+    Extract pages [start, end) from a PDF. Runs inside a worker process,
+    so it opens its own PyMuPDF document handle.
+
     Args:
         pdf_path: Path to the PDF file
-        output_path: Optional path to save the extracted text as JSON
-        
+        start: First 0-based page index to extract
+        end: Page index to stop at (exclusive)
+        source: Source document name
+        total_pages: Total number of pages in the document
+        detect_sections: Whether to scan span font data for headings
+        detect_tables: Whether to extract tables as structured records
+
     Returns:
-        List of dictionaries containing text and metadata for each page
+        List of page dictionaries for the non-empty pages in the range
+    """
+    pages_data = []
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(start, end):
+            page_data = _extract_page(doc[page_num], page_num, source, total_pages, detect_sections, detect_tables)
+            if page_data:
+                pages_data.append(page_data)
+    return pages_data
+
+
+def iter_pages_from_pdf(
+    pdf_path: str,
+    workers: int = 1,
+    detect_sections: bool = False,
+    detect_tables: bool = False
+) -> Iterator[Dict]:
+    """
+    Yield the page records of a PDF one at a time, in page order.
+
+    Args:
+        pdf_path: Path to the PDF file
+        workers: Number of worker processes; values above 1 extract page
+            ranges in parallel and yield them back in page order
+        detect_sections: Whether to add the headings found on each page
+        detect_tables: Whether to extract tables as structured records
+
+    Yields:
+        Dictionary containing text and metadata for each non-empty page
     """
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(f"PDF file not found: {pdf_path}")
-    
+
     print(f"Extracting text from {pdf_path}...")
-    doc = fitz.open(pdf_path)
-    total_pages = len(doc)
-    
+
     # Extract filename without extension for metadata
     filename = os.path.basename(pdf_path)
     base_filename = os.path.splitext(filename)[0]
+
+    with fitz.open(pdf_path) as doc:
+        total_pages = len(doc)
+
+        if workers <= 1 or total_pages <= PAGES_PER_TASK:
+            for page_num in tqdm(range(total_pages), desc="Extracting pages"):
+                page_data = _extract_page(
+                    doc[page_num], page_num, base_filename, total_pages, detect_sections, detect_tables
+                )
+                if page_data:
+                    yield page_data
+            return
+
+    starts = list(range(0, total_pages, PAGES_PER_TASK))
+    ends = [min(start + PAGES_PER_TASK, total_pages) for start in starts]
+
+    print(f"Extracting {total_pages} pages with {workers} workers...")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() returns the ranges in submission order, i.e. page order
+        results = executor.map(
+            _extract_page_range,
+            [pdf_path] * len(starts),
+            starts,
+            ends,
+            [base_filename] * len(starts),
+            [total_pages] * len(starts),
+            [detect_sections] * len(starts),
+            [detect_tables] * len(starts)
+        )
+        for range_pages in tqdm(results, total=len(starts), desc="Extracting page ranges"):
+            yield from range_pages
+
+
+def extract_text_from_pdf(
+    pdf_path: str,
+    output_path: Optional[str] = None,
+    workers: int = 1,
+    detect_tables: bool = False
+) -> List[Dict]:
+    """
+    Extract text from a PDF file with page numbers and basic metadata.
     
-    pages_data = []
-    
-    for page_num in tqdm(range(total_pages), desc="Extracting pages"):
-        page = doc[page_num]
-        text = page.get_text()
-        
-        # Skip empty pages
-        if not text.strip():
-            continue
-        
-        # Extract potential section/chapter titles (simple heuristic)
-        lines = text.split('\n')
-        potential_title = lines[0] if lines and len(lines[0]) < 100 else ""
-        
-        # Create page data with metadata
-        page_data = {
-            "page_num": page_num + 1,  # 1-based page numbering
-            "text": text,
-            "source": base_filename,
-            "potential_title": potential_title,
-            "total_pages": total_pages
-        }
+    Args:
+        pdf_path: Path to the PDF file
+        output_path: Optional path to save the extracted text as JSON
+            (or JSON Lines if it ends in .jsonl)
+        workers: Number of worker processes; values above 1 extract page
+            ranges in parallel and merge them back in page order
+        detect_tables: Whether to extract tables as structured records
+            with page.find_tables()
         
-        pages_data.append(page_data)
+    Returns:
+        List of dictionaries containing text and metadata for each page
+    """
+    pages_data = list(iter_pages_from_pdf(pdf_path, workers, detect_tables=detect_tables))
+    total_pages = pages_data[0]["total_pages"] if pages_data else 0
     
     print(f"Extracted {len(pages_data)} pages with content from {total_pages} total pages")
     
     # Save to JSON if output path is provided
     if output_path:
-        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(pages_data, f, ensure_ascii=False, indent=2)
+        save_records(pages_data, output_path)
         print(f"Saved extracted text to {output_path}")
     
     return pages_data
 
 
-def extract_text_with_sections(pdf_path: str, output_path: Optional[str] = None) -> List[Dict]:
+def section_path(number: str) -> List[str]:
+    """
+    Expand a section number into its path from the top-level chapter.
+
+    For example "9.2.1" becomes ["9", "9.2", "9.2.1"].
+
+    Args:
+        number: Dotted section number
+
+    Returns:
+        List of ancestor section numbers, ending with the number itself
+    """
+    parts = number.split('.')
+    return ['.'.join(parts[:i + 1]) for i in range(len(parts))]
+
+
+def iter_pages_with_sections(pages_data: Iterable[Dict], sections: List[Dict]) -> Iterator[Dict]:
+    """
+    Set `section_path` on each page to the section open at the top of that
+    page, yielding the pages as they pass so a page stream stays a stream.
+
+    A section runs from its heading's page to the page where the next heading
+    at the same or a higher level starts.
+
+    Args:
+        pages_data: Pages with a `headings` list, as produced with section detection
+        sections: List that receives the sections in document order, each
+            with number, title, level, parent and page span; page spans are
+            final once the pages are exhausted
+
+    Yields:
+        The pages, with `section_path` and `section_title` set
+    """
+    open_sections = []  # Stack of sections that have not ended yet
+    current_path = []
+    current_title = ""
+    last_page = 0
+
+    for page_data in pages_data:
+        page_data["section_path"] = current_path
+        page_data["section_title"] = current_title
+        last_page = page_data["page_num"]
+
+        for heading in page_data.get("headings", []):
+            # Close every open section at the same or a deeper level
+            while open_sections and open_sections[-1]["level"] >= heading["level"]:
+                open_sections.pop()["page_end"] = page_data["page_num"]
+
+            section = {
+                "number": heading["number"],
+                "title": heading["title"],
+                "level": heading["level"],
+                "parent": open_sections[-1]["number"] if open_sections else None,
+                "page_start": page_data["page_num"],
+                "page_end": page_data["page_num"]
+            }
+            sections.append(section)
+            open_sections.append(section)
+            current_path = section_path(heading["number"])
+            current_title = heading["title"]
+
+        yield page_data
+
+    for section in open_sections:
+        section["page_end"] = last_page
+
+
+def build_section_hierarchy(pages_data: List[Dict]) -> List[Dict]:
+    """
+    Build the document's section hierarchy from per-page headings and set
+    `section_path` on each page (see iter_pages_with_sections).
+
+    Args:
+        pages_data: Pages with a `headings` list, as produced with section detection
+
+    Returns:
+        List of sections in document order, each with number, title, level,
+        parent and page span
+    """
+    sections = []
+    for _ in iter_pages_with_sections(pages_data, sections):
+        pass
+    return sections
+
+
+def save_section_hierarchy(sections: List[Dict], output_path: str) -> str:
+    """
+    Save a section hierarchy next to an extracted-text artifact, as `<name>_sections.json`.
+
+    Args:
+        sections: Sections from build_section_hierarchy or iter_pages_with_sections
+        output_path: Path of the extracted-text artifact
+
+    Returns:
+        Path the hierarchy was saved to
+    """
+    sections_path = os.path.splitext(output_path)[0] + "_sections.json"
+    with open(sections_path, 'w', encoding='utf-8') as f:
+        json.dump(sections, f, ensure_ascii=False, indent=2)
+    print(f"Saved section hierarchy to {sections_path}")
+    return sections_path
+
+
+def extract_text_with_sections(
+    pdf_path: str,
+    output_path: Optional[str] = None,
+    workers: int = 1,
+    detect_tables: bool = False
+) -> List[Dict]:
     """
     Extract text from PDF with attempt to identify sections and structure.
-    This is a more advanced version that tries to identify document structure.
+    Numbered headings are detected from span-level font size and weight, and
+    each page records the headings it contains and the section it starts in.
     
     Args:
         pdf_path: Path to the PDF file
-        output_path: Optional path to save the extracted text as JSON
+        output_path: Optional path to save the extracted text as JSON; the
+            section hierarchy is saved next to it as `<name>_sections.json`
+        workers: Number of worker processes for page extraction
+        detect_tables: Whether to extract tables as structured records
         
     Returns:
         List of dictionaries containing text and metadata with section information
     """
-    # Basic extraction first
-    pages_data = extract_text_from_pdf(pdf_path)
+    pages_data = list(iter_pages_from_pdf(pdf_path, workers, detect_sections=True, detect_tables=detect_tables))
+    sections = build_section_hierarchy(pages_data)
     
-    # TODO: Implement more sophisticated section detection
-    # This would involve analyzing text formatting, headers, etc.
+    print(f"Extracted {len(pages_data)} pages with {len(sections)} sections")
     
     # Save to JSON if output path is provided
     if output_path:
-        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(pages_data, f, ensure_ascii=False, indent=2)
+        save_records(pages_data, output_path)
         print(f"Saved extracted text with sections to {output_path}")
+        save_section_hierarchy(sections, output_path)
     
     return pages_data
 
 
+def benchmark_section_detection(pdf_path: str, max_pages: int = 200, rounds: int = 2) -> Dict:
+    """
+    Time plain page extraction against extraction with heading detection.
+
+    Each run reopens the document, and the order of the two modes alternates
+    between rounds, so neither mode always gets the warm caches left by the
+    other.
+
+    Args:
+        pdf_path: Path to the PDF file
+        max_pages: Number of pages to time from the start of the document
+        rounds: Number of rounds; each times both modes once
+
+    Returns:
+        Dictionary with per-page timings in milliseconds and the overhead
+    """
+    source = os.path.splitext(os.path.basename(pdf_path))[0]
+    elapsed = {False: 0.0, True: 0.0}
+    heading_count = 0
+
+    for round_num in range(rounds):
+        for detect_sections in ((False, True) if round_num % 2 == 0 else (True, False)):
+            with fitz.open(pdf_path) as doc:
+                page_count = min(max_pages, len(doc))
+                start = time.perf_counter()
+                for page_num in range(page_count):
+                    page_data = _extract_page(doc[page_num], page_num, source, len(doc), detect_sections)
+                    if detect_sections and page_data and round_num == 0:
+                        heading_count += len(page_data["headings"])
+                elapsed[detect_sections] += time.perf_counter() - start
+    timings = {mode: seconds * 1000 / max(page_count * rounds, 1) for mode, seconds in elapsed.items()}
+
+    results = {
+        "pages": page_count,
+        "headings": heading_count,
+        "plain_ms_per_page": timings[False],
+        "sections_ms_per_page": timings[True],
+        "overhead_pct": (timings[True] / timings[False] - 1) * 100 if timings[False] else 0.0
+    }
+
+    print(f"Benchmarked {page_count} pages over {rounds} rounds ({heading_count} headings found)")
+    print(f"Plain extraction:   {results['plain_ms_per_page']:.2f} ms/page")
+    print(f"With section scan:  {results['sections_ms_per_page']:.2f} ms/page")
+    print(f"Overhead:           {results['overhead_pct']:.1f}%")
+    return results
+
+
 if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description="Extract text from PDF files")
     parser.add_argument("pdf_path", help="Path to the PDF file")
-    parser.add_argument("--output", "-o", help="Output JSON file path")
+    parser.add_argument("--output", "-o", help="Output JSON (or .jsonl) file path")
     parser.add_argument("--sections", "-s", action="store_true", 
                         help="Attempt to extract section information")
+    parser.add_argument("--workers", "-w", type=int, default=1,
+                        help="Number of worker processes for page extraction (default: 1)")
+    parser.add_argument("--tables", "-t", action="store_true",
+                        help="Extract tables as structured rows with page.find_tables()")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Time section detection against plain extraction")
     
     args = parser.parse_args()
     
-    if args.sections:
-        extract_text_with_sections(args.pdf_path, args.output)
+    if args.benchmark:
+        benchmark_section_detection(args.pdf_path)
+    elif args.sections:
+        extract_text_with_sections(args.pdf_path, args.output, workers=args.workers, detect_tables=args.tables)
     else:
-        extract_text_from_pdf(args.pdf_path, args.output)
+        extract_text_from_pdf(args.pdf_path, args.output, workers=args.workers, detect_tables=args.tables)
@@ -0,0 +1,197 @@
+"""
+Pinecone Transport Module
+
+This module creates the Pinecone client for the configured transport:
+"rest" (JSON over HTTPS, the default) or "grpc", which sends vectors as
+protobuf messages whose float values are packed binary instead of JSON
+number text, and multiplexes concurrent requests over one HTTP/2 channel.
+The index handles of both transports support the same upsert, query, delete
+and describe_index_stats calls.
+
+The transport is chosen with the PINECONE_TRANSPORT environment variable.
+gRPC needs the grpc extra: pip install "pinecone-client[grpc]==3.1.0".
+
+Example:
+    python pinecone_transport.py output/doc_embeddings.npy --vectors 2000 --queries 100
+"""
+
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import pinecone
+import urllib3
+from dotenv import load_dotenv
+
+# The gRPC client is only present with the grpc extra installed
+try:
+    from pinecone.grpc import PineconeGRPC
+    GRPC_AVAILABLE = True
+except ImportError:
+    GRPC_AVAILABLE = False
+
+# Load environment variables
+load_dotenv()
+
+TRANSPORTS = ("rest", "grpc")
+PINECONE_TRANSPORT = os.getenv("PINECONE_TRANSPORT", "rest")
+BENCHMARK_NAMESPACE = "transport-benchmark"  # Scratch namespace, deleted after the benchmark
+# gRPC status codes worth retrying; the rest (invalid argument, unauthenticated, ...) fail the same way again
+TRANSIENT_GRPC_CODES = ("UNAVAILABLE", "DEADLINE_EXCEEDED", "RESOURCE_EXHAUSTED", "ABORTED", "INTERNAL")
+
+
+def create_pinecone_client(api_key: str, transport: Optional[str] = None) -> pinecone.Pinecone:
+    """
+    Create a Pinecone client for a transport.
+
+    Args:
+        api_key: Pinecone API key
+        transport: "rest" or "grpc"; defaults to PINECONE_TRANSPORT
+
+    Returns:
+        Pinecone client; PineconeGRPC for the gRPC transport
+    """
+    transport = transport or PINECONE_TRANSPORT
+    if transport == "rest":
+        return pinecone.Pinecone(api_key=api_key)
+    if transport == "grpc":
+        if not GRPC_AVAILABLE:
+            raise ImportError('The gRPC transport needs the grpc extra: pip install "pinecone-client[grpc]"')
+        return PineconeGRPC(api_key=api_key)
+    raise ValueError(f"Unknown Pinecone transport: {transport}. Choose from {', '.join(TRANSPORTS)}")
+
+
+def open_index(pc: pinecone.Pinecone, name: str, pool_threads: int = 1) -> Any:
+    """
+    Connect to an index over the client's transport.
+
+    Args:
+        pc: Client from create_pinecone_client
+        name: Index name
+        pool_threads: Connection pool size for concurrent REST requests; a
+            gRPC channel multiplexes concurrent requests on its own
+
+    Returns:
+        Index handle
+    """
+    if GRPC_AVAILABLE and isinstance(pc, PineconeGRPC):
+        return pc.Index(name)
+    return pc.Index(name, pool_threads=pool_threads)
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    Tell whether a failed request is worth retrying, on either transport.
+
+    Rate limits (429), server errors (5xx), connection errors and timeouts
+    are transient. Any other error is not: a 4xx response such as a dimension
+    mismatch, oversized metadata or a bad API key, or an error raised before
+    a request was sent. The gRPC client wraps the RpcError, so the cause
+    chain is followed.
+
+    Args:
+        error: Exception raised by an index call
+
+    Returns:
+        True if the request may succeed when retried
+    """
+    while error is not None:
+        status = getattr(error, "status", None)  # REST ApiException
+        if isinstance(status, int):
+            return status == 429 or status >= 500
+        code = getattr(error, "code", None)  # grpc.RpcError
+        if callable(code):
+            try:
+                return getattr(code(), "name", None) in TRANSIENT_GRPC_CODES
+            except Exception:
+                pass
+        if isinstance(error, (ConnectionError, TimeoutError, urllib3.exceptions.HTTPError)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def upserted_count(response: Any) -> int:
+    """Read the upserted count from a REST (dict-like) or gRPC (protobuf) upsert response."""
+    count = getattr(response, "upserted_count", None)
+    if count is None and hasattr(response, "get"):
+        count = response.get("upserted_count")
+    return count or 0
+
+
+def benchmark_transport(
+    index: Any,
+    vectors: List[Dict],
+    queries: List[List[float]],
+    batch_size: int,
+    top_k: int = 5
+) -> Dict:
+    """
+    Time upserts and queries against a scratch namespace, then delete it.
+
+    Args:
+        index: Index handle of the transport under test
+        vectors: Vectors to upsert, as prepared for Pinecone
+        queries: Query vectors
+        batch_size: Vectors per upsert request
+        top_k: Results per query
+
+    Returns:
+        Dictionary of vectors/s upserted and query latency percentiles in ms
+    """
+    started = time.perf_counter()
+    for i in range(0, len(vectors), batch_size):
+        index.upsert(vectors=vectors[i:i + batch_size], namespace=BENCHMARK_NAMESPACE)
+    upsert_seconds = time.perf_counter() - started
+
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        index.query(vector=query, top_k=top_k, include_metadata=True, namespace=BENCHMARK_NAMESPACE)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    index.delete(delete_all=True, namespace=BENCHMARK_NAMESPACE)
+    return {
+        "vectors_per_second": len(vectors) / upsert_seconds if upsert_seconds else 0.0,
+        "query_p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        "query_p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000 if latencies else 0.0
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+
+    from embedding_store import load_embeddings
+    from pinecone_uploader import BATCH_SIZE, INDEX_NAME, PINECONE_API_KEY, prepare_vectors
+
+    parser = argparse.ArgumentParser(description="Compare REST and gRPC Pinecone transports on our vectors")
+    parser.add_argument("embeddings", help="Embeddings (.npy binary store or JSON file)")
+    parser.add_argument("--vectors", type=int, default=2000, help="Vectors to upsert (default: 2000)")
+    parser.add_argument("--queries", type=int, default=100, help="Queries to time (default: 100)")
+    parser.add_argument("--batch-size", "-b", type=int, default=BATCH_SIZE,
+                        help=f"Vectors per upsert (default: {BATCH_SIZE})")
+
+    args = parser.parse_args()
+
+    if not PINECONE_API_KEY:
+        raise ValueError("Pinecone API key not set. Check your .env file.")
+
+    chunks = load_embeddings(args.embeddings)
+    rows = range(min(args.vectors, len(chunks)))
+    vectors = prepare_vectors([chunks[row] for row in rows])
+    queries = [vector["values"] for vector in random.Random(42).sample(vectors, min(args.queries, len(vectors)))]
+
+    print(f"Upserting {len(vectors)} vectors and running {len(queries)} queries "
+          f"against {INDEX_NAME}/{BENCHMARK_NAMESPACE}")
+    print(f"{'transport':<10} {'upsert vectors/s':>17} {'query p50 ms':>13} {'query p95 ms':>13}")
+    for transport in TRANSPORTS:
+        try:
+            index = open_index(create_pinecone_client(PINECONE_API_KEY, transport), INDEX_NAME)
+        except ImportError as e:
+            print(f"{transport:<10} skipped: {e}")
+            continue
+        result = benchmark_transport(index, vectors, queries, args.batch_size)
+        print(f"{transport:<10} {result['vectors_per_second']:>17.0f} "
+              f"{result['query_p50_ms']:>13.1f} {result['query_p95_ms']:>13.1f}")
@@ -3,15 +3,28 @@ Pinecone Uploader Module
 
 This module handles the uploading of embeddings to Pinecone vector database.
 It includes batch processing, error handling, and metadata management.
+Every chunk is also written to the local chunk store. With slim metadata,
+vectors carry only their ID and the small fields queries filter on, and
+search results are hydrated from the store instead.
+Batches are upserted concurrently by a bounded pool of workers sharing one
+pooled index client, with retries per batch and an append-only checkpoint of
+uploaded IDs.
 """
 
 import os
 import json
 import time
-from typing import Dict, List, Optional, Any
+import hashlib
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Any, Sequence, Set, Tuple
 from tqdm import tqdm
 import pinecone
 from dotenv import load_dotenv
+from artifacts import append_records, is_jsonl, iter_log_records, iter_records, resolve_artifact_path
+from chunk_store import get_chunk_store
+from embedding_store import load_embeddings
+from embedding_providers import EMBEDDING_DIMENSIONS, check_index_dimension, get_embedding_provider
+from pinecone_transport import TRANSPORTS, create_pinecone_client, is_transient_error, open_index, upserted_count
 
 # Load environment variables
 load_dotenv()
@@ -19,17 +32,41 @@ load_dotenv()
 # Pinecone constants
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 INDEX_NAME = "new-rag-index"
-VECTOR_DIMENSION = 1536  # Updated to match the dimension of the index
+VECTOR_DIMENSION = EMBEDDING_DIMENSIONS  # Dimension new indexes are created with
 BATCH_SIZE = 100  # Number of vectors to upsert in one batch
+DELETE_BATCH_SIZE = 1000  # Maximum number of IDs per delete request
+MAX_WORKERS = 4  # Concurrent upsert requests
+UPSERT_RETRIES = 5  # Attempts per batch before giving up
+# Metadata fields queries filter on; pod indexes index only these, not the chunk text
+FILTER_FIELDS = ("source", "page_num", "page_end", "is_table", "section_path")
+# Upload only filter fields as metadata; only for indexes whose readers all hydrate from the chunk store
+SLIM_METADATA = os.getenv("PINECONE_SLIM_METADATA", "false").lower() in ("1", "true", "yes")
 
 
-def initialize_pinecone():
-    """Initialize Pinecone client and return the index."""
+def check_provider_dimension() -> None:
+    """Fail before any embedding work if the configured provider does not match VECTOR_DIMENSION."""
+    check_index_dimension(get_embedding_provider().dimensions, VECTOR_DIMENSION)
+
+
+def initialize_pinecone(pool_threads: int = 1, transport: Optional[str] = None, dimensions: Optional[int] = None):
+    """
+    Initialize Pinecone client and return the index.
+
+    Args:
+        pool_threads: Size of the index client's connection pool, so that
+            many threads can share it
+        transport: "rest" or "grpc"; defaults to PINECONE_TRANSPORT
+        dimensions: Dimensions of the vectors to upload; checked against
+            the index's dimension if given
+
+    Raises:
+        ValueError: If the API key is missing or the dimensions do not match
+    """
     if not PINECONE_API_KEY:
         raise ValueError("Pinecone API key not set. Check your .env file.")
 
     # Initialize Pinecone
-    pc = pinecone.Pinecone(api_key=PINECONE_API_KEY)
+    pc = create_pinecone_client(PINECONE_API_KEY, transport)
 
     # Check if index exists, create if it doesn't
     index_list = [index.name for index in pc.list_indexes()]
@@ -42,7 +79,8 @@ def initialize_pinecone():
                 dimension=VECTOR_DIMENSION,
                 metric="cosine",
                 spec=pinecone.PodSpec(
-                    environment="gcp-starter"
+                    environment="gcp-starter",
+                    metadata_config={"indexed": list(FILTER_FIELDS)}
                 )
             )
         except Exception as e:
@@ -62,21 +100,30 @@ def initialize_pinecone():
         print("Waiting for index to be ready...")
         time.sleep(10)
 
+    if dimensions is not None:
+        check_index_dimension(dimensions, pc.describe_index(INDEX_NAME).dimension)
+
     # Connect to the index
-    index = pc.Index(INDEX_NAME)
+    index = open_index(pc, INDEX_NAME, pool_threads)
     return index
 
 
-def prepare_vectors(chunks_with_embeddings: List[Dict]) -> List[Dict]:
+def prepare_vectors(chunks_with_embeddings: List[Dict], slim_metadata: Optional[bool] = None) -> List[Dict]:
     """
     Prepare vectors for Pinecone upsert.
 
     Args:
         chunks_with_embeddings: List of dictionaries containing chunks with embeddings
+        slim_metadata: Copy only the filter fields into the metadata, leaving
+            the text to the local chunk store; defaults to PINECONE_SLIM_METADATA.
+            The standalone Streamlit apps read the text from the metadata and
+            cannot reach the chunk store
 
     Returns:
         List of dictionaries formatted for Pinecone upsert
     """
+    if slim_metadata is None:
+        slim_metadata = SLIM_METADATA
     vectors = []
 
     for chunk in chunks_with_embeddings:
@@ -84,13 +131,22 @@ def prepare_vectors(chunks_with_embeddings: List[Dict]) -> List[Dict]:
         if "embedding" not in chunk:
             continue
 
-        # Create metadata (excluding the embedding and limiting text size)
-        metadata = {k: v for k, v in chunk.items() if k != "embedding"}
+        # Create metadata: every field but the embedding, or only the filter fields
+        if slim_metadata:
+            metadata = {k: v for k, v in chunk.items() if k in FILTER_FIELDS}
+        else:
+            metadata = {k: v for k, v in chunk.items() if k != "embedding"}
 
         # Limit text size in metadata (Pinecone has metadata size limits)
         if "text" in metadata and len(metadata["text"]) > 8000:
             metadata["text"] = metadata["text"][:8000] + "..."
 
+        # Every vector carries the filter fields, so "is_table: false" and
+        # page-range filters also match text chunks and single-page chunks
+        metadata.setdefault("is_table", False)
+        if "page_num" in metadata:
+            metadata.setdefault("page_end", metadata["page_num"])
+
         vector = {
             "id": chunk["chunk_id"],
             "values": chunk["embedding"],
@@ -102,116 +158,276 @@ def prepare_vectors(chunks_with_embeddings: List[Dict]) -> List[Dict]:
     return vectors
 
 
+def metadata_hash(chunk: Dict) -> str:
+    """Hash a chunk's fields other than its embedding, so the upload log can tell when they changed."""
+    fields = {k: v for k, v in chunk.items() if k != "embedding"}
+    return hashlib.sha256(json.dumps(fields, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def remove_upload_log(checkpoint_path: str) -> None:
+    """Remove an upload checkpoint log, along with a JSON array checkpoint of an older version."""
+    while True:
+        try:
+            os.remove(resolve_artifact_path(checkpoint_path))
+        except FileNotFoundError:
+            return
+
+
+def load_uploaded_ids(checkpoint_path: Optional[str], resume: bool) -> Dict[str, Optional[str]]:
+    """
+    Read the IDs logged as uploaded by a previous run, with the metadata hash each was uploaded with.
+
+    Without resume, any old log is removed so the new run starts a fresh one.
+    Checkpoints written as a JSON array of IDs by older versions are read
+    too; their IDs have no hash.
+
+    Args:
+        checkpoint_path: Upload checkpoint log path (JSON Lines)
+        resume: Whether to resume from the checkpoint
+
+    Returns:
+        Mapping of uploaded chunk ID to metadata hash (None if not logged)
+    """
+    if not checkpoint_path:
+        return {}
+    if not resume:
+        remove_upload_log(checkpoint_path)
+        return {}
+
+    try:
+        path = resolve_artifact_path(checkpoint_path)
+    except FileNotFoundError:
+        return {}
+    if is_jsonl(path):
+        return {record["chunk_id"]: record.get("hash") for record in iter_log_records(path)}
+    return dict.fromkeys(iter_records(path))
+
+
+def upsert_with_retry(index: Any, batch: List[Dict], retries: int = UPSERT_RETRIES) -> Tuple[int, float, int]:
+    """
+    Upsert one batch, retrying transient failures with exponential backoff.
+
+    Rate limits, server and connection errors are retried; other errors
+    (e.g. a 400 for a dimension mismatch or oversized metadata, or a 401)
+    would fail the same way again, so they are raised at once.
+
+    Args:
+        index: Pinecone index
+        batch: Vectors to upsert
+        retries: Attempts before the last error is raised
+
+    Returns:
+        Tuple of (upserted count, seconds the successful request took, attempts)
+    """
+    for attempt in range(1, retries + 1):
+        started = time.perf_counter()
+        try:
+            response = index.upsert(vectors=batch)
+            return upserted_count(response), time.perf_counter() - started, attempt
+        except Exception as e:
+            if attempt == retries or not is_transient_error(e):
+                raise
+            delay = min(30, 2 ** attempt)
+            print(f"Upsert of {len(batch)} vectors failed ({str(e)}); retry {attempt} in {delay}s")
+            time.sleep(delay)
+
+
+def print_upload_metrics(latencies: List[float], vectors: int, elapsed: float, workers: int, retries: int) -> None:
+    """Print throughput and batch latency percentiles, for sizing the worker pool."""
+    if not latencies:
+        return
+    ordered = sorted(latencies)
+    p50 = ordered[len(ordered) // 2]
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"Upserted {vectors} vectors in {len(latencies)} batches in {elapsed:.1f}s "
+          f"({vectors / elapsed if elapsed else 0:.0f} vectors/s) with {workers} workers; "
+          f"batch latency p50 {p50 * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms, max {ordered[-1] * 1000:.0f} ms; "
+          f"{retries} retries")
+
+
 def upload_to_pinecone(
-    chunks_with_embeddings: List[Dict],
+    chunks_with_embeddings: Sequence[Dict],
     batch_size: int = BATCH_SIZE,
     checkpoint_path: Optional[str] = None,
-    resume: bool = False
+    resume: bool = False,
+    max_workers: int = MAX_WORKERS,
+    transport: Optional[str] = None,
+    slim_metadata: Optional[bool] = None
 ) -> None:
     """
-    Upload vectors to Pinecone with batch processing and error handling.
+    Upload vectors to Pinecone with concurrent batches and error handling.
+
+    Up to max_workers batches are upserted at once over a pooled client;
+    as each finishes its IDs are appended to the checkpoint log. A batch
+    that still fails after its retries stops the upload once the batches
+    in flight have finished, so everything that made it is checkpointed;
+    once every batch has succeeded the log is removed.
+    Each batch is written to the local chunk store before it is upserted,
+    so no search result lacks its text.
 
     Args:
-        chunks_with_embeddings: List of dictionaries containing chunks with embeddings
+        chunks_with_embeddings: Chunks with embeddings, as a list or an
+            EmbeddingStore opened from a binary store
         batch_size: Number of vectors to upsert in one batch
-        checkpoint_path: Optional path to save checkpoints during processing
+        checkpoint_path: Optional path of the append-only log of uploaded
+            IDs (JSON Lines)
         resume: Whether to resume from a checkpoint
+        max_workers: Number of batches upserted concurrently
+        transport: "rest" or "grpc"; defaults to PINECONE_TRANSPORT
+        slim_metadata: Upload only the filter fields as metadata; defaults
+            to PINECONE_SLIM_METADATA
     """
-    # Initialize Pinecone
-    index = initialize_pinecone()
+    # Initialize Pinecone, failing before any upsert if the vectors do not fit the index
+    vectors = getattr(chunks_with_embeddings, "vectors", None)
+    if vectors is not None:
+        dimensions = vectors.shape[1]
+    else:
+        dimensions = len(chunks_with_embeddings[0]["embedding"]) if len(chunks_with_embeddings) else None
+    index = initialize_pinecone(pool_threads=max_workers, transport=transport, dimensions=dimensions)
+    chunk_store = get_chunk_store()
 
     # Get index stats
     stats = index.describe_index_stats()
     print(f"Index stats before upload: {stats}")
 
-    # Resume from checkpoint if requested
-    start_idx = 0
-    if resume and checkpoint_path and os.path.exists(checkpoint_path):
-        with open(checkpoint_path, 'r', encoding='utf-8') as f:
-            uploaded_ids = json.load(f)
-
-        # Filter out already uploaded chunks
-        chunks_to_upload = [chunk for chunk in chunks_with_embeddings
-                           if chunk["chunk_id"] not in uploaded_ids]
-
-        print(f"Resuming upload: {len(uploaded_ids)} vectors already uploaded, "
-              f"{len(chunks_to_upload)} vectors remaining")
-
-        # If all chunks are uploaded, just return
-        if not chunks_to_upload:
+    # Resume from checkpoint if requested; a chunk whose metadata changed
+    # since it was logged (e.g. moved to another page) is uploaded again
+    uploaded_ids = load_uploaded_ids(checkpoint_path, resume)
+    records = getattr(chunks_with_embeddings, "metadata", None) or chunks_with_embeddings
+    hashes = {record["chunk_id"]: metadata_hash(record) for record in records} if checkpoint_path else {}
+    rows = [
+        row for row, record in enumerate(records)
+        if record["chunk_id"] not in uploaded_ids
+        or uploaded_ids[record["chunk_id"]] not in (None, hashes[record["chunk_id"]])
+    ]
+    skipped = len(records) - len(rows)
+    if uploaded_ids:
+        print(f"Resuming upload: {skipped} vectors already uploaded, "
+              f"{len(rows)} vectors remaining")
+        if not rows:
             print("All vectors already uploaded")
+            remove_upload_log(checkpoint_path)
             return
-    else:
-        chunks_to_upload = chunks_with_embeddings
-        uploaded_ids = []
 
-    # Prepare vectors
-    vectors = prepare_vectors(chunks_to_upload)
-
-    # Upload vectors in batches
-    print(f"Uploading {len(vectors)} vectors to Pinecone in batches of {batch_size}...")
-
-    for i in tqdm(range(0, len(vectors), batch_size), desc="Uploading batches"):
-        # Get the current batch
-        batch = vectors[i:i + batch_size]
+    # Vectors are prepared a batch at a time, as workers become free
+    print(f"Uploading {len(rows)} vectors to Pinecone in batches of {batch_size} "
+          f"with {max_workers} workers...")
+    def prepare_batch(batch_rows: List[int]) -> List[Dict]:
+        chunks = [chunks_with_embeddings[row] for row in batch_rows]
+        chunk_store.put_many(chunks)
+        return prepare_vectors(chunks, slim_metadata)
+
+    batches = (prepare_batch(rows[i:i + batch_size]) for i in range(0, len(rows), batch_size))
+
+    pending: Dict[Future, List[Dict]] = {}
+    latencies = []
+    retries = 0
+    uploaded = 0
+    failure = None
+    started = time.perf_counter()
+    progress = tqdm(total=(len(rows) + batch_size - 1) // batch_size, desc="Uploading batches")
+
+    def collect(done: Set[Future]) -> None:
+        nonlocal retries, uploaded, failure
+        for future in done:
+            batch = pending.pop(future)
+            try:
+                upserted_count, latency, attempts = future.result()
+            except Exception as e:
+                print(f"Error uploading batch starting with {batch[0]['id']}: {str(e)}")
+                failure = failure or e
+                continue
+            if checkpoint_path:
+                append_records(
+                    ({"chunk_id": vector["id"], "hash": hashes[vector["id"]]} for vector in batch), checkpoint_path
+                )
+            latencies.append(latency)
+            retries += attempts - 1
+            uploaded += len(batch)
+            progress.update(1)
+            print(f"Batch {len(latencies)}: {len(batch)} vectors, upserted: {upserted_count}, "
+                  f"{latency * 1000:.0f} ms, {attempts} attempt(s)")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for batch in batches:
+            # Keep a bounded number of batches prepared or in flight
+            while len(pending) >= max_workers * 2 and failure is None:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            if failure is not None:
+                break
+            pending[executor.submit(upsert_with_retry, index, batch)] = batch
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    progress.close()
+
+    print_upload_metrics(latencies, uploaded, time.perf_counter() - started, max_workers, retries)
+    if failure is not None:
+        if checkpoint_path:
+            print(f"Progress saved to {checkpoint_path}")
+        raise failure
+
+    # The log only serves resuming this upload, so a later run must not skip its IDs
+    if checkpoint_path:
+        remove_upload_log(checkpoint_path)
 
-        try:
-            # Upsert the batch
-            upsert_response = index.upsert(vectors=batch)
+    # Get updated index stats
+    stats = index.describe_index_stats()
+    print(f"Index stats after upload: {stats}")
+    print(f"Successfully uploaded {skipped + uploaded} vectors to Pinecone")
 
-            # Add uploaded IDs to the list
-            for vector in batch:
-                uploaded_ids.append(vector["id"])
 
-            # Save checkpoint
-            if checkpoint_path:
-                os.makedirs(os.path.dirname(checkpoint_path) or '.', exist_ok=True)
-                with open(checkpoint_path, 'w', encoding='utf-8') as f:
-                    json.dump(uploaded_ids, f, ensure_ascii=False)
+def delete_from_pinecone(vector_ids: List[str], batch_size: int = DELETE_BATCH_SIZE) -> None:
+    """
+    Delete vectors from Pinecone by ID in batches, and their chunks from the chunk store.
 
-            # Print batch stats
-            print(f"Batch {i//batch_size + 1}: {len(batch)} vectors, "
-                  f"upserted: {upsert_response.get('upserted_count', 0)}")
+    Args:
+        vector_ids: IDs of the vectors to delete
+        batch_size: Number of IDs to delete in one request
+    """
+    if not vector_ids:
+        return
 
-            # Small delay between batches
-            time.sleep(0.5)
+    index = initialize_pinecone()
 
-        except Exception as e:
-            print(f"Error uploading batch starting at index {i}: {str(e)}")
-            # Save progress before raising the exception
-            if checkpoint_path and uploaded_ids:
-                os.makedirs(os.path.dirname(checkpoint_path) or '.', exist_ok=True)
-                with open(checkpoint_path, 'w', encoding='utf-8') as f:
-                    json.dump(uploaded_ids, f, ensure_ascii=False)
-                print(f"Progress saved to {checkpoint_path}")
-            raise
+    print(f"Deleting {len(vector_ids)} vectors from Pinecone in batches of {batch_size}...")
+    for i in tqdm(range(0, len(vector_ids), batch_size), desc="Deleting batches"):
+        index.delete(ids=vector_ids[i:i + batch_size])
+    get_chunk_store().delete_many(vector_ids)
 
-    # Get updated index stats
-    stats = index.describe_index_stats()
-    print(f"Index stats after upload: {stats}")
-    print(f"Successfully uploaded {len(uploaded_ids)} vectors to Pinecone")
+    print(f"Deleted {len(vector_ids)} vectors from Pinecone")
 
 
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Upload embeddings to Pinecone")
-    parser.add_argument("input_json", help="Path to the JSON file with chunks and embeddings")
+    parser.add_argument("input_json", help="Path to the embeddings (.npy binary store or JSON file)")
     parser.add_argument("--batch-size", "-b", type=int, default=BATCH_SIZE,
                         help=f"Batch size for Pinecone upserts (default: {BATCH_SIZE})")
-    parser.add_argument("--checkpoint", "-c", help="Checkpoint file path")
+    parser.add_argument("--checkpoint", "-c", help="Checkpoint log path (.jsonl)")
+    parser.add_argument("--workers", "-w", type=int, default=MAX_WORKERS,
+                        help=f"Batches upserted concurrently (default: {MAX_WORKERS})")
+    parser.add_argument("--transport", choices=TRANSPORTS,
+                        help="Pinecone transport (default: PINECONE_TRANSPORT environment variable, else rest)")
+    parser.add_argument("--slim-metadata", action="store_true", default=None,
+                        help="Upload only filter fields as metadata; every reader must hydrate from the chunk store "
+                             "(default: PINECONE_SLIM_METADATA environment variable)")
     parser.add_argument("--resume", "-r", action="store_true",
                         help="Resume from checkpoint")
 
     args = parser.parse_args()
 
     # Load the chunks with embeddings
-    with open(args.input_json, 'r', encoding='utf-8') as f:
-        chunks_with_embeddings = json.load(f)
+    chunks_with_embeddings = load_embeddings(args.input_json)
 
     upload_to_pinecone(
         chunks_with_embeddings,
         args.batch_size,
         args.checkpoint,
-        args.resume
+        args.resume,
+        args.workers,
+        args.transport,
+        args.slim_metadata
     )
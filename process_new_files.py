@@ -9,16 +9,19 @@ This script processes additional files for the RAG system:
 """
 
 import os
-import json
 import argparse
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from dotenv import load_dotenv
 
 # Import pipeline components
-from text_extractor import extract_text_from_file
+from text_extractor import extract_text_from_file, iter_pages_from_file
+from artifacts import count_records, iter_records, load_records, tee_to_jsonl
+from embedding_store import load_embeddings, resolve_embeddings_path
+from boilerplate import find_boilerplate_lines, strip_boilerplate, print_boilerplate_report
+from dedupe import deduplicate_chunks, print_dedupe_report
 from text_chunker import chunk_text
-from embeddings_generator import generate_embeddings
-from pinecone_uploader import upload_to_pinecone
+from embeddings_generator import generate_embeddings, BATCH_SIZE, MAX_BATCH_TOKENS
+from pinecone_uploader import check_provider_dimension, upload_to_pinecone
 
 # Load environment variables
 load_dotenv()
@@ -27,54 +30,89 @@ load_dotenv()
 os.makedirs("output", exist_ok=True)
 
 
-def process_file(
+def _chunk_file(
     file_path: str,
     skip_extraction: bool = False,
     skip_chunking: bool = False,
-    skip_embeddings: bool = False,
-    skip_upload: bool = False,
-    resume: bool = False
-):
+    stream: bool = False,
+    remove_boilerplate: bool = False,
+    workers: int = 1,
+    stitch_pages: bool = False
+) -> Tuple[List[Dict], int]:
     """
-    Process a single file through the RAG pipeline.
-    
-    Args:
-        file_path: Path to the file
-        skip_extraction: Skip the text extraction step
-        skip_chunking: Skip the text chunking step
-        skip_embeddings: Skip the embeddings generation step
-        skip_upload: Skip the Pinecone upload step
-        resume: Resume from checkpoints where possible
+    Extract and chunk one file (steps 1 and 2).
+
+    Returns:
+        Tuple of (chunks, number of pages extracted)
     """
     # Define output paths
     base_filename = os.path.splitext(os.path.basename(file_path))[0]
-    extracted_path = f"output/{base_filename}_extracted.json"
-    chunked_path = f"output/{base_filename}_chunked.json"
-    embeddings_path = f"output/{base_filename}_embeddings.json"
-    embeddings_checkpoint = f"output/{base_filename}_embeddings_checkpoint.json"
-    upload_checkpoint = f"output/{base_filename}_upload_checkpoint.json"
+    artifact_ext = ".jsonl" if stream else ".json"
+    extracted_path = f"output/{base_filename}_extracted{artifact_ext}"
+    chunked_path = f"output/{base_filename}_chunked{artifact_ext}"
     
     # Step 1: Extract text from file
     if not skip_extraction:
         print(f"\n=== Step 1: Extracting text from {file_path} ===")
-        pages_data = extract_text_from_file(file_path, extracted_path)
-    elif os.path.exists(extracted_path):
-        print(f"\n=== Step 1: Loading extracted text from file {extracted_path} ===")
-        with open(extracted_path, 'r', encoding='utf-8') as f:
-            pages_data = json.load(f)
+        if stream:
+            # Pages are appended to the JSONL artifact as chunking consumes them
+            pages_data = tee_to_jsonl(iter_pages_from_file(file_path), extracted_path)
+        else:
+            pages_data = extract_text_from_file(file_path, extracted_path)
     else:
-        raise FileNotFoundError(f"Extracted text file not found: {extracted_path}")
+        print(f"\n=== Step 1: Loading extracted text from file {extracted_path} ===")
+        pages_data = iter_records(extracted_path) if stream else load_records(extracted_path)
+    
+    # Strip running headers, footers and page numbers before chunking
+    boilerplate_report = {}
+    if remove_boilerplate and not skip_chunking:
+        print("\n=== Removing repeated headers and footers ===")
+        if stream:
+            # Detection needs every page, so finish writing the artifact first
+            for _ in pages_data:
+                pass
+            boilerplate = find_boilerplate_lines(iter_records(extracted_path))
+            pages_data = strip_boilerplate(iter_records(extracted_path), boilerplate, boilerplate_report)
+        else:
+            boilerplate = find_boilerplate_lines(pages_data)
+            pages_data = list(strip_boilerplate(pages_data, boilerplate, boilerplate_report))
     
     # Step 2: Chunk the text
     if not skip_chunking:
         print("\n=== Step 2: Chunking text ===")
-        chunks_data = chunk_text(pages_data, output_path=chunked_path)
-    elif os.path.exists(chunked_path):
-        print(f"\n=== Step 2: Loading chunked text from file {chunked_path} ===")
-        with open(chunked_path, 'r', encoding='utf-8') as f:
-            chunks_data = json.load(f)
+        chunks_data = chunk_text(
+            pages_data, output_path=chunked_path, workers=workers, stitch_pages=stitch_pages
+        )
+        if boilerplate_report:
+            print_boilerplate_report(boilerplate_report)
     else:
-        raise FileNotFoundError(f"Chunked text file not found: {chunked_path}")
+        if stream and not skip_extraction:
+            # Nothing consumes the page stream, so run extraction to completion here
+            for _ in pages_data:
+                pass
+        print(f"\n=== Step 2: Loading chunked text from file {chunked_path} ===")
+        chunks_data = load_records(chunked_path)
+    
+    page_count = count_records(extracted_path) if stream else len(pages_data)
+    return chunks_data, page_count
+
+
+def _embed_and_upload(
+    file_path: str,
+    chunks_data: List[Dict],
+    page_count: int,
+    skip_embeddings: bool = False,
+    skip_upload: bool = False,
+    resume: bool = False,
+    async_embeddings: bool = False,
+    batch_api_embeddings: bool = False,
+    slim_metadata: Optional[bool] = None
+) -> None:
+    """Embed and upload the chunks of one file (steps 3 and 4) and print a summary."""
+    base_filename = os.path.splitext(os.path.basename(file_path))[0]
+    embeddings_path = f"output/{base_filename}_embeddings.npy"
+    embeddings_checkpoint = f"output/{base_filename}_embeddings_checkpoint.jsonl"
+    upload_checkpoint = f"output/{base_filename}_upload_checkpoint.jsonl"
     
     # Step 3: Generate embeddings
     if not skip_embeddings:
@@ -83,14 +121,13 @@ def process_file(
             chunks_data,
             output_path=embeddings_path,
             checkpoint_path=embeddings_checkpoint,
-            resume=resume
+            resume=resume,
+            use_async=async_embeddings,
+            use_batch_api=batch_api_embeddings
         )
-    elif os.path.exists(embeddings_path):
-        print(f"\n=== Step 3: Loading embeddings from file {embeddings_path} ===")
-        with open(embeddings_path, 'r', encoding='utf-8') as f:
-            chunks_with_embeddings = json.load(f)
     else:
-        raise FileNotFoundError(f"Embeddings file not found: {embeddings_path}")
+        print(f"\n=== Step 3: Loading embeddings from file {resolve_embeddings_path(embeddings_path)} ===")
+        chunks_with_embeddings = load_embeddings(embeddings_path)
     
     # Step 4: Upload to Pinecone
     if not skip_upload:
@@ -98,15 +135,76 @@ def process_file(
         upload_to_pinecone(
             chunks_with_embeddings,
             checkpoint_path=upload_checkpoint,
-            resume=resume
+            resume=resume,
+            slim_metadata=slim_metadata
         )
     
     print(f"\n=== Pipeline completed successfully for {file_path} ===")
-    print(f"Processed {len(pages_data)} pages")
+    print(f"Processed {page_count} pages")
     print(f"Created {len(chunks_data)} chunks")
     print(f"Generated {len(chunks_with_embeddings)} embeddings")
     print("Data uploaded to Pinecone")
+
+
+def process_file(
+    file_path: str,
+    skip_extraction: bool = False,
+    skip_chunking: bool = False,
+    skip_embeddings: bool = False,
+    skip_upload: bool = False,
+    resume: bool = False,
+    stream: bool = False,
+    remove_boilerplate: bool = False,
+    workers: int = 1,
+    dedupe: bool = False,
+    stitch_pages: bool = False,
+    async_embeddings: bool = False,
+    batch_api_embeddings: bool = False,
+    slim_metadata: Optional[bool] = None
+):
+    """
+    Process a single file through the RAG pipeline.
+    
+    Args:
+        file_path: Path to the file
+        skip_extraction: Skip the text extraction step
+        skip_chunking: Skip the text chunking step
+        skip_embeddings: Skip the embeddings generation step
+        skip_upload: Skip the Pinecone upload step
+        resume: Resume from checkpoints where possible
+        stream: Stream pages from extraction straight into chunking and
+            write JSON Lines artifacts instead of JSON arrays
+        remove_boilerplate: Strip headers, footers and page numbers that
+            repeat across pages before chunking
+        workers: Number of worker processes for chunking
+        dedupe: Drop near-duplicate chunks within the file before embedding,
+            recording the duplicates' pages on the chunk that is kept
+        stitch_pages: Let chunks cross page breaks, recording the pages
+            each chunk spans
+        async_embeddings: Generate embeddings with concurrent requests paced
+            by the requests/tokens per minute limiter
+        batch_api_embeddings: Generate embeddings with one Batch API job,
+            waiting for it to finish
+        slim_metadata: Upload only filter fields as metadata, leaving the
+            text to the local chunk store; defaults to PINECONE_SLIM_METADATA
+    """
+    # Embeddings the index cannot take would only fail at upload time
+    if not skip_embeddings and not skip_upload:
+        check_provider_dimension()
     
+    chunks_data, page_count = _chunk_file(
+        file_path, skip_extraction, skip_chunking, stream, remove_boilerplate, workers, stitch_pages
+    )
+    
+    # Drop near-duplicate chunks so only one copy is embedded and stored
+    if dedupe:
+        chunks_data, dedupe_report = deduplicate_chunks(chunks_data)
+        print_dedupe_report(dedupe_report, BATCH_SIZE, MAX_BATCH_TOKENS)
+    
+    _embed_and_upload(
+        file_path, chunks_data, page_count, skip_embeddings, skip_upload, resume,
+        async_embeddings, batch_api_embeddings, slim_metadata
+    )
     return True
 
 
@@ -116,11 +214,25 @@ def process_multiple_files(
     skip_chunking: bool = False,
     skip_embeddings: bool = False,
     skip_upload: bool = False,
-    resume: bool = False
+    resume: bool = False,
+    stream: bool = False,
+    remove_boilerplate: bool = False,
+    workers: int = 1,
+    dedupe: bool = False,
+    stitch_pages: bool = False,
+    async_embeddings: bool = False,
+    batch_api_embeddings: bool = False,
+    slim_metadata: Optional[bool] = None
 ):
     """
     Process multiple files through the RAG pipeline.
     
+    With dedupe, every file is extracted and chunked first and near-duplicates
+    are removed across all of them, so a paragraph repeated in several
+    documents is embedded once and the kept chunk lists every source and
+    page it appears on; the remaining chunks are then embedded and uploaded
+    file by file.
+    
     Args:
         file_paths: List of paths to the files
         skip_extraction: Skip the text extraction step
@@ -128,24 +240,76 @@ def process_multiple_files(
         skip_embeddings: Skip the embeddings generation step
         skip_upload: Skip the Pinecone upload step
         resume: Resume from checkpoints where possible
+        stream: Stream pages into chunking and write JSONL artifacts
+        remove_boilerplate: Strip repeated headers and footers before chunking
+        workers: Number of worker processes for chunking
+        dedupe: Drop near-duplicate chunks across all the files before embedding
+        stitch_pages: Let chunks cross page breaks
+        async_embeddings: Generate embeddings with concurrent rate-limited requests
+        batch_api_embeddings: Generate embeddings with one Batch API job
+        slim_metadata: Upload only filter fields as metadata
     """
     results = {}
+    if not skip_embeddings and not skip_upload:
+        check_provider_dimension()
     
-    for file_path in file_paths:
-        print(f"\n\n=== Processing file: {file_path} ===")
-        try:
-            success = process_file(
-                file_path,
-                skip_extraction,
-                skip_chunking,
-                skip_embeddings,
-                skip_upload,
-                resume
-            )
-            results[file_path] = "Success" if success else "Failed"
-        except Exception as e:
-            print(f"Error processing {file_path}: {str(e)}")
-            results[file_path] = f"Error: {str(e)}"
+    if not dedupe:
+        for file_path in file_paths:
+            print(f"\n\n=== Processing file: {file_path} ===")
+            try:
+                success = process_file(
+                    file_path,
+                    skip_extraction,
+                    skip_chunking,
+                    skip_embeddings,
+                    skip_upload,
+                    resume,
+                    stream,
+                    remove_boilerplate,
+                    workers,
+                    dedupe,
+                    stitch_pages,
+                    async_embeddings,
+                    batch_api_embeddings,
+                    slim_metadata
+                )
+                results[file_path] = "Success" if success else "Failed"
+            except Exception as e:
+                print(f"Error processing {file_path}: {str(e)}")
+                results[file_path] = f"Error: {str(e)}"
+    else:
+        # Chunk every file first so duplicates are found across documents
+        chunked = {}
+        for file_path in file_paths:
+            print(f"\n\n=== Chunking file: {file_path} ===")
+            try:
+                chunked[file_path] = _chunk_file(
+                    file_path, skip_extraction, skip_chunking, stream, remove_boilerplate, workers, stitch_pages
+                )
+            except Exception as e:
+                print(f"Error processing {file_path}: {str(e)}")
+                results[file_path] = f"Error: {str(e)}"
+        
+        # Chunk IDs carry a per-source prefix, so kept chunks can be routed back to their file
+        owners = {chunk["chunk_id"]: file_path for file_path, (chunks, _) in chunked.items() for chunk in chunks}
+        kept, dedupe_report = deduplicate_chunks([chunk for chunks, _ in chunked.values() for chunk in chunks])
+        print_dedupe_report(dedupe_report, BATCH_SIZE, MAX_BATCH_TOKENS)
+        kept_by_file = {file_path: [] for file_path in chunked}
+        for chunk in kept:
+            kept_by_file[owners[chunk["chunk_id"]]].append(chunk)
+        
+        for file_path, (_, page_count) in chunked.items():
+            print(f"\n\n=== Processing file: {file_path} ===")
+            try:
+                _embed_and_upload(
+                    file_path, kept_by_file[file_path], page_count, skip_embeddings, skip_upload, resume,
+                    async_embeddings, batch_api_embeddings, slim_metadata
+                )
+                results[file_path] = "Success"
+            except Exception as e:
+                print(f"Error processing {file_path}: {str(e)}")
+                results[file_path] = f"Error: {str(e)}"
+        results = {file_path: results[file_path] for file_path in file_paths if file_path in results}
     
     print("\n\n=== Processing Summary ===")
     for file_path, status in results.items():
@@ -162,6 +326,23 @@ if __name__ == "__main__":
     parser.add_argument("--skip-embeddings", action="store_true", help="Skip embeddings generation")
     parser.add_argument("--skip-upload", action="store_true", help="Skip Pinecone upload")
     parser.add_argument("--resume", action="store_true", help="Resume from checkpoints")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream pages into chunking and write JSONL artifacts")
+    parser.add_argument("--strip-boilerplate", action="store_true",
+                        help="Remove repeated headers, footers and page numbers before chunking")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Drop near-duplicate chunks across all the files before generating embeddings")
+    parser.add_argument("--stitch-pages", action="store_true",
+                        help="Let chunks cross page breaks, recording the pages each chunk spans")
+    parser.add_argument("--async-embeddings", action="store_true",
+                        help="Send concurrent embedding requests paced by the RPM/TPM limiter")
+    parser.add_argument("--batch-api-embeddings", action="store_true",
+                        help="Embed through one Batch API job (cheaper, may take hours); resume with --resume")
+    parser.add_argument("--slim-metadata", action="store_true", default=None,
+                        help="Upload only filter fields as metadata (the standalone Streamlit apps need the full "
+                             "metadata; default: PINECONE_SLIM_METADATA environment variable)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes for chunking (default: 1)")
     
     args = parser.parse_args()
     
@@ -172,7 +353,15 @@ if __name__ == "__main__":
             args.skip_chunking,
             args.skip_embeddings,
             args.skip_upload,
-            args.resume
+            args.resume,
+            args.stream,
+            args.strip_boilerplate,
+            args.workers,
+            args.dedupe,
+            args.stitch_pages,
+            args.async_embeddings,
+            args.batch_api_embeddings,
+            args.slim_metadata
         )
     else:
         # Default files to process if none specified
@@ -192,5 +381,13 @@ if __name__ == "__main__":
             args.skip_chunking,
             args.skip_embeddings,
             args.skip_upload,
-            args.resume
+            args.resume,
+            args.stream,
+            args.strip_boilerplate,
+            args.workers,
+            args.dedupe,
+            args.stitch_pages,
+            args.async_embeddings,
+            args.batch_api_embeddings,
+            args.slim_metadata
         )
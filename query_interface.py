@@ -7,10 +7,14 @@ It handles query embedding, vector search, and result formatting.
 
 import os
 import json
-from typing import Dict, List, Optional, Any
+from functools import lru_cache
+from typing import Dict, List, Optional, Any, Sequence, Tuple, Union
 import openai
-import pinecone
 from dotenv import load_dotenv
+from chunk_store import hydrate_matches
+from embedding_cache import EMBEDDING_CACHE_PATH, get_embedding_cache
+from embedding_providers import EmbeddingProvider, check_index_dimension, get_embedding_provider
+from pinecone_transport import create_pinecone_client, open_index
 
 # Try to import streamlit for secrets
 try:
@@ -44,14 +48,17 @@ if PINECONE_ENVIRONMENT:
     os.environ["PINECONE_ENVIRONMENT"] = PINECONE_ENVIRONMENT
 
 INDEX_NAME = "new-rag-index"
-
-# OpenAI constants
-EMBEDDING_MODEL = "text-embedding-3-small"
-EMBEDDING_DIMENSIONS = 1536  # Updated to match the dimension of the index
+PINECONE_TRANSPORT = get_env_var("PINECONE_TRANSPORT")  # "rest" (default) or "grpc"
 
 
+@lru_cache(maxsize=None)
 def initialize_pinecone():
-    """Initialize Pinecone client and return the index."""
+    """
+    Initialize Pinecone client and return the index.
+
+    The index handle is created once per process and reused, so a gRPC
+    channel or REST connection pool is not rebuilt for every query.
+    """
     if not PINECONE_API_KEY:
         if STREAMLIT_AVAILABLE and hasattr(st, "secrets"):
             if "general" not in st.secrets:
@@ -63,15 +70,18 @@ def initialize_pinecone():
 
     try:
         # Initialize Pinecone
-        pc = pinecone.Pinecone(api_key=PINECONE_API_KEY)
+        pc = create_pinecone_client(PINECONE_API_KEY, PINECONE_TRANSPORT)
 
         # Connect to the index
         index_list = [index.name for index in pc.list_indexes()]
         if INDEX_NAME not in index_list:
             raise ValueError(f"Index {INDEX_NAME} does not exist. Run the uploader first.")
 
+        # Queries embedded at another dimension would fail on every search
+        check_index_dimension(get_embedding_provider().dimensions, pc.describe_index(INDEX_NAME).dimension)
+
         # Connect to the index
-        index = pc.Index(INDEX_NAME)
+        index = open_index(pc, INDEX_NAME)
         return index
     except Exception as e:
         if STREAMLIT_AVAILABLE:
@@ -79,26 +89,85 @@ def initialize_pinecone():
         raise ValueError(f"Failed to initialize Pinecone: {str(e)}")
 
 
-def get_query_embedding(query: str) -> List[float]:
+def get_query_embedding(
+    query: str,
+    cache_path: Optional[str] = EMBEDDING_CACHE_PATH,
+    provider: Optional[EmbeddingProvider] = None
+) -> List[float]:
     """
-    Get embedding for a query string.
+    Get embedding for a query string, from the embedding cache when it was seen before.
+
+    The query is embedded by the same provider, model and dimensions as the
+    indexed chunks.
 
     Args:
         query: Query string
+        cache_path: Embedding cache database; None skips the cache
+        provider: Embedding provider; defaults to get_embedding_provider()
 
     Returns:
         Embedding vector
     """
-    response = openai.embeddings.create(
-        input=[query],
-        model=EMBEDDING_MODEL,
-        dimensions=EMBEDDING_DIMENSIONS
-    )
-
-    return response.data[0].embedding
+    provider = provider or get_embedding_provider()
+    cache = get_embedding_cache(cache_path) if cache_path else None
+    if cache is not None:
+        embedding = cache.get(provider.name, provider.dimensions, query)
+        if embedding is not None:
+            return embedding
+
+    embedding = provider.embed_query(query)
+
+    if cache is not None:
+        cache.put(provider.name, provider.dimensions, query, embedding)
+    return embedding
+
+
+def build_filter(
+    section: Optional[str] = None,
+    source: Optional[Union[str, Sequence[str]]] = None,
+    pages: Optional[Tuple[int, int]] = None,
+    is_table: Optional[bool] = None
+) -> Optional[Dict]:
+    """
+    Build a Pinecone metadata filter from search restrictions.
 
+    Args:
+        section: Section or chapter number, e.g. "9" or "9.2"
+        source: Source document name, or several
+        pages: Inclusive (first, last) page range; chunks overlapping it match
+        is_table: True for table chunks only, False for text chunks only
 
-def search_pinecone(query: str, top_k: int = 5, include_metadata: bool = True) -> List[Dict]:
+    Returns:
+        Filter dictionary, or None when nothing is restricted
+    """
+    conditions = []
+    if section:
+        # Chunks store every ancestor section number in section_path
+        conditions.append({"section_path": {"$in": [section]}})
+    if source:
+        sources = [source] if isinstance(source, str) else list(source)
+        conditions.append({"source": {"$in": sources}})
+    if pages:
+        first, last = pages
+        conditions.append({"page_num": {"$lte": last}})
+        conditions.append({"page_end": {"$gte": first}})
+    if is_table is not None:
+        conditions.append({"is_table": {"$eq": is_table}})
+
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def search_pinecone(
+    query: str,
+    top_k: int = 5,
+    include_metadata: bool = True,
+    section: Optional[str] = None,
+    source: Optional[Union[str, Sequence[str]]] = None,
+    pages: Optional[Tuple[int, int]] = None,
+    is_table: Optional[bool] = None
+) -> List[Dict]:
     """
     Search Pinecone index with a query string.
 
@@ -106,6 +175,12 @@ def search_pinecone(query: str, top_k: int = 5, include_metadata: bool = True) -
         query: Query string
         top_k: Number of results to return
         include_metadata: Whether to include metadata in results
+        section: Optional section number (e.g. "9" or "9.2") to restrict the
+            search to chunks within that chapter or section
+        source: Optional source document name, or several, to search only
+            that corpus
+        pages: Optional inclusive (first, last) page range
+        is_table: Optional restriction to table (True) or text (False) chunks
 
     Returns:
         List of search results
@@ -116,14 +191,42 @@ def search_pinecone(query: str, top_k: int = 5, include_metadata: bool = True) -
     # Get query embedding
     query_embedding = get_query_embedding(query)
 
+    query_filter = build_filter(section, source, pages, is_table)
+
     # Search Pinecone
     search_response = index.query(
         vector=query_embedding,
         top_k=top_k,
-        include_metadata=include_metadata
+        include_metadata=include_metadata,
+        filter=query_filter
     )
 
-    return search_response["matches"]
+    # Vectors uploaded with slim metadata have no text; fetch it for all such matches at once
+    matches = search_response["matches"]
+    return hydrate_matches(matches) if include_metadata else matches
+
+
+def parse_page_range(value: str) -> Tuple[int, int]:
+    """Parse "12" or "12-20" into an inclusive (first, last) page range."""
+    first, _, last = value.partition("-")
+    return int(first), int(last or first)
+
+
+def format_page_span(metadata: Dict) -> str:
+    """
+    Format the page, or page range, a chunk comes from for citation.
+
+    Args:
+        metadata: Chunk metadata from Pinecone
+
+    Returns:
+        "12", or "12-13" for a chunk that crosses a page break
+    """
+    page_num = metadata.get("page_num", "Unknown")
+    page_end = metadata.get("page_end", page_num)
+    if page_end != page_num:
+        return f"{int(page_num)}-{int(page_end)}"
+    return str(int(page_num)) if isinstance(page_num, (int, float)) else str(page_num)
 
 
 def format_search_results(results: List[Dict]) -> List[Dict]:
@@ -142,7 +245,7 @@ def format_search_results(results: List[Dict]) -> List[Dict]:
         formatted_result = {
             "rank": i + 1,
             "score": result["score"],
-            "page": result["metadata"].get("page_num", "Unknown"),
+            "page": format_page_span(result["metadata"]),
             "text": result["metadata"].get("text", ""),
             "source": result["metadata"].get("source", "Unknown"),
             "chunk_id": result["id"]
@@ -153,13 +256,24 @@ def format_search_results(results: List[Dict]) -> List[Dict]:
     return formatted_results
 
 
-def query_rag_system(query: str, top_k: int = 5) -> List[Dict]:
+def query_rag_system(
+    query: str,
+    top_k: int = 5,
+    section: Optional[str] = None,
+    source: Optional[Union[str, Sequence[str]]] = None,
+    pages: Optional[Tuple[int, int]] = None,
+    is_table: Optional[bool] = None
+) -> List[Dict]:
     """
     Query the RAG system with a natural language query.
 
     Args:
         query: Natural language query
         top_k: Number of results to return
+        section: Optional section number to restrict the search to
+        source: Optional source document name(s) to restrict the search to
+        pages: Optional inclusive (first, last) page range
+        is_table: Optional restriction to table (True) or text (False) chunks
 
     Returns:
         Formatted search results
@@ -167,7 +281,7 @@ def query_rag_system(query: str, top_k: int = 5) -> List[Dict]:
     print(f"Searching for: {query}")
 
     # Search Pinecone
-    results = search_pinecone(query, top_k)
+    results = search_pinecone(query, top_k, section=section, source=source, pages=pages, is_table=is_table)
 
     # Format results
     formatted_results = format_search_results(results)
@@ -183,11 +297,21 @@ if __name__ == "__main__":
     parser.add_argument("--top-k", "-k", type=int, default=5,
                         help="Number of results to return (default: 5)")
     parser.add_argument("--output", "-o", help="Output JSON file path for results")
+    parser.add_argument("--section", "-s",
+                        help="Only search within this section or chapter number (e.g. 9.2)")
+    parser.add_argument("--source", action="append",
+                        help="Only search this source document (repeat for several)")
+    parser.add_argument("--pages", type=parse_page_range,
+                        help="Only search chunks on these pages (e.g. 12 or 12-20)")
+    parser.add_argument("--tables", dest="is_table", action="store_const", const=True,
+                        help="Only search table chunks")
+    parser.add_argument("--no-tables", dest="is_table", action="store_const", const=False,
+                        help="Only search text chunks")
 
     args = parser.parse_args()
 
     # Query the RAG system
-    results = query_rag_system(args.query, args.top_k)
+    results = query_rag_system(args.query, args.top_k, args.section, args.source, args.pages, args.is_table)
 
     # Print results
     print("\nSearch Results:")
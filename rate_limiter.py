@@ -0,0 +1,220 @@
+"""
+Rate Limiter Module
+
+This module provides an asyncio token-bucket limiter for API calls that are
+limited both in requests per minute and in tokens per minute, as the OpenAI
+embeddings endpoint is. It paces requests up to the configured limits, follows
+the provider's rate-limit response headers, and backs off adaptively on 429s.
+"""
+
+import re
+import time
+import random
+import asyncio
+from typing import Callable, Mapping, Optional
+
+MIN_RATE_SCALE = 0.1  # Lowest fraction of the configured rates kept after repeated 429s
+RATE_RECOVERY = 0.05  # Fraction of the configured rates regained per successful request
+MAX_BACKOFF = 60.0  # Seconds
+
+DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a rate-limit reset duration such as "1s", "6m0s" or "20ms".
+
+    Args:
+        value: Header value
+
+    Returns:
+        Duration in seconds, or None if the value cannot be parsed
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Read how long a 429 response asks the client to wait.
+
+    Checks retry-after-ms, retry-after, then the reset time of whichever
+    rate limit is exhausted.
+
+    Args:
+        headers: Response headers
+
+    Returns:
+        Seconds to wait, or None if the headers do not say
+    """
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    wait = parse_duration(headers.get("retry-after"))
+    if wait is not None:
+        return wait
+
+    resets = []
+    for kind in ("requests", "tokens"):
+        if headers.get(f"x-ratelimit-remaining-{kind}") == "0":
+            resets.append(parse_duration(headers.get(f"x-ratelimit-reset-{kind}")))
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+class TokenBucket:
+    """
+    A bucket holding up to `capacity` units that refills at `rate` units per second.
+    """
+
+    def __init__(self, capacity: float, rate: float, now: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.level = capacity
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        """Add the units accumulated since the last update."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Return the seconds until `amount` units are available (0 if they are now)."""
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float) -> None:
+        """Take units from the bucket; the level may go negative for oversized requests."""
+        self.level -= amount
+
+
+class RateLimiter:
+    """
+    Asyncio limiter for requests-per-minute and tokens-per-minute limits.
+
+    Callers await acquire() with the token count of a request before sending
+    it. Requests are admitted in arrival order once both buckets hold enough
+    capacity. After a 429 the limiter pauses everyone for the time the
+    provider asked for and halves its rates; successful requests restore them
+    gradually (additive increase, multiplicative decrease).
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.clock = clock
+        now = clock()
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60, now)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60, now)
+        self.rate_scale = 1.0
+        self.paused_until = now
+        self.rate_limited = 0
+        self.waited = 0.0
+        self._lock = asyncio.Lock()
+
+    def _set_scale(self, scale: float) -> None:
+        self.rate_scale = max(MIN_RATE_SCALE, min(1.0, scale))
+        self.requests.rate = self.requests_per_minute / 60 * self.rate_scale
+        self.tokens.rate = self.tokens_per_minute / 60 * self.rate_scale
+
+    async def acquire(self, tokens: int) -> None:
+        """
+        Wait until a request of `tokens` tokens may be sent, then reserve it.
+
+        Args:
+            tokens: Input tokens in the request
+        """
+        async with self._lock:
+            while True:
+                now = self.clock()
+                self.requests.refill(now)
+                self.tokens.refill(now)
+                wait = max(
+                    self.paused_until - now,
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(tokens)
+                )
+                if wait <= 0:
+                    self.requests.consume(1)
+                    self.tokens.consume(tokens)
+                    return
+                self.waited += wait
+                await asyncio.sleep(wait)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Align the buckets with the x-ratelimit-remaining-* headers of a response.
+
+        The provider's view wins when it has less capacity left than we think,
+        e.g. because another process shares the same API key.
+
+        Args:
+            headers: Response headers
+        """
+        now = self.clock()
+        for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            try:
+                remaining = float(remaining)
+            except ValueError:
+                continue
+            bucket.refill(now)
+            bucket.level = min(bucket.level, remaining)
+
+        if self.rate_scale < 1.0:
+            self._set_scale(self.rate_scale + RATE_RECOVERY)
+
+    def backoff(self, headers: Optional[Mapping[str, str]], attempt: int) -> float:
+        """
+        Record a 429 response: pause all requests and lower the sending rate.
+
+        Args:
+            headers: Headers of the 429 response, if any
+            attempt: Zero-based retry attempt of the failed request
+
+        Returns:
+            Seconds until requests resume
+        """
+        self.rate_limited += 1
+        wait = retry_after_seconds(headers or {})
+        if wait is None:
+            # No hint from the provider: exponential backoff with jitter
+            wait = min(MAX_BACKOFF, 2 ** attempt) * (0.5 + random.random())
+
+        now = self.clock()
+        self.paused_until = max(self.paused_until, now + wait)
+        self._set_scale(self.rate_scale / 2)
+
+        # Nothing accumulates in the buckets while we were over the limit
+        for bucket in (self.requests, self.tokens):
+            bucket.refill(now)
+            bucket.level = min(bucket.level, 0)
+        return wait
+
+    def stats(self) -> dict:
+        """Return counters describing how the limiter behaved."""
+        return {
+            "rate_limited": self.rate_limited,
+            "seconds_waited": self.waited,
+            "rate_scale": self.rate_scale
+        }
@@ -0,0 +1,183 @@
+"""
+Table Extraction Module
+
+This module extracts tables as structured records instead of pipe-delimited text.
+It provides PyMuPDF-based table detection for PDF pages and a delimiter parser
+for text inputs, plus helpers to render table rows compactly for chunking.
+
+A table record looks like:
+    {"header": ["Use", "Parking"], "rows": [["Office", "1 per 100 sq m"], ...]}
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Rows like "|----|:---:|" or "+====+" that only draw table borders
+SEPARATOR_CELL = re.compile(r'^[\s\-:=+]*$')
+MIN_TABLE_ROWS = 2  # Fewer delimited lines than this are treated as text
+
+
+def _clean_cell(cell: Optional[str]) -> str:
+    """Collapse whitespace inside a cell; empty cells become ''."""
+    return " ".join(cell.split()) if cell else ""
+
+
+def split_delimited_row(line: str) -> Optional[List[str]]:
+    """
+    Split a pipe- or tab-delimited line into cells.
+
+    Args:
+        line: One line of text
+
+    Returns:
+        List of cell strings, or None if the line is not delimited
+    """
+    stripped = line.strip()
+    if '|' in stripped:
+        # Drop the outer border pipes of "| a | b |" style rows
+        cells = stripped.strip('|').split('|')
+    elif '\t' in stripped:
+        cells = stripped.split('\t')
+    else:
+        return None
+    return [_clean_cell(cell) for cell in cells]
+
+
+def is_separator_row(cells: List[str]) -> bool:
+    """Return True if a row only contains border characters."""
+    return all(SEPARATOR_CELL.match(cell) for cell in cells)
+
+
+def make_table(rows: List[List[str]], header: Optional[List[str]] = None) -> Dict:
+    """
+    Build a table record, taking the first row as header if none is given.
+
+    Args:
+        rows: Table rows as lists of cell strings
+        header: Optional header row
+
+    Returns:
+        Table record with header and rows
+    """
+    rows = [row for row in rows if any(row) and not is_separator_row(row)]
+    if header is None:
+        header = rows[0] if len(rows) > 1 else []
+        rows = rows[1:] if header else rows
+    return {"header": header, "rows": rows}
+
+
+def split_delimited_blocks(text: str) -> List[Tuple[str, object]]:
+    """
+    Split text into an ordered list of text blocks and table records.
+
+    Runs of at least MIN_TABLE_ROWS consecutive delimited lines become tables;
+    everything else stays text.
+
+    Args:
+        text: Text that may contain pipe- or tab-delimited tables
+
+    Returns:
+        List of ("text", str) and ("table", dict) tuples in document order
+    """
+    blocks = []
+    text_lines = []
+    table_rows = []
+    table_lines = []
+
+    def flush_table():
+        if len(table_rows) >= MIN_TABLE_ROWS:
+            if text_lines:
+                blocks.append(("text", '\n'.join(text_lines)))
+                text_lines.clear()
+            blocks.append(("table", make_table(list(table_rows))))
+        else:
+            text_lines.extend(table_lines)
+        table_rows.clear()
+        table_lines.clear()
+
+    for line in text.split('\n'):
+        cells = split_delimited_row(line)
+        if cells is not None:
+            table_rows.append(cells)
+            table_lines.append(line)
+        else:
+            if table_lines:
+                flush_table()
+            text_lines.append(line)
+
+    if table_lines:
+        flush_table()
+    if text_lines:
+        blocks.append(("text", '\n'.join(text_lines)))
+
+    return blocks
+
+
+def parse_delimited_tables(text: str) -> Tuple[str, List[Dict]]:
+    """
+    Separate delimited tables from the surrounding text.
+
+    Args:
+        text: Text that may contain pipe- or tab-delimited tables
+
+    Returns:
+        Tuple of (text with the tables removed, list of table records)
+    """
+    blocks = split_delimited_blocks(text)
+    remaining = '\n'.join(value for kind, value in blocks if kind == "text")
+    tables = [value for kind, value in blocks if kind == "table"]
+    return remaining, tables
+
+
+def _rects_intersect(a: Tuple[float, ...], b: Tuple[float, ...]) -> bool:
+    """Return True if two (x0, y0, x1, y1) rectangles overlap."""
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def extract_pdf_tables(page, textpage=None) -> Tuple[str, List[Dict]]:
+    """
+    Extract tables from a PyMuPDF page with page.find_tables().
+
+    Args:
+        page: PyMuPDF page object
+        textpage: Optional TextPage to reuse for the text outside the tables
+
+    Returns:
+        Tuple of (page text outside the table areas, list of table records)
+    """
+    tables = []
+    table_boxes = []
+
+    for table in page.find_tables().tables:
+        rows = [[_clean_cell(cell) for cell in row] for row in table.extract()]
+        header = [_clean_cell(name) for name in table.header.names]
+        # An internal header is also the first extracted row
+        if not table.header.external and rows:
+            rows = rows[1:]
+        record = make_table(rows, header if any(header) else None)
+        if record["rows"]:
+            tables.append(record)
+            table_boxes.append(tuple(table.bbox))
+
+    if not table_boxes:
+        return page.get_text(textpage=textpage), []
+
+    # Rebuild the page text from the blocks that lie outside every table
+    blocks = page.get_text("blocks", textpage=textpage)
+    text = "".join(
+        block[4] for block in blocks
+        if block[6] == 0 and not any(_rects_intersect(block[:4], box) for box in table_boxes)
+    )
+    return text, tables
+
+
+def render_row(cells: List[str]) -> str:
+    """Render a table row compactly as 'cell | cell | cell'."""
+    return " | ".join(cells)
+
+
+def render_table(table: Dict) -> str:
+    """Render a whole table record as compact pipe-delimited text."""
+    lines = [render_row(table["header"])] if table["header"] else []
+    lines.extend(render_row(row) for row in table["rows"])
+    return '\n'.join(lines)
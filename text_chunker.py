@@ -1,16 +1,53 @@
 """
 Text Chunking Module
 
-This module handles the chunking of extracted text using LangChain's text splitters.
-It provides functions to split text into chunks with appropriate overlap.
+This module handles the chunking of extracted text. The default splitter encodes
+each page once and cuts it on token offsets snapped to paragraph and sentence
+boundaries; LangChain's text splitter remains available for comparison.
+It provides functions to split text into chunks with appropriate overlap, either
+page by page or over each document's concatenated pages so that chunks can
+cross page breaks.
 """
 
-import os
-import json
-from typing import Dict, List, Optional
+import re
+import time
+import bisect
+import hashlib
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from tqdm import tqdm
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 import tiktoken
+from artifacts import iter_records, load_records, save_records
+from table_extractor import parse_delimited_tables, render_row
+
+# Default chunking settings
+CHUNK_SIZE = 512  # Target chunk size in tokens
+CHUNK_OVERLAP = 77  # ~15% of CHUNK_SIZE
+SPLITTERS = ("tokens", "langchain")
+PAGES_PER_TASK = 16  # Pages handed to a worker process at a time in parallel mode
+SOURCE_SLUG_LENGTH = 64  # Maximum length of the readable source part of a chunk ID
+SOURCE_HASH_LENGTH = 12  # Hex digits of the source name hash that keep namespaces apart
+CHUNK_HASH_LENGTH = 16  # Hex digits of the content hash kept in a chunk ID
+SENTENCE_ENDINGS = ".?!;:"
+PAGE_SEPARATOR = "\n"  # Joins pages when chunking across page breaks
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model_name: str = "text-embedding-3-small"):
+    """
+    Return the tiktoken encoding for a model, loading it only once per process.
+
+    Args:
+        model_name: The name of the model to use for tokenization
+
+    Returns:
+        tiktoken Encoding object
+    """
+    return tiktoken.encoding_for_model(model_name)
 
 
 def num_tokens_from_string(string: str, model_name: str = "text-embedding-3-small") -> int:
@@ -24,163 +61,575 @@ def num_tokens_from_string(string: str, model_name: str = "text-embedding-3-smal
     Returns:
         Number of tokens in the string
     """
-    encoding = tiktoken.encoding_for_model(model_name)
-    return len(encoding.encode(string))
+    return len(get_encoding(model_name).encode(string))
+
+
+def _boundary_rank(text: str, pos: int) -> int:
+    """
+    Rank a character offset as a place to end a chunk.
+
+    Returns 3 at a paragraph break, 2 at a line break, 1 after the end of a
+    sentence and 0 anywhere else. Breaks count on either side of the offset,
+    since tokenizers may attach whitespace to the following token.
+    """
+    if text.endswith("\n\n", 0, pos) or text.startswith("\n\n", pos):
+        return 3
+    if text.endswith("\n", 0, pos) or text.startswith("\n", pos):
+        return 2
+    if pos > 0 and text[pos - 1] in SENTENCE_ENDINGS and (pos == len(text) or text[pos].isspace()):
+        return 1
+    return 0
+
+
+def split_text_by_tokens(
+    text: str,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP
+) -> List[Tuple[str, int, int]]:
+    """
+    Split text into chunks of at most chunk_size tokens, encoding it only once.
+
+    Each chunk ends on the best paragraph, line or sentence boundary in the
+    second half of its token window, and the next chunk starts exactly
+    chunk_overlap tokens before that end.
+
+    Args:
+        text: Text to split
+        chunk_size: Maximum chunk size in tokens
+        chunk_overlap: Number of tokens shared by consecutive chunks
+
+    Returns:
+        List of (chunk text, token count, character offset) tuples
+
+    Raises:
+        ValueError: If chunk_size is not positive or chunk_overlap is not
+            smaller than chunk_size
+    """
+    if chunk_size <= 0:
+        raise ValueError(f"Chunk size must be positive, got {chunk_size}")
+    if not 0 <= chunk_overlap < chunk_size:
+        raise ValueError(f"Chunk overlap ({chunk_overlap}) must be at least 0 and smaller than "
+                         f"the chunk size ({chunk_size})")
+
+    encoding = get_encoding()
+    tokens = encoding.encode(text)
+    if not tokens:
+        return []
+
+    # Character offset where each token starts, plus the end of the text
+    _, offsets = encoding.decode_with_offsets(tokens)
+    offsets = list(offsets) + [len(text)]
+    total = len(tokens)
+
+    chunks = []
+    start = 0
+    while start < total:
+        end = min(start + chunk_size, total)
+        if end < total:
+            # Snap the end back to the best boundary in the second half of the window
+            lowest = max(start + chunk_size // 2, start + chunk_overlap + 1)
+            best_end, best_rank = end, -1
+            for candidate in range(end, lowest - 1, -1):
+                rank = _boundary_rank(text, offsets[candidate])
+                if rank > best_rank:
+                    best_end, best_rank = candidate, rank
+                    if rank == 3:
+                        break
+            end = best_end
+
+        chunk = text[offsets[start]:offsets[end]]
+        if chunk.strip():
+            leading = len(chunk) - len(chunk.lstrip())
+            chunks.append((chunk.strip(), end - start, offsets[start] + leading))
+
+        if end >= total:
+            break
+        # Always move forward, even if snapping left less than the overlap
+        start = max(end - chunk_overlap, start + 1)
+
+    return chunks
+
+
+def _split_with_langchain(text: str, chunk_size: int, chunk_overlap: int) -> List[Tuple[str, int, int]]:
+    """
+    Split text with LangChain's RecursiveCharacterTextSplitter.
+
+    Kept for comparison with split_text_by_tokens; every candidate piece is
+    re-encoded by the length function.
+
+    Returns:
+        List of (chunk text, token count, character offset) tuples
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=num_tokens_from_string,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+
+    chunks = []
+    cursor = 0
+    for chunk in text_splitter.split_text(text):
+        if not chunk.strip():
+            continue
+        offset = text.find(chunk, cursor)
+        if offset != -1:
+            cursor = offset
+        chunks.append((chunk, num_tokens_from_string(chunk), cursor))
+    return chunks
+
+
+def split_page_text(
+    text: str,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    splitter: str = "tokens"
+) -> List[Tuple[str, int, int]]:
+    """
+    Split a page's running text with the chosen splitter.
+
+    Args:
+        text: Page text
+        chunk_size: Target size of chunks in tokens
+        chunk_overlap: Number of tokens to overlap between chunks
+        splitter: "tokens" for the token-offset splitter, "langchain" for
+            LangChain's RecursiveCharacterTextSplitter
+
+    Returns:
+        List of (chunk text, token count, character offset) tuples
+    """
+    if not text.strip():
+        return []
+    if splitter == "tokens":
+        return split_text_by_tokens(text, chunk_size, chunk_overlap)
+    if splitter == "langchain":
+        return _split_with_langchain(text, chunk_size, chunk_overlap)
+    raise ValueError(f"Unknown splitter: {splitter}. Choose from {', '.join(SPLITTERS)}")
+
+
+def pack_table_rows(table: Dict, chunk_size: int = CHUNK_SIZE) -> List[Tuple[str, int]]:
+    """
+    Pack whole rows of a structured table into chunks of at most chunk_size tokens.
+
+    Each row is rendered and tokenized once, and chunks are packed from those
+    precomputed counts. Every chunk repeats the header row for context; a row
+    that is too large on its own becomes a chunk by itself.
+
+    Args:
+        table: Table record with header and rows
+        chunk_size: Maximum chunk size in tokens
+
+    Returns:
+        List of (chunk text, token count) tuples
+    """
+    header_line = render_row(table["header"]) if table["header"] else ""
+    header_tokens = num_tokens_from_string(header_line) if header_line else 0
+    base_lines = 1 if header_line else 0
+
+    row_lines = [render_row(row) for row in table["rows"]]
+    row_tokens = [num_tokens_from_string(line) for line in row_lines]
+
+    packed = []
+    lines = [header_line] if header_line else []
+    total = header_tokens
+
+    for line, tokens in zip(row_lines, row_tokens):
+        # Joining with the previous line adds one newline token
+        added = tokens + (1 if lines else 0)
+        if total + added > chunk_size and len(lines) > base_lines:
+            packed.append(('\n'.join(lines), total))
+            lines = [header_line] if header_line else []
+            total = header_tokens
+            added = tokens + (1 if lines else 0)
+        lines.append(line)
+        total += added
+
+    if len(lines) > base_lines:
+        packed.append(('\n'.join(lines), total))
+
+    return packed
+
+
+def _add_section_metadata(chunk_data: Dict, page_data: Dict, offset: int) -> None:
+    """
+    Add the section path and title in effect at a character offset of a page.
+
+    Only pages produced with section detection carry `section_path`; chunks
+    from other pages are left unchanged.
+
+    Args:
+        chunk_data: Chunk dictionary to update in place
+        page_data: Page the chunk came from
+        offset: Character offset of the chunk within the page text
+    """
+    if "section_path" not in page_data:
+        return
+    # Imported here so chunking does not need PyMuPDF unless pages carry sections
+    from pdf_extractor import section_path
+
+    path = page_data["section_path"]
+    title = page_data.get("section_title", "")
+    for heading in page_data.get("headings", []):
+        if heading["offset"] > offset:
+            break
+        path = section_path(heading["number"])
+        title = heading["title"]
+
+    chunk_data["section_path"] = path
+    chunk_data["section_title"] = title
+
+
+def _table_chunks(page_data: Dict, tables: List[Dict], chunk_size: int, offset: int) -> List[Dict]:
+    """
+    Pack each table of a page by whole rows into chunk dictionaries.
+
+    Args:
+        page_data: Page the tables came from
+        tables: Table records of the page
+        chunk_size: Maximum chunk size in tokens
+        offset: Character offset used to look up the section of the tables
+
+    Returns:
+        List of table chunk dictionaries
+    """
+    table_chunks = []
+    for table_index, table in enumerate(tables):
+        for table_chunk, token_count in pack_table_rows(table, chunk_size):
+            chunk_data = {
+                "text": table_chunk,
+                "page_num": page_data["page_num"],
+                "source": page_data["source"],
+                "potential_title": page_data["potential_title"],
+                "is_table": True,
+                "total_pages": page_data["total_pages"],
+                "token_count": token_count,
+                "table_index": table_index
+            }
+            _add_section_metadata(chunk_data, page_data, offset)
+            table_chunks.append(chunk_data)
+    return table_chunks
+
+
+def source_slug(source: str) -> str:
+    """
+    Turn a source document name into a short ASCII namespace for chunk IDs.
+
+    The readable slug folds case and punctuation and is truncated, so
+    different names can share it; a hash of the exact name is appended to
+    keep their namespaces apart.
+
+    Args:
+        source: Source document name (filename without extension)
+
+    Returns:
+        Namespace such as "mrtp-act-1966-modified-2015-49c110cd7226"
+    """
+    slug = re.sub(r'[^a-z0-9]+', '-', source.lower()).strip('-')
+    slug = slug[:SOURCE_SLUG_LENGTH].rstrip('-') or "doc"
+    return f"{slug}-{hashlib.sha256(source.encode('utf-8')).hexdigest()[:SOURCE_HASH_LENGTH]}"
+
+
+def make_chunk_id(source: str, content_hash: str, occurrence: int = 0) -> str:
+    """
+    Build a deterministic chunk ID from the source, content hash and position.
+
+    The ID is the source namespace plus the first CHUNK_HASH_LENGTH hex
+    digits of the chunk's SHA-256. Repeats of identical text within one source are told
+    apart by their occurrence number, so IDs never collide, stay the same
+    across re-runs, and do not change when a chunk moves to another page.
+
+    Args:
+        source: Source document name
+        content_hash: SHA-256 hex digest of the chunk text
+        occurrence: How many identical chunks from this source came before
+
+    Returns:
+        Chunk ID such as "mrtp-act-1966-modified-2015-49c110cd7226:3f9a0c1d2b7e4f65"
+    """
+    chunk_id = f"{source_slug(source)}:{content_hash[:CHUNK_HASH_LENGTH]}"
+    return f"{chunk_id}:{occurrence}" if occurrence else chunk_id
+
+
+def chunk_page(
+    page_data: Dict,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    splitter: str = "tokens"
+) -> List[Dict]:
+    """
+    Split one page into chunks with metadata, without assigning chunk IDs.
+
+    IDs depend on earlier repeats of the same text, so iter_chunks assigns
+    them once the pages are back in order.
+
+    Args:
+        page_data: Dictionary containing text and metadata for one page
+        chunk_size: Target size of chunks in tokens
+        chunk_overlap: Number of tokens to overlap between chunks
+        splitter: Text splitter to use ("tokens" or "langchain")
+
+    Returns:
+        List of chunk dictionaries for the page
+    """
+    text = page_data["text"]
+
+    # Pages extracted before structured tables existed still carry their
+    # tables as delimited text, so parse them out here
+    tables = page_data.get("tables")
+    if tables is None:
+        text, tables = parse_delimited_tables(text)
+
+    chunks = split_page_text(text, chunk_size, chunk_overlap, splitter)
+    page_chunks = []
+
+    if tables:
+        # Text chunks first, then each table packed by whole rows
+        for chunk, token_count, offset in chunks:
+            chunk_data = {
+                "text": chunk,
+                "page_num": page_data["page_num"],
+                "source": page_data["source"],
+                "potential_title": page_data["potential_title"],
+                "is_table": False,
+                "total_pages": page_data["total_pages"],
+                "token_count": token_count
+            }
+            _add_section_metadata(chunk_data, page_data, offset)
+            page_chunks.append(chunk_data)
+        page_chunks.extend(_table_chunks(page_data, tables, chunk_size, len(text)))
+    else:
+        # Create chunk data with metadata
+        for i, (chunk, token_count, offset) in enumerate(chunks):
+            chunk_data = {
+                "text": chunk,
+                "page_num": page_data["page_num"],
+                "source": page_data["source"],
+                "potential_title": page_data["potential_title"],
+                "chunk_index": i,
+                "total_chunks_in_page": len(chunks),
+                "total_pages": page_data["total_pages"],
+                "token_count": token_count
+            }
+            _add_section_metadata(chunk_data, page_data, offset)
+            page_chunks.append(chunk_data)
+
+    return page_chunks
+
+
+def chunk_document(
+    pages: List[Dict],
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    splitter: str = "tokens"
+) -> List[Dict]:
+    """
+    Chunk the pages of one document as a single stream so chunks can cross page breaks.
+
+    Page texts are joined with a line break, so a page break is no more
+    likely to end a chunk than any other line break and a clause running
+    over it stays in one chunk. Each text chunk records the pages it spans
+    (`page_start`/`page_end`, with `page_num` set to `page_start` for
+    citations) and its character offsets: `char_start` within the text of
+    its first page and `char_end` within the text of its last page. Tables
+    are still packed per page and follow the text chunks.
+
+    Args:
+        pages: Pages of one document in page order
+        chunk_size: Target size of chunks in tokens
+        chunk_overlap: Number of tokens to overlap between chunks
+        splitter: Text splitter to use ("tokens" or "langchain")
+
+    Returns:
+        List of chunk dictionaries for the document, without chunk IDs
+    """
+    texts = []
+    page_tables = []
+    for page_data in pages:
+        text = page_data["text"]
+        tables = page_data.get("tables")
+        if tables is None:
+            text, tables = parse_delimited_tables(text)
+        texts.append(text.rstrip())
+        page_tables.append(tables)
+
+    # Character offset where each page starts in the joined text
+    starts = []
+    position = 0
+    for text in texts:
+        starts.append(position)
+        position += len(text) + len(PAGE_SEPARATOR)
+
+    document_chunks = []
+    for i, (chunk, token_count, offset) in enumerate(
+        split_page_text(PAGE_SEPARATOR.join(texts), chunk_size, chunk_overlap, splitter)
+    ):
+        end = offset + len(chunk)
+        first = bisect.bisect_right(starts, offset) - 1
+        last = bisect.bisect_right(starts, end - 1) - 1
+        page_data = pages[first]
+
+        chunk_data = {
+            "text": chunk,
+            "page_num": page_data["page_num"],
+            "page_start": page_data["page_num"],
+            "page_end": pages[last]["page_num"],
+            "char_start": offset - starts[first],
+            "char_end": end - starts[last],
+            "source": page_data["source"],
+            "potential_title": page_data["potential_title"],
+            "chunk_index": i,
+            "total_pages": page_data["total_pages"],
+            "token_count": token_count
+        }
+        _add_section_metadata(chunk_data, page_data, chunk_data["char_start"])
+        document_chunks.append(chunk_data)
+
+    for page_data, text, tables in zip(pages, texts, page_tables):
+        if tables:
+            document_chunks.extend(_table_chunks(page_data, tables, chunk_size, len(text)))
+
+    return document_chunks
+
+
+def _chunk_page_batch(
+    pages: List[Dict],
+    chunk_size: int,
+    chunk_overlap: int,
+    splitter: str
+) -> List[List[Dict]]:
+    """Chunk a batch of pages inside a worker process."""
+    return [chunk_page(page_data, chunk_size, chunk_overlap, splitter) for page_data in pages]
+
+
+def _iter_page_chunks_parallel(
+    pages_data: Iterable[Dict],
+    chunk_size: int,
+    chunk_overlap: int,
+    splitter: str,
+    workers: int
+) -> Iterator[List[Dict]]:
+    """
+    Chunk pages in a process pool and yield each page's chunks in page order.
+
+    Pages are submitted in batches with a bounded number in flight, so a
+    streaming page source is never read far ahead of the consumer.
+    """
+    # Each worker loads its tiktoken encoder once, up front
+    with ProcessPoolExecutor(max_workers=workers, initializer=get_encoding) as executor:
+        pending = deque()
+        batch = []
+
+        for page_data in pages_data:
+            batch.append(page_data)
+            if len(batch) < PAGES_PER_TASK:
+                continue
+            pending.append(executor.submit(_chunk_page_batch, batch, chunk_size, chunk_overlap, splitter))
+            batch = []
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+
+        if batch:
+            pending.append(executor.submit(_chunk_page_batch, batch, chunk_size, chunk_overlap, splitter))
+        while pending:
+            yield from pending.popleft().result()
+
+
+def iter_chunks(
+    pages_data: Iterable[Dict],
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    splitter: str = "tokens",
+    workers: int = 1,
+    stitch_pages: bool = False
+) -> Iterator[Dict]:
+    """
+    Split pages into chunks one page at a time, yielding chunks as they are made.
+
+    Pages are consumed lazily, so this can run directly on the output of a
+    streaming extractor without holding the whole document in memory. With
+    stitch_pages, the pages of each source document are gathered and chunked
+    together by chunk_document instead, which holds one document's text at a
+    time.
+
+    Args:
+        pages_data: Iterable of dictionaries containing text and metadata
+        chunk_size: Target size of chunks in tokens
+        chunk_overlap: Number of tokens to overlap between chunks
+        splitter: Text splitter to use ("tokens" or "langchain")
+        workers: Number of worker processes; values above 1 chunk batches of
+            pages in parallel and reassemble them in page order (page-by-page
+            chunking only)
+        stitch_pages: Let chunks cross page breaks within a document
+
+    Yields:
+        Dictionaries containing chunked text with metadata
+    """
+    pages_data = tqdm(pages_data, desc="Chunking pages")
+    if stitch_pages:
+        page_results = (
+            chunk_document(list(pages), chunk_size, chunk_overlap, splitter)
+            for _, pages in groupby(pages_data, key=lambda page_data: page_data["source"])
+        )
+    elif workers > 1:
+        page_results = _iter_page_chunks_parallel(pages_data, chunk_size, chunk_overlap, splitter, workers)
+    else:
+        page_results = (chunk_page(page_data, chunk_size, chunk_overlap, splitter) for page_data in pages_data)
+
+    # Occurrences of each (source, text) pair seen so far
+    occurrences = Counter()
+    for page_chunks in page_results:
+        for chunk_data in page_chunks:
+            content_hash = hashlib.sha256(chunk_data["text"].encode('utf-8')).hexdigest()
+            key = (chunk_data["source"], content_hash)
+            chunk_id = make_chunk_id(chunk_data["source"], content_hash, occurrences[key])
+            occurrences[key] += 1
+            yield {"chunk_id": chunk_id, **chunk_data}
 
 
 def chunk_text(
-    pages_data: List[Dict],
-    chunk_size: int = 512,
-    chunk_overlap: int = 77,  # ~15% of 512
-    output_path: Optional[str] = None
+    pages_data: Iterable[Dict],
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    output_path: Optional[str] = None,
+    splitter: str = "tokens",
+    workers: int = 1,
+    stitch_pages: bool = False
 ) -> List[Dict]:
     """
     Split text into chunks with metadata preserved.
 
     Args:
-        pages_data: List of dictionaries containing text and metadata
+        pages_data: List (or any iterable, e.g. a streaming extractor) of
+            dictionaries containing text and metadata
         chunk_size: Target size of chunks in tokens
         chunk_overlap: Number of tokens to overlap between chunks
         output_path: Optional path to save the chunked text as JSON
+            (or JSON Lines if it ends in .jsonl)
+        splitter: Text splitter to use ("tokens" or "langchain")
+        workers: Number of worker processes for chunking
+        stitch_pages: Chunk each document's pages as one stream so chunks
+            can cross page breaks, recording the pages each chunk spans
 
     Returns:
         List of dictionaries containing chunked text with metadata
     """
     print(f"Chunking text with chunk size {chunk_size} tokens and {chunk_overlap} tokens overlap...")
 
-    all_chunks = []
+    # Count pages as they stream through the chunker
+    page_count = 0
 
-    for page_data in tqdm(pages_data, desc="Chunking pages"):
-        text = page_data["text"]
+    def counted_pages():
+        nonlocal page_count
+        for page_data in pages_data:
+            page_count += 1
+            yield page_data
+
+    all_chunks = list(iter_chunks(counted_pages(), chunk_size, chunk_overlap, splitter, workers, stitch_pages))
 
-        # Check if the page contains tables
-        has_tables = page_data.get("has_tables", False) or '|' in text or '\t' in text
-
-        # Use different chunking strategies based on content
-        if has_tables:
-            # For tables, use a more careful splitting approach
-            # First, identify table sections
-            lines = text.split('\n')
-            table_sections = []
-            current_section = []
-            in_table = False
-
-            for line in lines:
-                is_table_line = '|' in line or '\t' in line
-
-                # If we're transitioning between table and non-table
-                if is_table_line != in_table:
-                    if current_section:
-                        section_text = '\n'.join(current_section)
-                        table_sections.append((in_table, section_text))
-                        current_section = []
-                    in_table = is_table_line
-
-                current_section.append(line)
-
-            # Add the last section
-            if current_section:
-                section_text = '\n'.join(current_section)
-                table_sections.append((in_table, section_text))
-
-            # Process each section
-            for is_table, section_text in table_sections:
-                if is_table:
-                    # For table sections, keep them intact if possible
-                    # If too large, split at row boundaries
-                    token_count = num_tokens_from_string(section_text)
-
-                    if token_count <= chunk_size:
-                        # Table fits in one chunk
-                        chunks = [section_text]
-                    else:
-                        # Need to split the table
-                        table_lines = section_text.split('\n')
-                        chunks = []
-                        current_chunk = []
-                        current_tokens = 0
-
-                        # Try to keep header row with data rows
-                        header = table_lines[0] if table_lines else ""
-                        header_tokens = num_tokens_from_string(header)
-
-                        for line in table_lines:
-                            line_tokens = num_tokens_from_string(line)
-
-                            # If adding this line would exceed chunk size, start a new chunk
-                            if current_tokens + line_tokens > chunk_size and current_chunk:
-                                chunk_text = '\n'.join(current_chunk)
-                                chunks.append(chunk_text)
-                                # Start new chunk with header for context
-                                current_chunk = [header, line] if header else [line]
-                                current_tokens = header_tokens + line_tokens
-                            else:
-                                current_chunk.append(line)
-                                current_tokens += line_tokens
-
-                        # Add the last chunk
-                        if current_chunk:
-                            chunk_text = '\n'.join(current_chunk)
-                            chunks.append(chunk_text)
-                else:
-                    # For non-table sections, use the standard text splitter
-                    text_splitter = RecursiveCharacterTextSplitter(
-                        chunk_size=chunk_size * 4,  # Approximate character count (1 token ≈ 4 chars)
-                        chunk_overlap=chunk_overlap * 4,
-                        length_function=lambda text: num_tokens_from_string(text),
-                        separators=["\n\n", "\n", ". ", " ", ""]
-                    )
-                    chunks = text_splitter.split_text(section_text)
-
-                # Create chunk data with metadata for this section
-                for i, chunk in enumerate(chunks):
-                    # Skip empty chunks
-                    if not chunk.strip():
-                        continue
-
-                    chunk_data = {
-                        "chunk_id": f"{page_data['page_num']}_{len(all_chunks)}",
-                        "text": chunk,
-                        "page_num": page_data["page_num"],
-                        "source": page_data["source"],
-                        "potential_title": page_data["potential_title"],
-                        "is_table": is_table,
-                        "total_pages": page_data["total_pages"],
-                        "token_count": num_tokens_from_string(chunk)
-                    }
-
-                    all_chunks.append(chunk_data)
-        else:
-            # For regular text, use the standard text splitter
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=chunk_size * 4,  # Approximate character count (1 token ≈ 4 chars)
-                chunk_overlap=chunk_overlap * 4,
-                length_function=lambda text: num_tokens_from_string(text),
-                separators=["\n\n", "\n", ". ", " ", ""]
-            )
-            chunks = text_splitter.split_text(text)
-
-            # Create chunk data with metadata
-            for i, chunk in enumerate(chunks):
-                # Skip empty chunks
-                if not chunk.strip():
-                    continue
-
-                chunk_data = {
-                    "chunk_id": f"{page_data['page_num']}_{i}",
-                    "text": chunk,
-                    "page_num": page_data["page_num"],
-                    "source": page_data["source"],
-                    "potential_title": page_data["potential_title"],
-                    "chunk_index": i,
-                    "total_chunks_in_page": len(chunks),
-                    "total_pages": page_data["total_pages"],
-                    "token_count": num_tokens_from_string(chunk)
-                }
-
-                all_chunks.append(chunk_data)
-
-    print(f"Created {len(all_chunks)} chunks from {len(pages_data)} pages")
+    print(f"Created {len(all_chunks)} chunks from {page_count} pages")
+    if stitch_pages:
+        spanning = sum(1 for chunk in all_chunks if chunk.get("page_end", chunk["page_num"]) != chunk["page_num"])
+        print(f"Chunks spanning a page break: {spanning}")
 
     # Validate token counts
     token_counts = [chunk["token_count"] for chunk in all_chunks]
@@ -192,29 +641,81 @@ def chunk_text(
 
     # Save to JSON if output path is provided
     if output_path:
-        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(all_chunks, f, ensure_ascii=False, indent=2)
+        save_records(all_chunks, output_path)
         print(f"Saved chunked text to {output_path}")
 
     return all_chunks
 
 
+def benchmark_splitters(
+    pages_data: List[Dict],
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP
+) -> Dict[str, Dict]:
+    """
+    Time the token-offset splitter against the LangChain splitter on the same pages.
+
+    Args:
+        pages_data: Extracted pages
+        chunk_size: Target size of chunks in tokens
+        chunk_overlap: Number of tokens to overlap between chunks
+
+    Returns:
+        Dictionary of per-splitter results: seconds, chunk count and token stats
+    """
+    texts = [page["text"] for page in pages_data]
+    get_encoding()  # Load the encoder before timing
+
+    results = {}
+    for splitter in SPLITTERS:
+        start = time.perf_counter()
+        chunks = [chunk for text in texts for chunk in split_page_text(text, chunk_size, chunk_overlap, splitter)]
+        elapsed = time.perf_counter() - start
+
+        # Measure chunk sizes the same way for both splitters
+        token_counts = [num_tokens_from_string(chunk) for chunk, _, _ in chunks]
+        results[splitter] = {
+            "seconds": elapsed,
+            "chunks": len(chunks),
+            "avg_tokens": sum(token_counts) / len(token_counts) if token_counts else 0,
+            "max_tokens": max(token_counts) if token_counts else 0
+        }
+
+    print(f"Benchmark over {len(texts)} pages (chunk size {chunk_size}, overlap {chunk_overlap}):")
+    for splitter, result in results.items():
+        print(f"  {splitter:<10} {result['seconds']:.3f}s, {result['chunks']} chunks, "
+              f"avg {result['avg_tokens']:.1f} tokens, max {result['max_tokens']} tokens")
+    if results["tokens"]["seconds"]:
+        print(f"  Speedup: {results['langchain']['seconds'] / results['tokens']['seconds']:.1f}x")
+    return results
+
+
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Chunk extracted text from PDF files")
-    parser.add_argument("input_json", help="Path to the JSON file with extracted text")
-    parser.add_argument("--output", "-o", help="Output JSON file path for chunks")
-    parser.add_argument("--chunk-size", "-c", type=int, default=512,
-                        help="Target chunk size in tokens (default: 512)")
-    parser.add_argument("--overlap", type=int, default=77,
-                        help="Chunk overlap in tokens (default: 77, ~15% of 512)")
+    parser.add_argument("input_json", help="Path to the JSON or JSONL file with extracted text")
+    parser.add_argument("--output", "-o", help="Output JSON (or .jsonl) file path for chunks")
+    parser.add_argument("--chunk-size", "-c", type=int, default=CHUNK_SIZE,
+                        help=f"Target chunk size in tokens (default: {CHUNK_SIZE})")
+    parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP,
+                        help=f"Chunk overlap in tokens (default: {CHUNK_OVERLAP}, ~15%% of {CHUNK_SIZE})")
+    parser.add_argument("--splitter", choices=SPLITTERS, default="tokens",
+                        help="Text splitter: token offsets (default) or LangChain")
+    parser.add_argument("--workers", "-w", type=int, default=1,
+                        help="Number of worker processes for chunking (default: 1)")
+    parser.add_argument("--stitch-pages", action="store_true",
+                        help="Let chunks cross page breaks, recording the pages each chunk spans")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compare the token and LangChain splitters instead of writing chunks")
 
     args = parser.parse_args()
 
-    # Load the extracted text
-    with open(args.input_json, 'r', encoding='utf-8') as f:
-        pages_data = json.load(f)
+    if args.benchmark:
+        benchmark_splitters(load_records(args.input_json), args.chunk_size, args.overlap)
+    else:
+        # Stream the extracted text from disk
+        pages_data = iter_records(args.input_json)
 
-    chunk_text(pages_data, args.chunk_size, args.overlap, args.output)
+        chunk_text(pages_data, args.chunk_size, args.overlap, args.output, args.splitter, args.workers,
+                   args.stitch_pages)
@@ -9,22 +9,59 @@ It provides functions to extract text with appropriate metadata.
 """
 
 import os
-import json
-from typing import Dict, List, Optional
-from tqdm import tqdm
-from pdf_extractor import extract_text_from_pdf
+from typing import Dict, Iterator, List, Optional
+from pdf_extractor import extract_text_from_pdf, iter_pages_from_pdf
+from artifacts import save_records
+from table_extractor import split_delimited_blocks, render_table
 
+# Target size of the artificial pages created for text files, in characters
+PAGE_SIZE = 3000
 
-def extract_text_from_txt(txt_path: str, output_path: Optional[str] = None) -> List[Dict]:
+
+def _split_text(text: str, page_size: int) -> List[str]:
     """
-    Extract text from a text file with basic metadata.
+    Split text into pieces of at most page_size characters, preferring to
+    end each piece at a paragraph or sentence boundary.
     
     Args:
-        txt_path: Path to the text file
-        output_path: Optional path to save the extracted text as JSON
+        text: Text to split
+        page_size: Maximum piece size in characters
         
     Returns:
-        List of dictionaries containing text and metadata
+        List of text pieces that together cover the whole text
+    """
+    pieces = []
+    start = 0
+    
+    while start < len(text):
+        piece = text[start:start + page_size]
+        # Try to end at a paragraph or sentence boundary
+        if start + page_size < len(text):
+            # Look for paragraph breaks
+            para_break = piece.rfind('\n\n')
+            if para_break != -1 and para_break > page_size * 0.5:
+                piece = piece[:para_break]
+            else:
+                # Look for sentence breaks
+                sentence_break = max(piece.rfind('. '), piece.rfind('.\n'))
+                if sentence_break != -1 and sentence_break > page_size * 0.5:
+                    piece = piece[:sentence_break + 1]
+        
+        pieces.append(piece)
+        start += len(piece)
+    
+    return pieces
+
+
+def iter_pages_from_txt(txt_path: str) -> Iterator[Dict]:
+    """
+    Yield the artificial pages of a text file one at a time.
+    
+    Args:
+        txt_path: Path to the text file
+        
+    Yields:
+        Dictionary containing text and metadata for each page
     """
     if not os.path.exists(txt_path):
         raise FileNotFoundError(f"Text file not found: {txt_path}")
@@ -39,86 +76,106 @@ def extract_text_from_txt(txt_path: str, output_path: Optional[str] = None) -> L
     with open(txt_path, 'r', encoding='utf-8') as f:
         text = f.read()
     
-    # Split text into pages (for text files, we'll create artificial pages)
-    # Using a reasonable page size of ~3000 characters
-    page_size = 3000
-    text_chunks = []
-    
-    # Check if the text contains table-like structures
-    has_tables = '|' in text or '\t' in text
-    
-    # If it has tables, we'll be more careful with splitting
-    if has_tables:
-        # Split by lines first
-        lines = text.split('\n')
-        current_chunk = ""
-        table_section = False
-        
-        for line in lines:
-            # Check if this line is part of a table
-            is_table_line = '|' in line or '\t' in line
-            
-            # If we're transitioning between table and non-table sections,
-            # or the chunk is getting too large, start a new chunk
-            if (is_table_line != table_section) or len(current_chunk) > page_size:
-                if current_chunk:
-                    text_chunks.append(current_chunk)
-                current_chunk = line + '\n'
-                table_section = is_table_line
-            else:
-                current_chunk += line + '\n'
-        
-        # Add the last chunk
-        if current_chunk:
-            text_chunks.append(current_chunk)
-    else:
-        # Simple splitting for non-table text
-        for i in range(0, len(text), page_size):
-            chunk = text[i:i + page_size]
-            # Try to end at a paragraph or sentence boundary
-            if i + page_size < len(text):
-                # Look for paragraph breaks
-                para_break = chunk.rfind('\n\n')
-                if para_break != -1 and para_break > page_size * 0.5:
-                    chunk = chunk[:para_break]
-                else:
-                    # Look for sentence breaks
-                    sentence_break = max(chunk.rfind('. '), chunk.rfind('.\n'))
-                    if sentence_break != -1 and sentence_break > page_size * 0.5:
-                        chunk = chunk[:sentence_break + 1]
-            
-            text_chunks.append(chunk)
+    # Split text into pages (for text files, we'll create artificial pages).
+    # Delimited tables are parsed into structured records and attached to
+    # the page they occur on instead of being kept in the page text.
+    pages = []
+    current_text = []
+    current_tables = []
+    current_size = 0
+    
+    def flush_page():
+        nonlocal current_size
+        if current_text or current_tables:
+            pages.append(('\n'.join(current_text), list(current_tables)))
+        current_text.clear()
+        current_tables.clear()
+        current_size = 0
+    
+    for kind, value in split_delimited_blocks(text):
+        if kind == "table":
+            current_tables.append(value)
+            current_size += len(render_table(value))
+            if current_size >= PAGE_SIZE:
+                flush_page()
+        else:
+            for piece in _split_text(value, PAGE_SIZE):
+                if not piece.strip():
+                    continue
+                if current_size and current_size + len(piece) > PAGE_SIZE:
+                    flush_page()
+                current_text.append(piece)
+                current_size += len(piece)
+    
+    flush_page()
     
     # Create page data with metadata
-    pages_data = []
-    for i, chunk in enumerate(text_chunks):
+    for i, (page_text, tables) in enumerate(pages):
         # Extract potential section/chapter titles (simple heuristic)
-        lines = chunk.split('\n')
+        lines = page_text.split('\n')
         potential_title = lines[0] if lines and len(lines[0]) < 100 else ""
         
         page_data = {
             "page_num": i + 1,  # 1-based page numbering
-            "text": chunk,
+            "text": page_text,
             "source": base_filename,
             "potential_title": potential_title,
-            "total_pages": len(text_chunks),
-            "has_tables": has_tables
+            "total_pages": len(pages),
+            "tables": tables,
+            "has_tables": bool(tables)
         }
         
-        pages_data.append(page_data)
+        yield page_data
+
+
+def extract_text_from_txt(txt_path: str, output_path: Optional[str] = None) -> List[Dict]:
+    """
+    Extract text from a text file with basic metadata.
+    
+    Args:
+        txt_path: Path to the text file
+        output_path: Optional path to save the extracted text as JSON
+            (or JSON Lines if it ends in .jsonl)
+        
+    Returns:
+        List of dictionaries containing text and metadata
+    """
+    pages_data = list(iter_pages_from_txt(txt_path))
     
     print(f"Created {len(pages_data)} text chunks from the file")
     
     # Save to JSON if output path is provided
     if output_path:
-        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(pages_data, f, ensure_ascii=False, indent=2)
+        save_records(pages_data, output_path)
         print(f"Saved extracted text to {output_path}")
     
     return pages_data
 
 
+def iter_pages_from_file(file_path: str) -> Iterator[Dict]:
+    """
+    Yield pages from a file one at a time, based on its extension.
+    
+    Args:
+        file_path: Path to the file
+        
+    Yields:
+        Dictionary containing text and metadata for each page
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+    
+    _, ext = os.path.splitext(file_path)
+    ext = ext.lower()
+    
+    if ext == '.pdf':
+        return iter_pages_from_pdf(file_path)
+    elif ext == '.txt':
+        return iter_pages_from_txt(file_path)
+    else:
+        raise ValueError(f"Unsupported file type: {ext}")
+
+
 def extract_text_from_file(file_path: str, output_path: Optional[str] = None) -> List[Dict]:
     """
     Extract text from a file based on its extension.
@@ -150,7 +207,7 @@ if __name__ == "__main__":
     
     parser = argparse.ArgumentParser(description="Extract text from various file formats")
     parser.add_argument("file_path", help="Path to the file")
-    parser.add_argument("--output", "-o", help="Output JSON file path")
+    parser.add_argument("--output", "-o", help="Output JSON (or .jsonl) file path")
     
     args = parser.parse_args()
     
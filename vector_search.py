@@ -0,0 +1,489 @@
+"""
+Vector Search Module
+
+This module searches a local embedding store without Pinecone, using the
+Matryoshka property of text-embedding-3 models: a prefix of an embedding,
+renormalized, is itself a usable lower-dimensional embedding. The store keeps
+the full vector once; 256- and 512-dimension prefixes are derived from it the
+first time a search uses them. A search scores every chunk at low dimension,
+then rescores only the shortlist against the full vectors.
+
+The first pass can instead run on quantized copies of the vectors: int8
+(one byte per dimension, 4x smaller than float32) scored by dot product, or
+1-bit binary codes (32x smaller) scored by Hamming distance. Quantized codes
+are saved next to the store (`<name>.int8.npy`, `<name>.binary.npy`) and the
+shortlist is again rescored against the full float vectors. A quantized
+search builds no float prefixes, so only the codes are held in memory.
+
+Example:
+    python vector_search.py output/doc_embeddings.npy --query "parking requirements"
+    python vector_search.py output/doc_embeddings.npy --query "parking requirements" --quantization binary
+    python vector_search.py output/doc_embeddings.npy --benchmark
+"""
+
+import os
+import time
+import random
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from embedding_store import EmbeddingStore, is_embedding_store, load_embeddings
+
+MATRYOSHKA_DIMENSIONS = (256, 512)  # Prefix lengths derived from the full vectors
+COARSE_DIMENSIONS = 256  # Prefix used for the first pass
+SHORTLIST_FACTOR = 10  # Candidates rescored at full dimension, per result requested
+BENCHMARK_QUERIES = 200
+QUERY_NOISE = 0.5  # Norm of the noise added to sampled corpus vectors to make benchmark queries
+QUANTIZATIONS = ("int8", "binary")
+
+INT8_BLOCK = 1024  # Rows of int8 codes widened to float32 at a time (cache-sized)
+
+# Set bits in every 16-bit value, for Hamming distances over packed codes
+POPCOUNT16 = np.array([bin(value).count("1") for value in range(1 << 16)], dtype=np.uint8)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length, as float32."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def truncate_embeddings(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """
+    Derive lower-dimensional embeddings by keeping a prefix and renormalizing.
+
+    Args:
+        vectors: Full embeddings, one per row (or a single vector)
+        dimensions: Prefix length to keep
+
+    Returns:
+        Unit-length float32 embeddings of `dimensions` values
+    """
+    return normalize_rows(np.asarray(vectors)[..., :dimensions])
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the rows of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    rows = np.argpartition(-scores, k - 1)[:k]
+    return rows[np.argsort(-scores[rows])]
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scalar-quantize embeddings to int8 with one scale per dimension.
+
+    Args:
+        vectors: Float embeddings, one per row
+
+    Returns:
+        Tuple of (int8 codes, float32 scales); codes * scales approximates
+        the vectors
+    """
+    vectors = normalize_rows(vectors)
+    scales = np.maximum(np.abs(vectors).max(axis=0), 1e-12) / 127
+    codes = np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """Quantize embeddings to one sign bit per dimension, packed eight to a byte."""
+    return np.packbits(np.asarray(vectors) > 0, axis=-1)
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """Count differing bits between each packed code and a packed query code."""
+    differing = np.bitwise_xor(codes, query_code)
+    if differing.shape[1] % 2:
+        differing = np.pad(differing, ((0, 0), (0, 1)))
+    return POPCOUNT16[np.ascontiguousarray(differing).view(np.uint16)].sum(axis=1, dtype=np.int32)
+
+
+def int8_scores(codes: np.ndarray, scaled_query: np.ndarray) -> np.ndarray:
+    """Dot products of int8 codes with a query, widening a block of rows at a time."""
+    return np.concatenate([
+        codes[i:i + INT8_BLOCK].astype(np.float32) @ scaled_query
+        for i in range(0, len(codes), INT8_BLOCK)
+    ]) if len(codes) else np.empty(0, dtype=np.float32)
+
+
+def quantized_path(path: str, quantization: str) -> str:
+    """Return the path of the quantized codes saved next to a store."""
+    return f"{os.path.splitext(path)[0]}.{quantization}.npy"
+
+
+class VectorIndex:
+    """
+    Coarse-to-fine cosine search over an embedding store.
+
+    The full vectors stay memory-mapped. Building a prefix or quantized
+    codes reads them once, after which a search only reads the shortlisted
+    rows; the prefixes and codes are held in memory. Full-vector norms are
+    computed per shortlist, and for every row only by an exact search.
+    """
+
+    def __init__(
+        self,
+        store: EmbeddingStore,
+        prefix_dimensions: Sequence[int] = MATRYOSHKA_DIMENSIONS,
+        quantized: Optional[Dict[str, np.ndarray]] = None
+    ):
+        self.store = store
+        self.quantized = quantized or {}
+        self.vectors = store.vectors
+        self.dimensions = self.vectors.shape[1]
+        self.norms: Optional[np.ndarray] = None  # Every row's norm, built by search_exact
+        self.prefix_dimensions = tuple(sorted(d for d in prefix_dimensions if d < self.dimensions))
+        self.prefixes: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def prefix(self, dimensions: int) -> np.ndarray:
+        """Return the renormalized prefixes of one length, deriving them on first use."""
+        if dimensions not in self.prefixes:
+            self.prefixes[dimensions] = truncate_embeddings(self.vectors, dimensions)
+        return self.prefixes[dimensions]
+
+    def resident_bytes(self) -> int:
+        """
+        Bytes of vector data this index holds in memory.
+
+        Counts the prefixes, codes and norms built so far, and the full
+        vectors unless they are memory-mapped from the store.
+        """
+        arrays = [*self.prefixes.values(), *self.quantized.values()]
+        if self.norms is not None:
+            arrays.append(self.norms)
+        if not isinstance(self.vectors, np.memmap):
+            arrays.append(self.vectors)
+        return sum(array.nbytes for array in arrays)
+
+    def _rescore(self, query: np.ndarray, rows: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        """Score candidate rows against the full vectors and keep the best top_k."""
+        rows = np.sort(rows)  # Sequential reads from the memory map
+        vectors = np.asarray(self.vectors[rows], dtype=np.float32)
+        scores = (vectors @ query) / np.maximum(np.linalg.norm(vectors, axis=1), 1e-12)
+        best = top_k_rows(scores, top_k)
+        return [(int(rows[i]), float(scores[i])) for i in best]
+
+    def search_exact(self, query: Sequence[float], top_k: int = 5) -> List[Tuple[int, float]]:
+        """
+        Score every chunk at full dimension.
+
+        Args:
+            query: Query embedding
+            top_k: Number of results
+
+        Returns:
+            List of (row, cosine similarity) tuples, best first
+        """
+        if self.norms is None:
+            self.norms = np.maximum(np.linalg.norm(self.vectors, axis=1).astype(np.float32), 1e-12)
+        scores = (self.vectors @ normalize_rows(query)) / self.norms
+        return [(int(row), float(scores[row])) for row in top_k_rows(scores, top_k)]
+
+    def search(
+        self,
+        query: Sequence[float],
+        top_k: int = 5,
+        coarse_dimensions: int = COARSE_DIMENSIONS,
+        shortlist: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Shortlist chunks with a low-dimension prefix, then rescore at full dimension.
+
+        Args:
+            query: Full-dimension query embedding
+            top_k: Number of results
+            coarse_dimensions: Prefix length of the first pass; without a
+                matching prefix the search is exact
+            shortlist: Candidates to rescore (default: top_k * SHORTLIST_FACTOR)
+
+        Returns:
+            List of (row, cosine similarity) tuples, best first
+        """
+        if coarse_dimensions not in self.prefix_dimensions:
+            return self.search_exact(query, top_k)
+        coarse_query = truncate_embeddings(query, coarse_dimensions)
+        candidates = top_k_rows(self.prefix(coarse_dimensions) @ coarse_query,
+                                shortlist or top_k * SHORTLIST_FACTOR)
+        return self._rescore(normalize_rows(query), candidates, top_k)
+
+    def quantize(self, quantization: str) -> None:
+        """Build int8 or binary codes of the full vectors for search_quantized."""
+        if quantization == "int8":
+            self.quantized["int8"], self.quantized["int8_scales"] = quantize_int8(self.vectors)
+        elif quantization == "binary":
+            self.quantized["binary"] = quantize_binary(self.vectors)
+        else:
+            raise ValueError(f"Unknown quantization: {quantization}. Choose from {', '.join(QUANTIZATIONS)}")
+
+    def bytes_per_chunk(self, quantization: Optional[str] = None) -> int:
+        """Memory per chunk of the full float32 vectors or of a quantized copy."""
+        if quantization is None:
+            return self.dimensions * 4
+        return self.quantized[quantization].shape[1]
+
+    def resident_bytes_per_chunk(self) -> float:
+        """resident_bytes spread over the chunks."""
+        return self.resident_bytes() / max(len(self), 1)
+
+    def search_quantized(
+        self,
+        query: Sequence[float],
+        top_k: int = 5,
+        quantization: str = "binary",
+        shortlist: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Shortlist chunks on quantized codes, then rescore with the float vectors.
+
+        int8 codes are pre-scored by dot product with the scaled query, binary
+        codes by Hamming distance to the query's sign bits.
+
+        Args:
+            query: Full-dimension query embedding
+            top_k: Number of results
+            quantization: "int8" or "binary"; built on first use if missing
+            shortlist: Candidates to rescore (default: top_k * SHORTLIST_FACTOR)
+
+        Returns:
+            List of (row, cosine similarity) tuples, best first
+        """
+        if quantization not in self.quantized:
+            self.quantize(quantization)
+        query = normalize_rows(query)
+        if quantization == "int8":
+            scores = int8_scores(self.quantized["int8"], query * self.quantized["int8_scales"])
+        else:
+            scores = -hamming_distances(self.quantized["binary"], quantize_binary(query))
+        candidates = top_k_rows(scores, shortlist or top_k * SHORTLIST_FACTOR)
+        return self._rescore(query, candidates, top_k)
+
+    def save_quantized(self, path: str) -> List[str]:
+        """
+        Save the quantized codes next to the store at `path`.
+
+        Returns:
+            Paths written
+        """
+        written = []
+        for quantization in QUANTIZATIONS:
+            if quantization in self.quantized:
+                np.save(quantized_path(path, quantization), self.quantized[quantization])
+                written.append(quantized_path(path, quantization))
+        if "int8_scales" in self.quantized:
+            np.save(quantized_path(path, "int8_scales"), self.quantized["int8_scales"])
+        return written
+
+    def results(self, hits: List[Tuple[int, float]]) -> List[Dict]:
+        """Turn (row, score) hits into chunk metadata dictionaries with a score."""
+        return [{**self.store.metadata[row], "score": score} for row, score in hits]
+
+
+def open_vector_index(path: str, prefix_dimensions: Sequence[int] = MATRYOSHKA_DIMENSIONS) -> VectorIndex:
+    """
+    Open a search index over an embeddings artifact.
+
+    Quantized codes saved next to a binary store are loaded if they are newer
+    than the store.
+
+    Args:
+        path: Binary store (.npy) or JSON embeddings
+        prefix_dimensions: Prefix lengths to derive
+
+    Returns:
+        VectorIndex
+    """
+    quantized = {}
+    if is_embedding_store(path) and os.path.exists(path):
+        for name in (*QUANTIZATIONS, "int8_scales"):
+            codes_path = quantized_path(path, name)
+            if os.path.exists(codes_path) and os.path.getmtime(codes_path) >= os.path.getmtime(path):
+                quantized[name] = np.load(codes_path)
+        if "int8" in quantized and "int8_scales" not in quantized:
+            del quantized["int8"]
+
+    embeddings = load_embeddings(path)
+    if not isinstance(embeddings, EmbeddingStore):
+        embeddings = EmbeddingStore(
+            np.array([chunk["embedding"] for chunk in embeddings], dtype=np.float32),
+            [{key: value for key, value in chunk.items() if key != "embedding"} for chunk in embeddings]
+        )
+    return VectorIndex(embeddings, prefix_dimensions, quantized)
+
+
+def _recall(hits: List[Tuple[int, float]], truth: List[Tuple[int, float]]) -> float:
+    expected = {row for row, _ in truth}
+    return len(expected & {row for row, _ in hits}) / len(expected) if expected else 1.0
+
+
+def benchmark_search(
+    index: VectorIndex,
+    queries: np.ndarray,
+    top_k: int = 10,
+    shortlist_factors: Sequence[int] = (5, 10, 20)
+) -> List[Dict]:
+    """
+    Measure recall@k, latency and memory of coarse-to-fine search against exact search.
+
+    Prefixes and int8/binary codes are each tried alone and as the first
+    pass of a shortlist rescored at full dimension. Each method runs on a
+    fresh index over the same store, so its resident bytes per chunk are
+    what that method alone keeps in memory (its first-pass data).
+
+    Args:
+        index: Index to search
+        queries: Query embeddings, one per row
+        top_k: Results per query
+        shortlist_factors: Shortlist sizes to try, as multiples of top_k
+
+    Returns:
+        One row per configuration with the method, recall, milliseconds per
+        query and resident bytes per chunk
+    """
+    exact_index = VectorIndex(index.store, ())
+    exact_index.search_exact(queries[0], top_k)  # Build the norms outside the timing
+    started = time.perf_counter()
+    truth = [exact_index.search_exact(query, top_k) for query in queries]
+    rows = [{
+        "method": f"exact {index.dimensions}d",
+        "recall": 1.0,
+        "ms_per_query": (time.perf_counter() - started) / len(queries) * 1000,
+        "bytes_per_chunk": exact_index.resident_bytes_per_chunk()
+    }]
+
+    def run(method: str, method_index: VectorIndex, search) -> Dict:
+        search(queries[0])  # Build the method's first-pass data outside the timing
+        started = time.perf_counter()
+        hits = [search(query) for query in queries]
+        elapsed = time.perf_counter() - started
+        return {
+            "method": method,
+            "recall": sum(_recall(h, t) for h, t in zip(hits, truth)) / len(queries),
+            "ms_per_query": elapsed / len(queries) * 1000,
+            "bytes_per_chunk": method_index.resident_bytes_per_chunk()
+        }
+
+    for dimensions in index.prefix_dimensions:
+        prefix_index = VectorIndex(index.store, (dimensions,))
+        rows.append(run(f"{dimensions}d only", prefix_index, lambda query: [
+            (int(row), 0.0)
+            for row in top_k_rows(prefix_index.prefix(dimensions) @ truncate_embeddings(query, dimensions), top_k)
+        ]))
+        for factor in shortlist_factors:
+            rows.append(run(
+                f"{dimensions}d -> {index.dimensions}d, shortlist {top_k * factor}", prefix_index,
+                lambda query: prefix_index.search(query, top_k, dimensions, top_k * factor)
+            ))
+
+    for quantization in QUANTIZATIONS:
+        quantized = {name: codes for name, codes in index.quantized.items() if name.startswith(quantization)}
+        quantized_index = VectorIndex(index.store, (), quantized)
+        rows.append(run(f"{quantization} only", quantized_index, lambda query: (
+            quantized_index.search_quantized(query, top_k, quantization, top_k)
+        )))
+        for factor in shortlist_factors:
+            rows.append(run(
+                f"{quantization} -> {index.dimensions}d, shortlist {top_k * factor}", quantized_index,
+                lambda query: quantized_index.search_quantized(query, top_k, quantization, top_k * factor)
+            ))
+    return rows
+
+
+def print_benchmark(rows: List[Dict], top_k: int, queries: int, chunks: int) -> None:
+    """Print a benchmark table."""
+    print(f"Recall@{top_k} against exact search over {chunks} chunks, {queries} queries")
+    print(f"{'method':<40} {'recall':>8} {'ms/query':>10} {'resident bytes/chunk':>21}")
+    for row in rows:
+        print(f"{row['method']:<40} {row['recall']:>8.3f} {row['ms_per_query']:>10.3f} "
+              f"{row['bytes_per_chunk']:>21.0f}")
+
+
+def sample_queries(
+    index: VectorIndex,
+    count: int = BENCHMARK_QUERIES,
+    seed: int = 42,
+    noise: float = QUERY_NOISE
+) -> np.ndarray:
+    """
+    Make benchmark queries by perturbing stored chunk embeddings.
+
+    A chunk's own embedding is its exact nearest neighbour at every prefix
+    length and quantization, which inflates recall; random noise moves each
+    query off the corpus so the first pass has to rank real neighbours.
+
+    Args:
+        index: Index to sample chunks from
+        count: Number of queries
+        seed: Random seed
+        noise: Norm of the noise added to each unit-length embedding
+
+    Returns:
+        Unit-length float32 query embeddings, one per row
+    """
+    rows = sorted(random.Random(seed).sample(range(len(index)), min(count, len(index))))
+    vectors = normalize_rows(index.vectors[rows])
+    perturbation = np.random.default_rng(seed).standard_normal(vectors.shape).astype(np.float32)
+    return normalize_rows(vectors + noise * perturbation / np.sqrt(index.dimensions))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Search a local embeddings store coarse-to-fine")
+    parser.add_argument("embeddings", help="Embeddings store (.npy) or JSON file")
+    parser.add_argument("--query", "-q", help="Query text, embedded with the configured provider")
+    parser.add_argument("--top-k", "-k", type=int, default=5, help="Number of results (default: 5)")
+    parser.add_argument("--coarse-dimensions", type=int, default=COARSE_DIMENSIONS,
+                        help=f"Prefix length of the first pass (default: {COARSE_DIMENSIONS})")
+    parser.add_argument("--quantization", choices=QUANTIZATIONS,
+                        help="Shortlist on int8 or binary codes instead of a prefix")
+    parser.add_argument("--save-quantized", action="store_true",
+                        help="Build int8 and binary codes and save them next to the store")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Report recall, latency and memory of each prefix length, quantization and shortlist size")
+    parser.add_argument("--queries", type=int, default=BENCHMARK_QUERIES,
+                        help=f"Benchmark queries made by perturbing corpus embeddings (default: {BENCHMARK_QUERIES})")
+    parser.add_argument("--query-file", help="Benchmark with query texts from a file, one per line")
+
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = open_vector_index(args.embeddings)
+    print(f"Opened {len(index)} chunks at {index.dimensions}d with prefixes "
+          f"{list(index.prefix_dimensions)} in {time.perf_counter() - started:.2f}s")
+
+    if args.save_quantized:
+        for quantization in QUANTIZATIONS:
+            index.quantize(quantization)
+        for path in index.save_quantized(args.embeddings):
+            print(f"Saved {path}")
+
+    if args.benchmark:
+        if args.query_file:
+            from query_interface import get_query_embedding
+            with open(args.query_file, 'r', encoding='utf-8') as f:
+                queries = np.array([get_query_embedding(line.strip()) for line in f if line.strip()], dtype=np.float32)
+        else:
+            queries = sample_queries(index, args.queries)
+        top_k = max(args.top_k, 10)
+        print_benchmark(benchmark_search(index, queries, top_k), top_k, len(queries), len(index))
+    elif args.query:
+        from query_interface import get_query_embedding
+        query = get_query_embedding(args.query)
+        if args.quantization:
+            hits = index.search_quantized(query, args.top_k, args.quantization)
+        else:
+            hits = index.search(query, args.top_k, args.coarse_dimensions)
+        print(f"Index holds {index.resident_bytes_per_chunk():.0f} bytes per chunk in memory")
+        for rank, result in enumerate(index.results(hits), 1):
+            print(f"{rank}. [{result['score']:.3f}] {result.get('source', '')} page {result.get('page_num', '?')}: "
+                  f"{result['text'][:200]}")
+    elif not args.save_quantized:
+        parser.error("Pass --query, --benchmark or --save-quantized")